@@ -0,0 +1,239 @@
+'''
+Usage - run this code in Maya (script editor or mayapy)
+
+import script_v002
+script_v002.main(count=20000, seed=1)
+
+Same idea as script_v001 (groups of random shapes that start together and
+each move to a random spot at a random time), but built for stress-test
+scenes with tens of thousands of objects. All random positions, shapes and
+key times are generated up front in one seeded NumPy pass, so the same seed
+always gives the same scene. Objects are then created in chunks with
+explicit names, and their keys are written straight onto new anim curves by
+time and value, without ever changing the current frame.
+
+With instanced=True, each of the five primitives is built only once (hidden
+under scatterPrototypes) and every object is a transform that instances
+its primitive's mesh, so the scene's memory, file size and viewport cost
+grow with the number of shape types instead of the number of objects.
+compareModes builds the same scatter both ways and reports node counts and
+saved file sizes:
+
+script_v002.compareModes(count=20000, seed=1)
+'''
+
+import os
+import tempfile
+import time
+
+import maya.api.OpenMaya as om
+import maya.api.OpenMayaAnim as oma
+import maya.cmds
+import numpy
+
+#############
+# Constants #
+#############
+
+# moving constraints
+minX = minY = minZ = -10
+maxX = maxY = maxZ = 10
+
+# primitive shape options!
+SHAPE_TYPES = ("polyCube", "polySphere", "polyCylinder", "polyCone", "polyTorus")
+
+# objects that share a starting position and time window, like one
+# iteration of script_v001
+GROUP_SIZE = 10
+
+# objects created (and keyed) per chunk
+CHUNK_SIZE = 1000
+
+TRANSLATE_ATTRIBUTES = ("translateX", "translateY", "translateZ")
+
+# group holding the one mesh per shape type that instanced objects share
+PROTOTYPE_GROUP = "scatterPrototypes"
+
+###########
+# Helpers #
+###########
+
+def generateScatter(count, seed=0, startTime=1, endTime=1200, groupSize=GROUP_SIZE):
+    """
+    Given a number of objects and a seed, returns a dict of NumPy arrays for
+    the whole scatter, generated in one pass:
+      shapeIndices: index into SHAPE_TYPES per object
+      startPositions, endPositions: (count, 3) integer positions
+      startTimes, endTimes: the frame of each object's two keys
+    Objects come in groups of groupSize that share a starting position and
+    start time; the time range is split evenly between the groups.
+    """
+    random = numpy.random.RandomState(seed)
+    groupCount = (count + groupSize - 1) // groupSize
+    groups = numpy.arange(count) // groupSize
+    lowBounds = numpy.array([minX, minY, minZ])
+    highBounds = numpy.array([maxX, maxY, maxZ]) + 1
+
+    windowLength = float(endTime - startTime) / groupCount
+    groupStartTimes = numpy.floor(startTime + numpy.arange(groupCount) * windowLength)
+    groupEndTimes = numpy.maximum(numpy.floor(startTime + (numpy.arange(groupCount) + 1) * windowLength),
+                                  groupStartTimes + 1)
+    startTimes = groupStartTimes[groups]
+    # a random frame after the start of the window, up to its end
+    endTimes = startTimes + 1 + numpy.floor(random.random_sample(count) * (groupEndTimes[groups] - startTimes))
+
+    return {
+        "shapeIndices": random.randint(0, len(SHAPE_TYPES), count),
+        "startPositions": random.randint(lowBounds, highBounds, (groupCount, 3))[groups],
+        "endPositions": random.randint(lowBounds, highBounds, (count, 3)),
+        "startTimes": startTimes,
+        "endTimes": endTimes,
+    }
+
+def createShapes(shapeIndices, firstIndex):
+    """
+    Given the shape index of each object in a chunk and the index of the
+    chunk's first object, creates the objects (named scatter_<index>) and
+    returns their transform names.
+    """
+    shapes = []
+    for offset, shapeIndex in enumerate(shapeIndices):
+        shapeConstructor = getattr(maya.cmds, SHAPE_TYPES[shapeIndex])
+        # an explicit name saves Maya from searching for a free pCube<n>
+        shapes.append(shapeConstructor(name="scatter_{0}".format(firstIndex + offset))[0])
+    return shapes
+
+def createPrototypes():
+    """
+    Creates one primitive of each shape type under a hidden group and
+    returns the MObject of each primitive's mesh, in SHAPE_TYPES order.
+    """
+    group = maya.cmds.group(empty=True, name=PROTOTYPE_GROUP)
+    maya.cmds.setAttr(group + ".visibility", False)
+    meshes = []
+    for shapeName in SHAPE_TYPES:
+        shapeConstructor = getattr(maya.cmds, shapeName)
+        transform = shapeConstructor(name="{0}_prototype".format(shapeName))[0]
+        maya.cmds.parent(transform, group)
+        mesh = maya.cmds.listRelatives("{0}|{1}".format(group, transform), shapes=True, fullPath=True)[0]
+        meshes.append(om.MSelectionList().add(mesh).getDependNode(0))
+    return meshes
+
+def createInstancedShapes(shapeIndices, firstIndex, prototypeMeshes):
+    """
+    Given the shape index of each object in a chunk, the index of the
+    chunk's first object and the prototype meshes, creates one transform per
+    object (named scatter_<index>) that instances its prototype's mesh
+    instead of owning a copy. Returns the transform names.
+    """
+    modifier = om.MDagModifier()
+    transforms = []
+    for offset in range(len(shapeIndices)):
+        transform = modifier.createNode("transform")
+        modifier.renameNode(transform, "scatter_{0}".format(firstIndex + offset))
+        transforms.append(transform)
+    modifier.doIt()
+    shapes = []
+    for transform, shapeIndex in zip(transforms, shapeIndices):
+        transformFn = om.MFnDagNode(transform)
+        # keepExistingParent makes this another instance of the same mesh
+        transformFn.addChild(prototypeMeshes[shapeIndex], om.MFnDagNode.kNextPos, True)
+        shapes.append(transformFn.name())
+    return shapes
+
+def getSceneReport(label):
+    """
+    Given a label, returns a dict with the node count of the open scene and
+    the size of the scene saved as a Maya binary (to a temporary file, the
+    open scene keeps its name).
+    """
+    exportPath = os.path.join(tempfile.mkdtemp(prefix="scatter"), "{0}.mb".format(label))
+    maya.cmds.file(exportPath, exportAll=True, type="mayaBinary", force=True)
+    report = {"label": label, "nodes": len(maya.cmds.ls()), "fileBytes": os.path.getsize(exportPath)}
+    os.remove(exportPath)
+    os.rmdir(os.path.dirname(exportPath))
+    return report
+
+def getPlug(nodeName, attribute):
+    return om.MSelectionList().add("{0}.{1}".format(nodeName, attribute)).getPlug(0)
+
+def keyTranslates(shapes, startTimes, endTimes, startPositions, endPositions):
+    """
+    Given a list of transforms and, per transform, the two key times and the
+    positions at those times, creates every translate anim curve with both
+    of its keys in one call per curve. The current frame is never touched.
+    """
+    timeUnit = om.MTime.uiUnit()
+    modifier = om.MDGModifier()
+    for index, shape in enumerate(shapes):
+        times = om.MTimeArray([om.MTime(float(startTimes[index]), timeUnit),
+                               om.MTime(float(endTimes[index]), timeUnit)])
+        for axis, attribute in enumerate(TRANSLATE_ATTRIBUTES):
+            animCurveFn = oma.MFnAnimCurve()
+            animCurveFn.create(getPlug(shape, attribute), oma.MFnAnimCurve.kAnimCurveTL, modifier)
+            # the API wants plain floats, not NumPy integers
+            values = [float(startPositions[index][axis]), float(endPositions[index][axis])]
+            animCurveFn.addKeys(times, om.MDoubleArray(values))
+    modifier.doIt()
+
+#################
+# Main Function #
+#################
+
+def main(count=20000, seed=0, startTime=1, endTime=1200, chunkSize=CHUNK_SIZE, instanced=False):
+    """
+    Given a number of objects and a seed, builds the scatter in the current
+    scene and returns the names of the created transforms. With instanced,
+    objects share one mesh per shape type (see createInstancedShapes).
+    """
+    buildStartTime = time.time()
+    scatter = generateScatter(count, seed, startTime, endTime)
+    generateSeconds = time.time() - buildStartTime
+
+    maya.cmds.select(cl=True)
+    # nobody is going to undo twenty thousand primitives one by one
+    undoState = maya.cmds.undoInfo(q=True, state=True)
+    maya.cmds.undoInfo(state=False)
+    maya.cmds.refresh(suspend=True)
+    shapes = []
+    try:
+        prototypeMeshes = createPrototypes() if instanced else None
+        for chunkStart in range(0, count, chunkSize):
+            chunk = slice(chunkStart, chunkStart + chunkSize)
+            if instanced:
+                chunkShapes = createInstancedShapes(scatter["shapeIndices"][chunk], chunkStart, prototypeMeshes)
+            else:
+                chunkShapes = createShapes(scatter["shapeIndices"][chunk], chunkStart)
+            keyTranslates(chunkShapes, scatter["startTimes"][chunk], scatter["endTimes"][chunk],
+                          scatter["startPositions"][chunk], scatter["endPositions"][chunk])
+            shapes.extend(chunkShapes)
+    finally:
+        maya.cmds.refresh(suspend=False)
+        maya.cmds.undoInfo(state=undoState)
+
+    print("Scattered {0} {1}objects in {2:.2f}s ({3:.3f}s generating)".format(
+        count, "instanced " if instanced else "", time.time() - buildStartTime, generateSeconds))
+    return shapes
+
+def compareModes(count=20000, seed=0):
+    """
+    Given a number of objects and a seed, builds the same scatter in a new
+    scene with and without instancing, prints the build time, node count and
+    saved file size of both and returns the two reports.
+    """
+    reports = []
+    for instanced in (False, True):
+        maya.cmds.file(new=True, force=True)
+        buildStartTime = time.time()
+        main(count, seed, instanced=instanced)
+        buildSeconds = time.time() - buildStartTime
+        report = getSceneReport("instanced" if instanced else "unique")
+        report["seconds"] = buildSeconds
+        reports.append(report)
+    for report in reports:
+        print("{0:10} {1:8d} nodes {2:12d} bytes {3:8.2f}s".format(
+            report["label"], report["nodes"], report["fileBytes"], report["seconds"]))
+    return reports
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+'''
+Usage - builds or updates the take index of an animation folder
+
+python animLibraryIndex.py ../week3/animations/ --processes 8
+python animLibraryIndex.py ../week3/animations/ --list
+
+Keeps a SQLite database (animLibrary.sqlite in the folder by default) with
+one row per take: size, modification time, content hash, fps and time unit,
+first and last key across all curves, curve and key counts and the joint
+set. Takes are read with the Maya-free reader in a process pool. Updates are
+incremental: only takes whose size or modification time changed are read
+again (and only re-parsed if their content hash changed too), and rows of
+removed takes are dropped. The batch tools use it to get frame ranges and
+take sizes without loading any scenes.
+'''
+
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+
+import fileHashing
+
+#############
+# CONSTANTS #
+#############
+
+# name of the index file kept in each animation folder
+INDEX_FILE_NAME = "animLibrary.sqlite"
+
+# bump this whenever the columns or the way they are computed change, so
+# that older indexes are rebuilt from scratch
+INDEX_VERSION = 1
+
+# takes handed to each worker at a time
+CHUNK_SIZE = 8
+
+TAKE_COLUMNS = (
+    "path", "name", "size", "mtime", "hash", "fps", "timeUnit", "firstKey", "lastKey",
+    "curveCount", "keyCount", "jointCount", "joints", "jointSetHash", "indexedAt",
+)
+
+CREATE_TABLES = """
+CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS takes (
+    path TEXT PRIMARY KEY,
+    name TEXT,
+    size INTEGER,
+    mtime REAL,
+    hash TEXT,
+    fps REAL,
+    timeUnit TEXT,
+    firstKey REAL,
+    lastKey REAL,
+    curveCount INTEGER,
+    keyCount INTEGER,
+    jointCount INTEGER,
+    joints TEXT,
+    jointSetHash TEXT,
+    indexedAt TEXT
+);
+CREATE INDEX IF NOT EXISTS takesByJointSet ON takes (jointSetHash);
+"""
+
+##################
+# HELPER METHODS #
+##################
+
+def getIndexPath(animFolder):
+    """
+    Given an animation folder, returns the default path of its index.
+    """
+    return os.path.join(animFolder, INDEX_FILE_NAME)
+
+def openIndex(indexPath):
+    """
+    Given the path of an index, opens it (creating the tables if needed) and
+    returns the connection. An index written by another INDEX_VERSION is
+    emptied first.
+    """
+    connection = sqlite3.connect(indexPath)
+    connection.row_factory = sqlite3.Row
+    connection.executescript(CREATE_TABLES)
+    row = connection.execute("SELECT value FROM info WHERE key = 'version'").fetchone()
+    if row is None or row["value"] != str(INDEX_VERSION):
+        with connection:
+            connection.execute("DELETE FROM takes")
+            connection.execute("INSERT OR REPLACE INTO info VALUES ('version', ?)", (str(INDEX_VERSION),))
+    return connection
+
+def getTakeInfoFromRow(row):
+    """
+    Given a takes row, returns it as a dict with joints as a list.
+    """
+    info = dict((column, row[column]) for column in TAKE_COLUMNS)
+    info["joints"] = json.loads(info["joints"])
+    return info
+
+def getSceneFrameRange(takeInfo, sceneFps):
+    """
+    Given a take's index entry and the frame rate of the scene it is loaded
+    into, returns the take's (first, last) key in scene frames.
+    """
+    scale = sceneFps / takeInfo["fps"]
+    return (takeInfo["firstKey"] * scale, takeInfo["lastKey"] * scale)
+
+##########
+# WORKER #
+##########
+
+def readTakeInfo(arguments):
+    """
+    Given (take path, hash the index has for it or None), returns the take's
+    index entry as a dict. If the content hash still matches, only the hash,
+    size and time are returned (with "unchanged" set) and the take isn't
+    parsed. Errors are returned under "error" instead of raised.
+    """
+    import readAnimCurves
+
+    animPath, knownHash = arguments
+    info = {"path": animPath, "error": None}
+    try:
+        info["size"], info["mtime"] = fileHashing.getFileStamp(animPath)
+        info["hash"] = fileHashing.getFileHash(animPath)
+        if info["hash"] == knownHash:
+            info["unchanged"] = True
+            return info
+        take = readAnimCurves.readAnimTake(animPath)
+        frameRange = take.getFrameRange() or (None, None)
+        joints = sorted(take.joints)
+        info.update({
+            "name": os.path.splitext(os.path.basename(animPath))[0],
+            "fps": take.fps,
+            "timeUnit": take.timeUnit,
+            "firstKey": frameRange[0],
+            "lastKey": frameRange[1],
+            "curveCount": len(take.curves),
+            "keyCount": take.getKeyCount(),
+            "jointCount": len(joints),
+            "joints": json.dumps(joints),
+            "jointSetHash": fileHashing.getDataHash(joints),
+            "indexedAt": time.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+    except Exception as error:
+        info["error"] = "{0}: {1}".format(type(error).__name__, error)
+    return info
+
+############
+# UPDATING #
+############
+
+def updateIndex(animationFiles, indexPath, processes=None, removeMissing=True):
+    """
+    Given a list of take paths and the path of an index, brings the index up
+    to date and returns a summary dict with the paths that were indexed,
+    unchanged (same size and time), touched (same content), removed and
+    failed. Changed takes are read in a pool of processes. With
+    removeMissing, rows of takes that aren't in the list are dropped.
+    """
+    startTime = time.time()
+    animationFiles = [os.path.abspath(animPath) for animPath in animationFiles]
+    summary = {"indexed": [], "unchanged": [], "touched": [], "removed": [], "failed": []}
+    connection = openIndex(indexPath)
+    try:
+        known = dict((row["path"], row) for row in connection.execute("SELECT path, size, mtime, hash FROM takes"))
+        toRead = []
+        for animPath in animationFiles:
+            row = known.get(animPath)
+            if row is not None and (row["size"], row["mtime"]) == fileHashing.getFileStamp(animPath):
+                summary["unchanged"].append(animPath)
+            else:
+                toRead.append((animPath, row["hash"] if row is not None else None))
+
+        if len(toRead) > 1 and processes != 1:
+            pool = multiprocessing.Pool(processes)
+            try:
+                infos = list(pool.imap_unordered(readTakeInfo, toRead, CHUNK_SIZE))
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            infos = [readTakeInfo(arguments) for arguments in toRead]
+
+        with connection:
+            for info in infos:
+                if info["error"]:
+                    summary["failed"].append((info["path"], info["error"]))
+                elif info.get("unchanged"):
+                    connection.execute("UPDATE takes SET size = ?, mtime = ? WHERE path = ?",
+                                       (info["size"], info["mtime"], info["path"]))
+                    summary["touched"].append(info["path"])
+                else:
+                    connection.execute(
+                        "INSERT OR REPLACE INTO takes ({0}) VALUES ({1})".format(
+                            ", ".join(TAKE_COLUMNS), ", ".join("?" * len(TAKE_COLUMNS))),
+                        [info[column] for column in TAKE_COLUMNS])
+                    summary["indexed"].append(info["path"])
+            if removeMissing:
+                listed = set(animationFiles)
+                for animPath in known:
+                    if animPath not in listed:
+                        connection.execute("DELETE FROM takes WHERE path = ?", (animPath,))
+                        summary["removed"].append(animPath)
+    finally:
+        connection.close()
+    summary["seconds"] = time.time() - startTime
+    return summary
+
+def updateFolderIndex(animFolder, indexPath=None, processes=None):
+    """
+    Given an animation folder, updates its index (by default the one inside
+    the folder) with every take in it and returns the summary from
+    updateIndex.
+    """
+    import batchApplyAnim
+
+    return updateIndex(batchApplyAnim.getAnimationFiles(animFolder), indexPath or getIndexPath(animFolder),
+                       processes)
+
+############
+# QUERYING #
+############
+
+def getTakeInfos(indexPath, animationFiles):
+    """
+    Given the path of an index and a list of take paths, returns a dict of
+    take path -> index entry. Takes that aren't indexed, or that changed on
+    disk since they were, map to None, so callers fall back on loading them.
+    """
+    takeInfos = dict((animPath, None) for animPath in animationFiles)
+    if not os.path.exists(indexPath):
+        return takeInfos
+    connection = openIndex(indexPath)
+    try:
+        for animPath in animationFiles:
+            row = connection.execute("SELECT * FROM takes WHERE path = ?", (os.path.abspath(animPath),)).fetchone()
+            if row is None or not os.path.exists(animPath):
+                continue
+            if (row["size"], row["mtime"]) != fileHashing.getFileStamp(animPath):
+                continue
+            takeInfos[animPath] = getTakeInfoFromRow(row)
+    finally:
+        connection.close()
+    return takeInfos
+
+def getAllTakes(indexPath):
+    """
+    Given the path of an index, returns every entry in it sorted by path.
+    """
+    connection = openIndex(indexPath)
+    try:
+        return [getTakeInfoFromRow(row) for row in connection.execute("SELECT * FROM takes ORDER BY path")]
+    finally:
+        connection.close()
+
+##########
+# SCRIPT #
+##########
+
+def main():
+    parser = argparse.ArgumentParser(description="Index the takes of an animation folder.")
+    parser.add_argument("animFolder")
+    parser.add_argument("--index", help="index file (default: {0} in the folder)".format(INDEX_FILE_NAME))
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--list", action="store_true", help="print the indexed takes after updating")
+    args = parser.parse_args()
+
+    indexPath = args.index or getIndexPath(args.animFolder)
+    summary = updateFolderIndex(args.animFolder, indexPath, args.processes)
+    for animPath, error in summary["failed"]:
+        print("failed {0} {1}".format(os.path.basename(animPath), error))
+    print("{0} indexed, {1} unchanged, {2} touched, {3} removed, {4} failed in {5:.2f}s".format(
+        len(summary["indexed"]), len(summary["unchanged"]), len(summary["touched"]),
+        len(summary["removed"]), len(summary["failed"]), summary["seconds"]))
+
+    if args.list:
+        for info in getAllTakes(indexPath):
+            print("{0:24} {1:>7}fps {2:>8} - {3:<8} {4:3} joints {5:4} curves {6:7} keys".format(
+                info["name"], info["fps"], info["firstKey"], info["lastKey"], info["jointCount"],
+                info["curveCount"], info["keyCount"]))
+
+if __name__ == "__main__":
+    main()
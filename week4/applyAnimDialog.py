@@ -4,7 +4,51 @@ from PySide2 import QtGui
 from PySide2 import QtUiTools
 from shiboken2 import wrapInstance
 import maya.OpenMayaUI
-from applyAnimWithDialog import * 
+import pymel.core
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import batchApplyAnim
+
+#############
+# CONSTANTS #
+#############
+
+# the batch runner, started in its own mayapy process so Maya stays responsive
+BATCH_SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "batchApplyAnim.py")
+
+# how many of the last lines the batch runner wrote to stderr are shown when
+# it fails
+ERROR_LINES_SHOWN = 20
+
+##################
+# HELPER METHODS #
+##################
+
+def getMayapyPath():
+    """
+    Returns the path of the mayapy that ships with the running Maya, or None
+    if it can't be found. It sits next to the Maya executable on Windows and
+    Linux; on macOS it is in Maya.app/Contents/bin, i.e. MAYA_LOCATION/bin.
+    """
+    mayapyName = "mayapy.exe" if sys.platform == "win32" else "mayapy"
+    candidates = [os.path.join(os.path.dirname(sys.executable), mayapyName)]
+    if os.environ.get("MAYA_LOCATION"):
+        candidates.append(os.path.join(os.environ["MAYA_LOCATION"], "bin", mayapyName))
+    for mayapyPath in candidates:
+        if os.path.isfile(mayapyPath):
+            return mayapyPath
+    return None
+
+def formatDuration(seconds):
+    """
+    Given a number of seconds, returns it as e.g. "4m 05s".
+    """
+    minutes, seconds = divmod(int(seconds), 60)
+    return "{0}m {1:02d}s".format(minutes, seconds)
 
 ############
 # UI CLASS #
@@ -24,6 +68,10 @@ class ApplyAndSaveAnimDialog(QtWidgets.QDialog):
         self.setMinimumWidth(600)
         self.setMinimumHeight(200)
 
+        self.batchProcess = None
+        self.outputBuffer = ""
+        self.resetProgress(0)
+
         self.createWidgets()
         self.createLayouts()
         self.createConnections()
@@ -37,6 +85,7 @@ class ApplyAndSaveAnimDialog(QtWidgets.QDialog):
         self.rigFilePathBtn.clicked.connect(self.browseRigFilePath)
         self.destDirPathBtn.clicked.connect(self.browseDestDirPath)
         self.runBtn.clicked.connect(self.runApplyAnimScript)
+        self.cancelBtn.clicked.connect(self.cancelApplyAnimScript)
 
     def createLayouts(self):
 
@@ -44,24 +93,41 @@ class ApplyAndSaveAnimDialog(QtWidgets.QDialog):
         animDirLayout = QtWidgets.QHBoxLayout(self)
         rigFileLayout = QtWidgets.QHBoxLayout(self)
         destDirLayout = QtWidgets.QHBoxLayout(self)
+        optionsLayout = QtWidgets.QHBoxLayout(self)
+        buttonsLayout = QtWidgets.QHBoxLayout(self)
 
         animDirLayout.addWidget(self.animDirPathText)
         animDirLayout.addWidget(self.animDirPathLineEdit)
         animDirLayout.addWidget(self.animDirPathBtn)
-        
+
         rigFileLayout.addWidget(self.rigFilePathText)
         rigFileLayout.addWidget(self.rigFilePathLineEdit)
         rigFileLayout.addWidget(self.rigFilePathBtn)
-        
+
         destDirLayout.addWidget(self.destDirPathText)
         destDirLayout.addWidget(self.destDirPathLineEdit)
         destDirLayout.addWidget(self.destDirPathBtn)
 
+        optionsLayout.addWidget(self.processesText)
+        optionsLayout.addWidget(self.processesSpinBox)
+        optionsLayout.addWidget(self.resumeCheckBox)
+        optionsLayout.addWidget(self.warmRigCheckBox)
+        optionsLayout.addWidget(self.indexCheckBox)
+        optionsLayout.addWidget(self.cacheSourcesCheckBox)
+        optionsLayout.addStretch()
+
+        buttonsLayout.addWidget(self.runBtn)
+        buttonsLayout.addWidget(self.cancelBtn)
+
         mainLayout.addWidget(self.titleText)
         mainLayout.addLayout(animDirLayout)
         mainLayout.addLayout(rigFileLayout)
         mainLayout.addLayout(destDirLayout)
-        mainLayout.addWidget(self.runBtn)
+        mainLayout.addLayout(optionsLayout)
+        mainLayout.addLayout(buttonsLayout)
+        mainLayout.addWidget(self.progressBar)
+        mainLayout.addWidget(self.progressText)
+        mainLayout.addWidget(self.failuresList)
 
     def createWidgets(self):
 
@@ -87,7 +153,30 @@ class ApplyAndSaveAnimDialog(QtWidgets.QDialog):
         self.destDirPathBtn = QtWidgets.QPushButton()
         self.destDirPathBtn.setIcon(QtGui.QIcon(":fileOpen.png"))
 
+        self.processesText = QtWidgets.QLabel()
+        self.processesText.setText("Worker Processes")
+        self.processesSpinBox = QtWidgets.QSpinBox()
+        self.processesSpinBox.setRange(1, multiprocessing.cpu_count())
+        self.processesSpinBox.setValue(max(1, multiprocessing.cpu_count() - 1))
+        self.resumeCheckBox = QtWidgets.QCheckBox("Resume (skip up to date takes)")
+        self.resumeCheckBox.setChecked(True)
+        self.warmRigCheckBox = QtWidgets.QCheckBox("Keep rig loaded")
+        self.indexCheckBox = QtWidgets.QCheckBox("Use take index")
+        self.indexCheckBox.setToolTip("Read frame ranges from the animation folder's take index instead of the scenes")
+        self.indexCheckBox.setChecked(True)
+        self.cacheSourcesCheckBox = QtWidgets.QCheckBox("Cache source files locally")
+        self.cacheSourcesCheckBox.setToolTip("Copy the rig and takes to a local cache, so unchanged files "
+                                             "aren't read from the network again")
+
         self.runBtn = QtWidgets.QPushButton("Run")
+        self.cancelBtn = QtWidgets.QPushButton("Cancel")
+        self.cancelBtn.setEnabled(False)
+
+        self.progressBar = QtWidgets.QProgressBar()
+        self.progressBar.setValue(0)
+        self.progressText = QtWidgets.QLabel()
+        self.failuresList = QtWidgets.QListWidget()
+        self.failuresList.hide()
 
     def browseAnimDirPath(self):
         selectedPath = QtWidgets.QFileDialog.getExistingDirectory(self)
@@ -105,16 +194,143 @@ class ApplyAndSaveAnimDialog(QtWidgets.QDialog):
             self.destDirPathLineEdit.setText(selectedPath)
 
     def runApplyAnimScript(self):
-        animDirPath = self.animDirPathLineEdit.text().replace("\\", "/") + "/"
+        animDirPath = self.animDirPathLineEdit.text().replace("\\", "/")
         rigFilePath = self.rigFilePathLineEdit.text().replace("\\", "/")
-        destDirPath = self.destDirPathLineEdit.text().replace("\\", "/") + "/"
+        destDirPath = self.destDirPathLineEdit.text().replace("\\", "/")
 
         if not animDirPath or not rigFilePath or not destDirPath:
             pymel.core.error("Invalid file path")
             return
+        mayapyPath = getMayapyPath()
+        if mayapyPath is None:
+            pymel.core.error("Can't find mayapy next to {0} or in $MAYA_LOCATION/bin".format(sys.executable))
+            return
+
+        arguments = [BATCH_SCRIPT_PATH, animDirPath, destDirPath, rigFilePath,
+                     "--processes", str(self.processesSpinBox.value()), "--json", "--stdin-cancel"]
+        if self.resumeCheckBox.isChecked():
+            arguments.append("--incremental")
+        if self.warmRigCheckBox.isChecked():
+            arguments.append("--warm-rig")
+        if self.indexCheckBox.isChecked():
+            arguments.append("--index")
+        if self.cacheSourcesCheckBox.isChecked():
+            arguments.append("--cache-sources")
+
+        self.resetProgress(len(batchApplyAnim.getAnimationFiles(animDirPath)))
+        self.failuresList.clear()
+        self.failuresList.hide()
+        self.progressBar.setValue(0)
+        self.progressText.setText("Starting workers...")
+        self.setRunning(True)
+
+        self.outputBuffer = ""
+        self.batchProcess = QtCore.QProcess(self)
+        self.batchProcess.setWorkingDirectory(os.path.dirname(BATCH_SCRIPT_PATH))
+        self.batchProcess.readyReadStandardOutput.connect(self.readBatchOutput)
+        self.batchProcess.finished.connect(self.batchFinished)
+        self.batchProcess.errorOccurred.connect(self.batchError)
+        self.batchProcess.start(mayapyPath, arguments)
+
+    def cancelApplyAnimScript(self):
+        if self.batchProcess is None:
+            return
+        self.progressText.setText("Cancelling...")
+        self.batchProcess.write(b"cancel\n")
+        self.cancelBtn.setEnabled(False)
+
+    def setRunning(self, running):
+        self.runBtn.setEnabled(not running)
+        self.cancelBtn.setEnabled(running)
+
+    def resetProgress(self, takeCount):
+        self.takeCount = takeCount
+        self.doneCount = 0
+        self.builtCount = 0
+        self.failures = []
+        self.batchSummary = None
+        self.batchStartTime = time.time()
+
+    def readBatchOutput(self):
+        """
+        Reads the JSON lines the batch runner prints and updates the progress.
+        Anything else the workers print (e.g. Maya warnings) is ignored.
+        """
+        self.outputBuffer += bytes(self.batchProcess.readAllStandardOutput()).decode("utf-8", "replace")
+        lines = self.outputBuffer.split("\n")
+        self.outputBuffer = lines.pop()
+        for line in lines:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(event, dict) and event.get("event") == "result":
+                self.takeFinished(event)
+            elif isinstance(event, dict) and event.get("event") == "summary":
+                self.batchSummary = event
+
+    def takeFinished(self, result):
+        if result["status"] == "cancelled":
+            return
+        self.doneCount += 1
+        if result["status"] == "ok":
+            self.builtCount += 1
+        elif result["status"] == "failed":
+            self.failures.append(result)
+
+        elapsedSeconds = time.time() - self.batchStartTime
+        self.progressBar.setMaximum(max(self.takeCount, 1))
+        self.progressBar.setValue(self.doneCount)
+        if self.builtCount:
+            # skipped takes are instant, so only built ones count towards throughput
+            secondsPerTake = elapsedSeconds / self.builtCount
+            remainingSeconds = secondsPerTake * (self.takeCount - self.doneCount)
+            self.progressText.setText("{0}/{1} takes, {2:.1f} takes/min, ETA {3}".format(
+                self.doneCount, self.takeCount, 60.0 / secondsPerTake, formatDuration(remainingSeconds)))
+        else:
+            self.progressText.setText("{0}/{1} takes".format(self.doneCount, self.takeCount))
+
+    def batchFinished(self, exitCode, exitStatus):
+        """
+        Shows how the batch ended. The runner only prints its summary when it
+        got through the batch, so without one (a crash, bad arguments,
+        workers that keep dying...) the end of its stderr is shown instead.
+        """
+        self.readBatchOutput()
+        errorText = bytes(self.batchProcess.readAllStandardError()).decode("utf-8", "replace")
+        self.setRunning(False)
+        self.batchProcess = None
+
+        for failure in self.failures:
+            self.failuresList.addItem("{0}: {1}".format(os.path.basename(failure["animPath"]), failure["error"]))
+        self.failuresList.setVisible(bool(self.failures))
+
+        elapsedSeconds = formatDuration(time.time() - self.batchStartTime)
+        if exitStatus != QtCore.QProcess.NormalExit or self.batchSummary is None:
+            self.progressText.setText("Batch failed after {0}/{1} takes ({2}, exit code {3}):".format(
+                self.doneCount, self.takeCount, elapsedSeconds, exitCode))
+            self.failuresList.addItems(errorText.strip().splitlines()[-ERROR_LINES_SHOWN:] or ["(nothing on stderr)"])
+            self.failuresList.show()
+        elif self.doneCount < self.takeCount:
+            self.progressText.setText("Stopped after {0}/{1} takes ({2}); run again with Resume to continue".format(
+                self.doneCount, self.takeCount, elapsedSeconds))
+        else:
+            self.progressText.setText("Done: {0} built, {1} failed in {2}".format(
+                self.builtCount, len(self.failures), elapsedSeconds))
+
+    def batchError(self, error):
+        # every other error is followed by finished, which reports it
+        if error != QtCore.QProcess.FailedToStart or self.batchProcess is None:
+            return
+        self.progressText.setText("Couldn't start {0}: {1}".format(getMayapyPath(),
+                                                                    self.batchProcess.errorString()))
+        self.setRunning(False)
+        self.batchProcess = None
 
-        applyAnimationForAllFilesInFolder(animDirPath, destDirPath, rigFilePath)
-        self.close()
+    def closeEvent(self, event):
+        if self.batchProcess is not None:
+            self.cancelApplyAnimScript()
+        super(ApplyAndSaveAnimDialog, self).closeEvent(event)
 
 ##########
 # SCRIPT #
@@ -131,4 +347,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
@@ -1,10 +1,54 @@
+from collections import OrderedDict
 import pymel.core
 import os
+import time
+
+import pipelineTracing
+
+#############
+# CONSTANTS #
+#############
+
+# settings passed to bakeResults for every take (the time range is added per take)
+BAKE_SETTINGS = {
+    "simulation": True,
+    "sampleBy": 1,
+    "oversamplingRate": 1,
+    "disableImplicitControl": True,
+    "preserveOutsideKeys": True,
+    "sparseAnimCurveBake": False,
+    "removeBakedAnimFromLayer": False,
+    "bakeOnOverrideLayer": False,
+    "minimizeRotation": True,
+    "controlPoints": False,
+    "shape": True
+}
+
+# options for applying one take (see applyAnimationForOneFile), passed to
+# applyAnimationForAllFilesInFolder as one options dict
+BAKE_OPTION_DEFAULTS = {
+    "directTransfer": False,
+    "mappingRules": None,
+    "reduceTolerances": None,
+    "writeSidecar": False,
+    "resampleFps": None,
+}
+
+# processes for the Maya-free helpers (take index, validation) when they run
+# inside the Maya session: one, so they never start a multiprocessing pool.
+# Pool workers are started with sys.executable, which is maya.exe on Windows,
+# so each worker would be a whole new Maya instead of a Python process
+SESSION_PROCESSES = 1
+
+# how far apart two joints' orients or world matrices can be while still
+# counting as the same rest offset in direct transfer mode
+OFFSET_TOLERANCE = 1e-4
 
 ##################
 # HELPER METHODS #
 ##################
 
+@pipelineTracing.traced
 def createNewScene():
     """
     Creates a new scene.
@@ -23,24 +67,35 @@ def getFileNamespace(filePath):
     fileName, fileExt = os.path.splitext(fileFullName)
     return "{0}".format(fileName)
 
+@pipelineTracing.traced
 def createReference(filePath, ns):
     """
     Given a file path and a namespace, creates a reference to
-    that file.
+    that file. While sourceCache is on, the file is referenced from its
+    local cached copy.
     """
     if not os.path.exists(filePath):
         pymel.core.error("File does not exist: {0}".format(filePath))
         return
-    pymel.core.createReference(filePath, namespace=ns)
+    import sourceCache
+
+    if pipelineTracing.isTracing():
+        # only stat the file (often on a network share) when someone is looking
+        pipelineTracing.addSpanArgs(namespace=ns, bytes=os.path.getsize(filePath))
+    pymel.core.createReference(sourceCache.getLocalPath(filePath), namespace=ns)
     refNode = pymel.core.FileReference(namespace=ns)
     return refNode
 
+@pipelineTracing.traced
 def getJointsFromNamespace(ns):
     """
     Given a namespace, returns a list of all joints
     """
-    return pymel.core.ls("{0}:*".format(ns), type="joint")
+    joints = pymel.core.ls("{0}:*".format(ns), type="joint")
+    pipelineTracing.addSpanArgs(namespace=ns, joints=len(joints))
+    return joints
 
+@pipelineTracing.traced
 def applyParentConstraint(driver, driven):
     """
     Given a driver object (parent, aka the animation) and a driven 
@@ -49,26 +104,100 @@ def applyParentConstraint(driver, driven):
     """
     pymel.core.parentConstraint(driver, driven, mo=True)
 
-def connectAnimAndRigJoints(animJoints, rigJoints):
+def jointOffsetsMatch(animJoint, rigJoint, tolerance=OFFSET_TOLERANCE):
+    """
+    Given an animation joint and a rig joint, returns True if they share the
+    same rotate order, joint orient and current world matrix, i.e. if a parent
+    constraint between them would hold a zero offset and copying the local
+    channels gives the same result as constraining and baking.
+    """
+    if animJoint.rotateOrder.get() != rigJoint.rotateOrder.get():
+        return False
+    if not animJoint.jointOrient.get().isEquivalent(rigJoint.jointOrient.get(), tolerance):
+        return False
+    return animJoint.worldMatrix.get().isEquivalent(rigJoint.worldMatrix.get(), tolerance)
+
+def transferAnimCurves(animJoint, rigJoint, timeRange):
+    """
+    Given an animation joint, a rig joint and a (start, end) time range, copies
+    all of the animation joint's curves in that range (or all of their keys if
+    timeRange is None) onto the same attributes of the rig joint in one
+    copyKey/pasteKey, without any constraint or bake.
+    """
+    copyOptions = {"time": timeRange} if timeRange is not None else {}
+    if pymel.core.copyKey(animJoint, **copyOptions):
+        pymel.core.pasteKey(rigJoint, option="replaceCompletely")
+
+@pipelineTracing.traced
+def getJointMapForTake(rigPath, animJoints, rigJoints, mappingRules=None):
+    """
+    Given a rig file, the animation joints and the rig joints, returns the
+    resolved joint map for them (see jointMapping.getJointMap) and warns
+    about any joints that couldn't be matched. The map is cached on disk per
+    rig and anim skeleton, so after the first take this is only a lookup.
+    """
+    import jointMapping
+
+    animJointPaths = [animJoint.longName() for animJoint in animJoints]
+    resolved = jointMapping.getJointMap(
+        rigPath, animJointPaths, lambda: [rigJoint.longName() for rigJoint in rigJoints], mappingRules)
+    if resolved["unmatchedAnim"]:
+        pymel.core.warning("No rig joint for: {0}".format(", ".join(resolved["unmatchedAnim"])))
+    return resolved["map"]
+
+@pipelineTracing.traced
+def connectAnimAndRigJoints(animJoints, rigJoints, directTransfer=False, timeRange=None, jointMap=None):
     """
     Given a list of animation joints and a list of rig joints,
     connects each pair of joints with translate, rotate, and
-    scale. Note: animJoints and rigJoints should follow the 
-    exact same hierarchy.
+    scale. Pairs come from jointMap (namespace-free anim joint path ->
+    namespace-free rig joint path); without one, joints are paired by
+    their exact short names.
+
+    If directTransfer is True, joints whose rest offsets match (and whose
+    parent was also transferred) get their curves copied straight across
+    instead; every other joint falls back on a parent constraint. Returns
+    the list of rig joints that were constrained and still need baking.
     """
+    import jointMapping
+
+    if jointMap is None:
+        jointMap = jointMapping.resolveJointMap(
+            [animJoint.longName() for animJoint in animJoints],
+            [rigJoint.longName() for rigJoint in rigJoints])["map"]
+    rigJointsByPath = dict((jointMapping.stripNamespaces(rigJoint.longName()), rigJoint)
+                           for rigJoint in rigJoints)
+
+    constrainedJoints = []
+    transferredJoints = set()
     for animJoint in animJoints:
-        animJointName = animJoint.split(":")[1]
-        for rigJoint in rigJoints:
-            rigJointName = rigJoint.split(":")[1]
-            if animJointName == rigJointName:
-                applyParentConstraint(animJoint, rigJoint)
-                break
+        rigJointPath = jointMap.get(jointMapping.stripNamespaces(animJoint.longName()))
+        rigJoint = rigJointsByPath.get(rigJointPath)
+        if rigJoint is None:
+            continue
+        rigParent = rigJoint.getParent()
+        parentTransferred = (rigParent is None or rigParent.type() != "joint"
+                             or rigParent in transferredJoints)
+        if directTransfer and parentTransferred and jointOffsetsMatch(animJoint, rigJoint):
+            transferAnimCurves(animJoint, rigJoint, timeRange)
+            transferredJoints.add(rigJoint)
+        else:
+            applyParentConstraint(animJoint, rigJoint)
+            constrainedJoints.append(rigJoint)
+    return constrainedJoints
 
+@pipelineTracing.traced
 def saveFile(tempFilePath, newFilePath):
     """
-    Given a new file path, renames the current file and saves.
+    Given a new file path, renames the current file and saves. References
+    to cached copies are pointed back at their original files.
     """
+    import sourceCache
+
     pymel.core.saveAs(newFilePath)
+    sourceCache.restoreSourcePaths(newFilePath)
+    if pipelineTracing.isTracing():
+        pipelineTracing.addSpanArgs(bytes=os.path.getsize(newFilePath))
 
     # Again, this was an attempt to stop the student license popup, and it successfully
     # removes the student license line from the .ma file, but it doesn't stop the 
@@ -77,6 +206,48 @@ def saveFile(tempFilePath, newFilePath):
     # pymel.core.saveAs(tempFilePath)
     # removeStudentLicenseLine(tempFilePath, newFilePath)
 
+def addPlaybackRange(filePath):
+    """
+    Given a Maya ASCII file saved with exportSelected, adds the scene's
+    current playback range to it the way saveAs stores it, unless it already
+    has one.
+    """
+    import writeMayaAscii
+
+    playbackRange = (pymel.core.playbackOptions(q=True, min=True), pymel.core.playbackOptions(q=True, max=True))
+    with open(filePath, "r") as input:
+        lines = input.readlines()
+    if any(line.startswith('createNode script -n "sceneConfigurationScriptNode"') for line in lines):
+        return
+    insertIndex = len(lines)
+    if lines and lines[-1].startswith("// End of"):
+        insertIndex -= 1
+    lines.insert(insertIndex, writeMayaAscii.getPlaybackRangeScript(playbackRange))
+    with open(filePath, "w") as output:
+        output.writelines(lines)
+
+@pipelineTracing.traced
+def exportRig(filePath, rigJoints):
+    """
+    Given a file path and the joints of one of several rigs in the scene,
+    saves only that rig's reference and its baked curves to the file, so
+    the other rigs baked alongside it are left out. The playback range is
+    added back (exportSelected leaves it out), so the file matches what
+    saveFile writes for a single rig.
+    """
+    import sourceCache
+
+    pymel.core.select(rigJoints)
+    pymel.core.exportSelected(filePath, type="mayaAscii", force=True, preserveReferences=True,
+                              constructionHistory=False, channels=True, constraints=False,
+                              expressions=False, shader=False)
+    pymel.core.select(cl=True)
+    addPlaybackRange(filePath)
+    sourceCache.restoreSourcePaths(filePath)
+    if pipelineTracing.isTracing():
+        pipelineTracing.addSpanArgs(bytes=os.path.getsize(filePath))
+
+@pipelineTracing.traced
 def removeReference(refNode):
     """
     Removes the reference represented by the given refNode.
@@ -96,72 +267,543 @@ def removeStudentLicenseLine(tempFilePath, finalFilePath):
                     output.write(line)
     os.remove(tempFilePath)
 
-def applyAnimationForOneFile(animPath, destinationFolder, rigPath):
+@pipelineTracing.traced
+def reduceBakedKeys(takeName, joints, tolerances=None):
     """
-    Given the path of an animation file, a rig file, and a destination folder, 
-    applies the animation to the rig using references and parent constraints
-    and saves the resulting file to the destination folder using the name
-    rig_with_{animation file name}.ma .
+    Given the name of the take, a list of joints and a dict of anim curve
+    type -> tolerance, removes every key from the joints' anim curves that
+    linear interpolation can recreate within the tolerance (see
+    reduceKeys.reduceCurveKeys). Prints and returns a report of the keys and
+    bytes before and after.
     """
-    animNs = getFileNamespace(animPath)
-    rigNs = getFileNamespace(rigPath)
+    # imported here so the rest of the pipeline doesn't need NumPy in mayapy
+    import numpy
+    import reduceKeys
+
+    report = reduceKeys.createReport(takeName)
+    curves = set(pymel.core.listConnections(joints, type="animCurve", source=True, destination=False))
+    for curve in curves:
+        times = numpy.array(pymel.core.keyframe(curve, q=True, timeChange=True))
+        values = numpy.array(pymel.core.keyframe(curve, q=True, valueChange=True))
+        keep = reduceKeys.reduceCurveKeys(times, values, reduceKeys.getTolerance(curve.type(), tolerances))
+        reduceKeys.addToReport(report, times, values, keep)
+        if not keep.all():
+            pymel.core.cutKey(curve, time=[(keyTime, keyTime) for keyTime in times[~keep]], clear=True)
+        pymel.core.keyTangent(curve, inTangentType="linear", outTangentType="linear")
+    print(reduceKeys.formatReport(report))
+    return report
+
+@pipelineTracing.traced
+def resampleBakedKeys(joints, targetFps):
+    """
+    Given a list of baked joints and a frame rate, replaces each joint's anim
+    curves with one key per targetFps frame (rotations slerped as quaternions
+    and Euler filtered across all joints in each joint's rotate order, see
+    resampleCurves). Keys stay in
+    the scene's time unit. Returns (keys before, keys after).
+    """
+    # imported here so the rest of the pipeline doesn't need NumPy in mayapy
+    import math
+    import numpy
+    import maya.api.OpenMaya as om
+    import maya.api.OpenMayaAnim as oma
+    import readAnimCurves
+    import resampleCurves
+
+    sceneFps = readAnimCurves.getFramesPerSecond(pymel.core.currentUnit(q=True, time=True))
+    jointChannels = {}
+    jointCurves = {}
+    rotateOrders = {}
+    keysBefore = 0
+    for joint in joints:
+        connections = pymel.core.listConnections(joint, type="animCurve", source=True, destination=False,
+                                                 connections=True, plugs=False)
+        channels = {}
+        for jointPlug, curve in connections:
+            times = numpy.array(pymel.core.keyframe(curve, q=True, timeChange=True))
+            values = numpy.array(pymel.core.keyframe(curve, q=True, valueChange=True))
+            channels[jointPlug.longName()] = (times, values)
+            jointCurves[(joint, jointPlug.longName())] = curve
+            keysBefore += len(times)
+        if channels:
+            rotateOrders[joint] = joint.rotateOrder.get()
+            jointChannels[joint] = resampleCurves.resampleJointChannels(
+                channels, sceneFps, targetFps, tuple(joint.rotate.get()), rotateOrders[joint])
+    resampleCurves.filterTakeRotations(jointChannels, rotateOrders)
+
+    keysAfter = 0
+    for (joint, channel), curve in jointCurves.items():
+        times, values = jointChannels[joint][channel]
+        if curve.type() == "animCurveTA":
+            # angular keys are set in radians
+            values = values * (math.pi / 180.0)
+        animCurveFn = oma.MFnAnimCurve(om.MSelectionList().add(curve.name()).getDependNode(0))
+        sceneTimes = times * (sceneFps / targetFps)
+        animCurveFn.addKeys(om.MTimeArray([om.MTime(time, om.MTime.uiUnit()) for time in sceneTimes]),
+                            om.MDoubleArray(values.tolist()), oma.MFnAnimCurve.kTangentLinear,
+                            oma.MFnAnimCurve.kTangentLinear, False)
+        keysAfter += len(times)
+    pipelineTracing.addSpanArgs(keysBefore=keysBefore, keysAfter=keysAfter)
+    return keysBefore, keysAfter
+
+@pipelineTracing.traced
+def writeBakedSidecar(filePath, joints):
+    """
+    Given the path of a saved take and the rig joints it was baked onto,
+    writes every joint's anim curve to a binary sidecar next to the take (see
+    curveSidecar) and returns the sidecar's path.
+    """
+    # imported here so the rest of the pipeline doesn't need NumPy in mayapy
+    import numpy
+    import curveSidecar
+    import readAnimCurves
+
+    timeUnit = pymel.core.currentUnit(q=True, time=True)
+    curves = []
+    connections = pymel.core.listConnections(joints, type="animCurve", source=True, destination=False,
+                                             connections=True, plugs=False)
+    for jointPlug, curve in connections:
+        curves.append(readAnimCurves.AnimCurve(
+            curve.name(), curve.type(),
+            numpy.array(pymel.core.keyframe(curve, q=True, timeChange=True)),
+            numpy.array(pymel.core.keyframe(curve, q=True, valueChange=True)),
+            jointPlug.node().stripNamespace(), jointPlug.longName()))
+    sidecarPath = curveSidecar.getSidecarPath(filePath)
+    curveSidecar.writeCurveSidecar(sidecarPath, curves, readAnimCurves.getFramesPerSecond(timeUnit), timeUnit)
+    if pipelineTracing.isTracing():
+        pipelineTracing.addSpanArgs(bytes=os.path.getsize(sidecarPath))
+    return sidecarPath
+
+def setFrameRangeFromIndex(takeInfo):
+    """
+    Given a take's animLibraryIndex entry, sets the playback range to the
+    take's first and last key, converted to the scene's time unit.
+    """
+    import animLibraryIndex
+    import readAnimCurves
+
+    sceneFps = readAnimCurves.getFramesPerSecond(pymel.core.currentUnit(q=True, time=True))
+    startTime, endTime = animLibraryIndex.getSceneFrameRange(takeInfo, sceneFps)
+    pymel.core.playbackOptions(animationStartTime=startTime, minTime=startTime,
+                               animationEndTime=endTime, maxTime=endTime)
+    pymel.core.currentTime(startTime)
+
+def applyAnimationToLoadedRig(animPath, destinationFolder, rigPath, rigJoints, directTransfer=False,
+                              mappingRules=None, reduceTolerances=None, writeSidecar=False, takeInfo=None,
+                              resampleFps=None):
+    """
+    Given the path of an animation file, a destination folder, and the path
+    and joints of a rig that is already referenced into the scene, references
+    the animation, applies it to the rig, removes the animation reference
+    again and saves the result as rig_with_{animation file name}.ma . Returns
+    the path of the saved file. mappingRules are passed on to jointMapping;
+    if reduceTolerances is given, redundant baked keys are removed before
+    saving (see reduceBakedKeys), and with writeSidecar the baked curves are
+    also written to a binary sidecar (see writeBakedSidecar). takeInfo is the
+    take's animLibraryIndex entry; with it the whole keyed range is baked and
+    the first key doesn't have to be looked up in the scene. resampleFps
+    resamples the baked curves to that frame rate before any key reduction
+    (see resampleBakedKeys).
+    """
+    import batchManifest
 
-    createNewScene()
+    animNs = getFileNamespace(animPath)
 
     animRefNode = createReference(animPath, animNs)
-    rigRefNode = createReference(rigPath, rigNs)
     
     pymel.core.select(cl=True)
     animJoints = getJointsFromNamespace(animNs)
-    rigJoints = getJointsFromNamespace(rigNs)
     
-    firstKeyframe = pymel.core.findKeyframe(animJoints[0], which="first")
-    pymel.core.playbackOptions(animationStartTime=firstKeyframe, minTime=firstKeyframe)
-    pymel.core.currentTime(firstKeyframe)
-
-    connectAnimAndRigJoints(animJoints, rigJoints)
+    if takeInfo is None:
+        firstKeyframe = pymel.core.findKeyframe(animJoints[0], which="first")
+        pymel.core.playbackOptions(animationStartTime=firstKeyframe, minTime=firstKeyframe)
+        pymel.core.currentTime(firstKeyframe)
+    else:
+        setFrameRangeFromIndex(takeInfo)
 
     startTime = pymel.core.playbackOptions(q=True, min=True)
     endTime = pymel.core.playbackOptions(q=True, max=True)
-    
-    pymel.core.select(rigJoints)
+    pipelineTracing.addSpanArgs(frames=int(endTime - startTime) + 1, joints=len(rigJoints))
+
+    jointMap = getJointMapForTake(rigPath, animJoints, rigJoints, mappingRules)
+    constrainedJoints = connectAnimAndRigJoints(animJoints, rigJoints, directTransfer, (startTime, endTime), jointMap)
 
-    pymel.core.bakeResults(
-        simulation = True,
-        time = (startTime, endTime),
-        sampleBy = 1,
-        oversamplingRate = 1,
-        disableImplicitControl = True,
-        preserveOutsideKeys = True,
-        sparseAnimCurveBake = False,
-        removeBakedAnimFromLayer = False,
-        bakeOnOverrideLayer = False,
-        minimizeRotation = True,
-        controlPoints = False,
-        shape = True
-    )
+    # the regular path bakes every rig joint, the direct path only the ones
+    # that had to fall back on a constraint
+    jointsToBake = constrainedJoints if directTransfer else rigJoints
+    if jointsToBake:
+        with pipelineTracing.span("bakeResults", frames=int(endTime - startTime) + 1, joints=len(jointsToBake)):
+            pymel.core.select(jointsToBake)
+            pymel.core.bakeResults(time=(startTime, endTime), **BAKE_SETTINGS)
 
     removeReference(animRefNode)
 
+    if resampleFps:
+        resampleBakedKeys(rigJoints, resampleFps)
+    if reduceTolerances is not None:
+        reduceBakedKeys(animNs, rigJoints, reduceTolerances)
+
     # this was an attempt to get rid of the student license popup, and it successfully
     # removes the license line, but it doesn't stop the popup lol
     tempFilePath = "{0}/temp.ma".format(destinationFolder) 
-    finalFilePath = "{0}/rig_with_{1}.ma".format(destinationFolder, animNs)
+    finalFilePath = batchManifest.getOutputPath(animPath, destinationFolder)
     saveFile(tempFilePath, finalFilePath)
+    if writeSidecar:
+        writeBakedSidecar(finalFilePath, rigJoints)
+    return finalFilePath
+
+def applyAnimationForOneFile(animPath, destinationFolder, rigPath, directTransfer=False, mappingRules=None,
+                             reduceTolerances=None, writeSidecar=False, takeInfo=None, resampleFps=None):
+    """
+    Given the path of an animation file, a rig file, and a destination folder, 
+    applies the animation to the rig using references and parent constraints
+    and saves the resulting file to the destination folder using the name
+    rig_with_{animation file name}.ma . With directTransfer, joints that share
+    rest offsets have their curves copied over instead of being constrained
+    and baked (see connectAnimAndRigJoints). mappingRules control how anim
+    joints are matched to rig joints (see jointMapping.DEFAULT_RULES), and
+    reduceTolerances turns on key reduction after the bake (see reduceBakedKeys).
+    writeSidecar also saves the baked curves to a binary sidecar file,
+    takeInfo (the take's animLibraryIndex entry) sets the frame range and
+    resampleFps resamples the baked curves to that frame rate.
+    """
+    rigNs = getFileNamespace(rigPath)
+
+    with pipelineTracing.span("applyAnimationForOneFile", take=getFileNamespace(animPath)):
+        createNewScene()
+
+        rigRefNode = createReference(rigPath, rigNs)
+        rigJoints = getJointsFromNamespace(rigNs)
+
+        return applyAnimationToLoadedRig(animPath, destinationFolder, rigPath, rigJoints,
+                                         directTransfer=directTransfer, mappingRules=mappingRules,
+                                         reduceTolerances=reduceTolerances, writeSidecar=writeSidecar,
+                                         takeInfo=takeInfo, resampleFps=resampleFps)
+
+def applyAnimationToRigs(animPath, destinationFolder, rigPaths, directTransfer=False, mappingRules=None,
+                         reduceTolerances=None, writeSidecar=False, takeInfo=None, resampleFps=None):
+    """
+    Given the path of an animation file, a destination folder and a list of
+    rig files, applies the animation to every rig in one scene and saves
+    each rig to rig_{rig file name}_with_{animation file name}.ma (see
+    batchManifest.getMatrixOutputPath). The take is referenced once and all
+    rigs are baked in a single bakeResults call, so the animation is only
+    loaded and evaluated once however many rigs there are. The joint map is resolved
+    once per rig (and cached, see getJointMapForTake). Options are the same
+    as for applyAnimationForOneFile. Returns a dict of rig path -> saved file.
+    """
+    import batchManifest
+
+    animNs = getFileNamespace(animPath)
+
+    with pipelineTracing.span("applyAnimationToRigs", take=animNs, rigs=len(rigPaths)):
+        createNewScene()
+        rigJointsByPath = OrderedDict()
+        for rigPath in rigPaths:
+            rigNs = getFileNamespace(rigPath)
+            createReference(rigPath, rigNs)
+            rigJointsByPath[rigPath] = getJointsFromNamespace(rigNs)
+
+        animRefNode = createReference(animPath, animNs)
+        pymel.core.select(cl=True)
+        animJoints = getJointsFromNamespace(animNs)
+        if takeInfo is None:
+            firstKeyframe = pymel.core.findKeyframe(animJoints[0], which="first")
+            pymel.core.playbackOptions(animationStartTime=firstKeyframe, minTime=firstKeyframe)
+            pymel.core.currentTime(firstKeyframe)
+        else:
+            setFrameRangeFromIndex(takeInfo)
+        startTime = pymel.core.playbackOptions(q=True, min=True)
+        endTime = pymel.core.playbackOptions(q=True, max=True)
+
+        jointsToBake = []
+        for rigPath, rigJoints in rigJointsByPath.items():
+            jointMap = getJointMapForTake(rigPath, animJoints, rigJoints, mappingRules)
+            constrainedJoints = connectAnimAndRigJoints(animJoints, rigJoints, directTransfer,
+                                                        (startTime, endTime), jointMap)
+            jointsToBake.extend(constrainedJoints if directTransfer else rigJoints)
+        if jointsToBake:
+            with pipelineTracing.span("bakeResults", frames=int(endTime - startTime) + 1, joints=len(jointsToBake)):
+                pymel.core.select(jointsToBake)
+                pymel.core.bakeResults(time=(startTime, endTime), **BAKE_SETTINGS)
+
+        removeReference(animRefNode)
+
+        outputPaths = OrderedDict()
+        for rigPath, rigJoints in rigJointsByPath.items():
+            if resampleFps:
+                resampleBakedKeys(rigJoints, resampleFps)
+            if reduceTolerances is not None:
+                reduceBakedKeys("{0} on {1}".format(animNs, getFileNamespace(rigPath)), rigJoints, reduceTolerances)
+            outputPath = batchManifest.getMatrixOutputPath(animPath, rigPath, destinationFolder)
+            exportRig(outputPath, rigJoints)
+            if writeSidecar:
+                writeBakedSidecar(outputPath, rigJoints)
+            outputPaths[rigPath] = outputPath
+        return outputPaths
+
+#################
+# WARM RIG MODE #
+#################
+
+class WarmRigSession(object):
+    """
+    Keeps one rig referenced in the scene across takes. The rig is loaded
+    once; for each take only the animation reference is swapped in, and
+    afterwards everything the take added is removed again so the next take
+    starts from the same state a fresh scene would give it. If the rig
+    reference still carries edits after that clean-up, it is unloaded,
+    cleaned and reloaded so the output stays identical to a cold run.
+    """
+
+    def __init__(self, rigPath):
+        self.rigPath = rigPath
+        self.rigNs = getFileNamespace(rigPath)
+        self.takeReports = []
+
+        loadStartTime = time.time()
+        createNewScene()
+        self.rigRefNode = createReference(rigPath, self.rigNs)
+        self.rigJoints = getJointsFromNamespace(self.rigNs)
+        self.loadSeconds = time.time() - loadStartTime
+        self.captureSceneState()
+
+    def captureSceneState(self):
+        """
+        Records the state reset() returns the scene to: the nodes in the
+        scene, the rig's rest pose and the time range. Called again whenever
+        the rig is reloaded, since that replaces the rig's nodes.
+        """
+        self.sceneNodes = set(pymel.core.ls())
+        self.playbackRange = {
+            "minTime": pymel.core.playbackOptions(q=True, min=True),
+            "maxTime": pymel.core.playbackOptions(q=True, max=True),
+            "animationStartTime": pymel.core.playbackOptions(q=True, animationStartTime=True),
+            "animationEndTime": pymel.core.playbackOptions(q=True, animationEndTime=True),
+        }
+        self.currentTime = pymel.core.currentTime(q=True)
+        self.restPose = {}
+        for rigJoint in self.rigJoints:
+            for attribute in rigJoint.listAttr(keyable=True, scalar=True):
+                self.restPose[attribute] = attribute.get()
+
+    def applyAnimation(self, animPath, destinationFolder, directTransfer=False, mappingRules=None,
+                       reduceTolerances=None, writeSidecar=False, takeInfo=None, resampleFps=None):
+        """
+        Given the path of an animation file and a destination folder, applies
+        the animation to the warm rig, saves it and resets the rig for the
+        next take. Returns the path of the saved file.
+        """
+        takeStartTime = time.time()
+        with pipelineTracing.span("warmRigTake", take=getFileNamespace(animPath)):
+            finalFilePath = applyAnimationToLoadedRig(animPath, destinationFolder, self.rigPath, self.rigJoints,
+                                                      directTransfer=directTransfer, mappingRules=mappingRules,
+                                                      reduceTolerances=reduceTolerances,
+                                                      writeSidecar=writeSidecar, takeInfo=takeInfo,
+                                                      resampleFps=resampleFps)
+            resetStartTime = time.time()
+            with pipelineTracing.span("resetWarmRig"):
+                reloaded = self.reset()
+            resetSeconds = time.time() - resetStartTime
+        self.takeReports.append({
+            "animPath": animPath,
+            "outputPath": finalFilePath,
+            "seconds": time.time() - takeStartTime,
+            "resetSeconds": resetSeconds,
+            # a take that reloaded the rig saved nothing
+            "savedSeconds": 0.0 if reloaded else max(self.loadSeconds - resetSeconds, 0.0),
+            "reloaded": reloaded,
+        })
+        return finalFilePath
+
+    def reset(self):
+        """
+        Deletes every node created since the rig was loaded (constraints,
+        baked curves...), puts the rig back in its rest pose and restores the
+        time range. Returns True if the rig reference had to be reloaded.
+        """
+        newNodes = [node for node in pymel.core.ls() if node not in self.sceneNodes]
+        if newNodes:
+            pymel.core.delete(newNodes)
+        for attribute, value in self.restPose.items():
+            if not attribute.isLocked() and not attribute.isConnected():
+                attribute.set(value)
+        pymel.core.playbackOptions(**self.playbackRange)
+        pymel.core.currentTime(self.currentTime)
+
+        pymel.core.referenceEdit(self.rigRefNode.refNode, failedEdits=True,
+                                 successfulEdits=False, removeEdits=True)
+        if not self.rigRefNode.getReferenceEdits():
+            return False
+        self.rigRefNode.unload()
+        self.rigRefNode.removeReferenceEdits()
+        self.rigRefNode.load()
+        self.rigJoints = getJointsFromNamespace(self.rigNs)
+        self.captureSceneState()
+        return True
+
+    def getSavedSeconds(self):
+        """
+        Returns an estimate of the load time saved compared to loading the
+        rig for every take: the first load time minus the reset time, for
+        each take that didn't have to reload the rig.
+        """
+        return sum(report["savedSeconds"] for report in self.takeReports)
 
 #################
 # MAIN FUNCTION #
 #################
 
-def applyAnimationForAllFilesInFolder(animFolder, destFolder, rigPath):
+def validateAnimationFiles(animationFiles, rigPaths, destFolder, matrix=False):
+    """
+    Given a list of animation files, the rigs they are applied to and a
+    destination folder, checks every file against every rig without Maya
+    (see validateTakes), saves the report to the destination folder (one
+    per rig in matrix mode) and returns the files without errors.
+    """
+    import validateTakes
+
+    invalidTakes = set()
+    for rigPath in rigPaths:
+        report = validateTakes.validateTakes(animationFiles, rigPath, processes=SESSION_PROCESSES)
+        reportName = validateTakes.REPORT_FILE_NAME
+        if matrix:
+            reportName = "{0}_{1}".format(getFileNamespace(rigPath), reportName)
+        validateTakes.writeReport(os.path.join(destFolder, reportName), report)
+        for result in report["takes"]:
+            if result["status"] == "error":
+                pymel.core.warning("Skipping {0}: {1}".format(result["name"], "; ".join(result["errors"])))
+        invalidTakes.update(validateTakes.getInvalidTakes(report))
+    return [animationFile for animationFile in animationFiles if animationFile not in invalidTakes]
+
+def getBatchJobs(animationFiles, rigPaths, destFolder, matrix=False):
+    """
+    Given a list of animation files, the rigs they are applied to and a
+    destination folder, returns the manifest job of every output: one per
+    take, or one per take and rig in matrix mode.
+    """
+    import batchManifest
+
+    if not matrix:
+        return [batchManifest.createJob(batchManifest.getOutputPath(animationFile, destFolder),
+                                        {"anim": animationFile, "rig": rigPaths[0]})
+                for animationFile in animationFiles]
+    return [batchManifest.createJob(batchManifest.getMatrixOutputPath(animationFile, rigPath, destFolder),
+                                    {"anim": animationFile, "rig": rigPath})
+            for animationFile in animationFiles for rigPath in rigPaths]
+
+def applyAnimationForAllFilesInFolder(animFolder, destFolder, rigPath, options=None, warmRig=False,
+                                      incremental=False, tracePath=None, indexPath=None, prefetch=0,
+                                      prefetchBudgetBytes=None, cacheSources=False, validate=False):
     """
     Given the path of a folder of animation files and the path of a rig file, 
     applies each animation to the given rig one by one and saves each one to the 
-    destination folder.
+    destination folder. Given a list of rig files instead, each animation is
+    applied to all of them at once (see applyAnimationToRigs). options is a
+    dict of applyAnimationForOneFile options (see BAKE_OPTION_DEFAULTS) used
+    for every take. With warmRig, the rig is only loaded once for the whole
+    folder (see WarmRigSession). With incremental, takes whose output is
+    already up to date according to the destination folder's manifest are
+    skipped. With tracePath, every step is traced and written there as a
+    Chrome trace plus a summary (see pipelineTracing). With indexPath, the
+    folder's animLibraryIndex is brought up to date first and each take's
+    frame range comes from it. With prefetch, up to that many upcoming takes
+    are copied to local disk on background threads while the current one
+    bakes (see prefetchTakes), and each take is referenced from its local
+    copy. With cacheSources, the rig and takes are referenced from the local
+    source cache (see sourceCache), so unchanged files don't cross the
+    network again on the next run. With validate, files with errors are
+    skipped (see validateAnimationFiles).
     """
+    import batchApplyAnim
+    import batchManifest
+
+    rigPaths = list(rigPath) if isinstance(rigPath, (list, tuple)) else [rigPath]
+    matrix = isinstance(rigPath, (list, tuple))
+    if matrix and warmRig:
+        pymel.core.error("Warm rig mode only supports a single rig")
+        return
+    duplicateRigNames = batchManifest.getDuplicateRigNames(rigPaths)
+    if duplicateRigNames:
+        pymel.core.error("Rigs applied together need different file names: {0}".format(
+            ", ".join(duplicateRigNames)))
+        return
+    options = dict(BAKE_OPTION_DEFAULTS, **(options or {}))
+    if cacheSources:
+        import sourceCache
+        if not sourceCache.activeCache:
+            sourceCache.enableCache()
     if not os.path.exists(destFolder):
         os.mkdir(destFolder)
-    animationFiles = [animFolder + fileName for fileName in os.listdir(animFolder)]
-    for animationFile in animationFiles:
-        applyAnimationForOneFile(animationFile, destFolder, rigPath)
-        # break # uncomment to run only one loop interation for easier testing
+    # the take folder can also hold the take index and .maindex caches
+    animationFiles = batchApplyAnim.getAnimationFiles(animFolder)
+    if validate:
+        animationFiles = validateAnimationFiles(animationFiles, rigPaths, destFolder, matrix)
+
+    takeInfos = dict((animationFile, None) for animationFile in animationFiles)
+    if indexPath:
+        import animLibraryIndex
+        animLibraryIndex.updateIndex(animationFiles, indexPath, processes=SESSION_PROCESSES, removeMissing=False)
+        takeInfos = animLibraryIndex.getTakeInfos(indexPath, animationFiles)
+    # the index bakes each take's whole keyed range, so it changes the output
+    settings = batchManifest.getBakeSettings(dict(options, frameRangeFromIndex=True) if indexPath else options)
+    manifest = batchManifest.loadManifest(destFolder)
+    jobs = getBatchJobs(animationFiles, rigPaths, destFolder, matrix)
+    if incremental:
+        plan = batchManifest.planIncrementalBatch(manifest, jobs, settings)
+        jobs = plan["build"]
+        print("{0} takes up to date, {1} to build".format(len(plan["skip"]), len(jobs)))
+        for outputName in plan["orphaned"]:
+            pymel.core.warning("Source of {0} was removed".format(outputName))
+
+    # in matrix mode a take has one job per rig that needs building
+    takeJobs = OrderedDict()
+    for job in jobs:
+        takeJobs.setdefault(job["inputs"]["anim"], []).append(job)
+    warmRigSession = None
+    prefetcher = None
+    if tracePath:
+        pipelineTracing.startTracing()
+    try:
+        if warmRig and jobs:
+            warmRigSession = WarmRigSession(rigPath)
+        if prefetch and jobs:
+            import prefetchTakes
+            prefetcher = prefetchTakes.TakePrefetcher(list(takeJobs), queueDepth=prefetch,
+                                                      budgetBytes=prefetchBudgetBytes or prefetchTakes.BUDGET_BYTES)
+        for animationFile, animJobs in takeJobs.items():
+            # the staged copy has the same file name, so the namespace and
+            # output name don't change; takes staged into the source cache are
+            # picked up from it by createReference
+            stagedTake = prefetcher.get(animationFile) if prefetcher else None
+            animPath = stagedTake.localPath if stagedTake and not stagedTake.cached else animationFile
+            if matrix:
+                applyAnimationToRigs(animPath, destFolder, [job["inputs"]["rig"] for job in animJobs],
+                                     takeInfo=takeInfos[animationFile], **options)
+            elif warmRigSession:
+                warmRigSession.applyAnimation(animPath, destFolder, takeInfo=takeInfos[animationFile], **options)
+            else:
+                applyAnimationForOneFile(animPath, destFolder, rigPath, takeInfo=takeInfos[animationFile],
+                                         **options)
+            if stagedTake:
+                prefetcher.release(stagedTake)
+            for job in animJobs:
+                batchManifest.recordOutput(manifest, job, settings)
+            batchManifest.saveManifest(destFolder, manifest)
+            # break # uncomment to run only one loop interation for easier testing
+    finally:
+        if prefetcher:
+            prefetcher.close()
+        # also stopped when a take fails, so tracing doesn't stay on for the
+        # rest of the Maya session
+        if tracePath:
+            pipelineTracing.writeTrace(tracePath, pipelineTracing.stopTracing())
+    if prefetcher:
+        print(prefetcher.getSummary())
+    if cacheSources:
+        print(sourceCache.getStatsSummary(sourceCache.activeCache.stats))
+    if warmRigSession:
+        takeReports = warmRigSession.takeReports
+        print("Warm rig saved an estimated {0:.1f}s of rig loading ({1} of {2} takes without a reload)".format(
+            warmRigSession.getSavedSeconds(), sum(not report["reloaded"] for report in takeReports),
+            len(takeReports)))
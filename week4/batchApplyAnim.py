@@ -0,0 +1,573 @@
+'''
+Usage - run this from mayapy (or plain python with --backend local)
+
+mayapy batchApplyAnim.py <animation folder> <destination folder> <rig file> --processes 4
+
+Applies every take in the animation folder to the rig in separate headless worker
+processes. Each worker starts Maya standalone once and reuses it for all of its
+takes; a take that fails is recorded and retried without stopping the others.
+'''
+
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+
+import batchManifest
+import pipelineTracing
+import sourceCache
+
+#############
+# CONSTANTS #
+#############
+
+# file types that can be referenced as an animation take
+ANIMATION_EXTENSIONS = (".ma", ".mb")
+
+# how often the schedulers check on their workers, in seconds
+POLL_INTERVAL = 0.05
+
+# a worker that dies this many times in a row before it is ready means the
+# backend can't start at all (e.g. no Maya license), so give up
+MAX_STARTUP_FAILURES = 3
+
+###################
+# WORKER BACKENDS #
+###################
+
+class MayaWorkerBackend(object):
+    """
+    Applies takes with applyAnimWithBatching inside a Maya standalone session.
+    initialize() is called once per worker process, so Maya is only started
+    once per worker no matter how many takes it processes. With the warmRig
+    option each worker also keeps its rig loaded between takes, and with the
+    cacheSources backend option the rig and takes are referenced from the
+    local source cache (see sourceCache).
+    """
+
+    def __init__(self, **backendOptions):
+        self.backendOptions = backendOptions
+        self.applyAnimWithBatching = None
+        self.warmRigSessions = {}
+
+    def initialize(self):
+        import maya.standalone
+        maya.standalone.initialize(name="python")
+        import applyAnimWithBatching
+        self.applyAnimWithBatching = applyAnimWithBatching
+        if self.backendOptions.get("cacheSources"):
+            sourceCache.enableCache()
+
+    def processTask(self, task):
+        options = dict(task["options"], takeInfo=task.get("takeInfo"))
+        if not options.pop("warmRig", False):
+            outputPath = self.applyAnimWithBatching.applyAnimationForOneFile(
+                task["animPath"], task["destFolder"], task["rigPath"], **options)
+            return {"outputPath": outputPath}
+
+        session = self.warmRigSessions.get(task["rigPath"])
+        if session is None:
+            # only one rig stays warm per worker
+            self.warmRigSessions.clear()
+            session = self.applyAnimWithBatching.WarmRigSession(task["rigPath"])
+            self.warmRigSessions[task["rigPath"]] = session
+        session.applyAnimation(task["animPath"], task["destFolder"], **options)
+        return dict(session.takeReports[-1])
+
+class LocalWorkerBackend(object):
+    """
+    Stand-in worker for running the scheduler without Maya. Instead of
+    referencing and baking it reads the take with the Maya-free reader (so
+    its cost still grows with the take) and writes a small placeholder
+    output (plus a sidecar of the take's own curves with writeSidecar).
+    Takes named in failFiles always raise, takes in flakyFiles raise
+    on their first attempt only, and delay adds seconds of fake bake time.
+    Takes in crashFiles kill the worker process outright (like Maya
+    crashing) and takes in hangFiles never return. With cacheSources, takes
+    are read through the local source cache.
+    """
+
+    def __init__(self, failFiles=(), flakyFiles=(), delay=0.0, crashFiles=(), hangFiles=(), cacheSources=False):
+        self.failFiles = set(failFiles)
+        self.flakyFiles = set(flakyFiles)
+        self.delay = delay
+        self.crashFiles = set(crashFiles)
+        self.hangFiles = set(hangFiles)
+        self.cacheSources = cacheSources
+
+    def initialize(self):
+        if self.cacheSources:
+            sourceCache.enableCache()
+
+    def processTask(self, task):
+        import readAnimCurves
+
+        takeName = os.path.basename(task["animPath"])
+        if takeName in self.failFiles:
+            raise RuntimeError("Simulated failure for {0}".format(takeName))
+        if takeName in self.flakyFiles and task["attempt"] == 1:
+            raise RuntimeError("Simulated flaky failure for {0}".format(takeName))
+        if takeName in self.crashFiles:
+            os._exit(3)
+        while takeName in self.hangFiles:
+            time.sleep(60)
+        with pipelineTracing.span("readAnimTake", bytes=os.path.getsize(task["animPath"])):
+            take = readAnimCurves.readAnimTake(sourceCache.getLocalPath(task["animPath"]))
+        time.sleep(self.delay)
+        outputPath = task["outputPath"]
+        with open(outputPath, "w") as output:
+            output.write("// Placeholder written by LocalWorkerBackend\n")
+            output.write("// {0} curves, {1} keys\n".format(len(take.curves), take.getKeyCount()))
+        if task["options"].get("writeSidecar"):
+            import curveSidecar
+            curveSidecar.writeTakeSidecar(take, curveSidecar.getSidecarPath(outputPath))
+        return {"outputPath": outputPath}
+
+# backends that can be picked by name from the command line
+WORKER_BACKENDS = {
+    "maya": MayaWorkerBackend,
+    "local": LocalWorkerBackend,
+}
+
+##################
+# HELPER METHODS #
+##################
+
+def getAnimationFiles(animFolder):
+    """
+    Given the path of a folder of animation files, returns the sorted paths
+    of every Maya file in it, skipping anything else in the folder.
+    """
+    fileNames = sorted(os.listdir(animFolder))
+    return [os.path.join(animFolder, fileName) for fileName in fileNames
+            if os.path.splitext(fileName)[1].lower() in ANIMATION_EXTENSIONS]
+
+def createWorkerBackend(backend, backendOptions=None):
+    """
+    Given a backend name (or class) and its options, returns a new backend.
+    """
+    backendClass = WORKER_BACKENDS[backend] if backend in WORKER_BACKENDS else backend
+    return backendClass(**(backendOptions or {}))
+
+##################
+# WORKER PROCESS #
+##################
+
+# set once per worker process by initializeWorker
+workerBackend = None
+workerInitSeconds = 0.0
+
+def initializeWorker(backend, backendOptions, tracing=False):
+    """
+    Called once in each worker process (see runWorker): creates this
+    worker's backend and starts it.
+    With tracing, the worker records spans for every take (see runTask).
+    """
+    global workerBackend, workerInitSeconds
+    if tracing:
+        pipelineTracing.startTracing()
+    startTime = time.time()
+    workerBackend = createWorkerBackend(backend, backendOptions)
+    workerBackend.initialize()
+    workerInitSeconds = time.time() - startTime
+
+def runTask(task):
+    """
+    Runs one take on this worker's backend. Never raises: errors are
+    returned in the result so one bad take can't take down the batch.
+    Backends return a dict of extra result fields, at least outputPath.
+    If the worker is tracing, the take's spans are returned under "spans".
+    """
+    startTime = time.time()
+    startCpu = time.process_time() if hasattr(time, "process_time") else time.clock()
+    result = {
+        "animPath": task["animPath"],
+        "attempt": task["attempt"],
+        "pid": os.getpid(),
+        "workerInitSeconds": workerInitSeconds,
+        "outputPath": None,
+        "error": None,
+        "traceback": None,
+    }
+    try:
+        with pipelineTracing.span("runTask", take=os.path.splitext(os.path.basename(task["animPath"]))[0],
+                                  attempt=task["attempt"]):
+            result.update(workerBackend.processTask(task))
+        result["status"] = "ok"
+    except Exception as error:
+        result["status"] = "failed"
+        result["error"] = "{0}: {1}".format(type(error).__name__, error)
+        result["traceback"] = traceback.format_exc()
+    endCpu = time.process_time() if hasattr(time, "process_time") else time.clock()
+    result["seconds"] = time.time() - startTime
+    result["cpuSeconds"] = endCpu - startCpu
+    if pipelineTracing.isTracing():
+        result["spans"] = pipelineTracing.popSpans()
+    return result
+
+def runWorker(backend, backendOptions, tracing, connection):
+    """
+    Worker process: starts the backend once, says it is ready, then runs
+    every task it is sent (see runTask) until it gets None.
+    """
+    # Ctrl+C is for the scheduler, which stops the workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    initializeWorker(backend, backendOptions, tracing)
+    connection.send({"event": "ready"})
+    while True:
+        task = connection.recv()
+        if task is None:
+            break
+        connection.send(runTask(task))
+    sourceCache.flushStats()
+
+class WorkerProcess(object):
+    """
+    One worker process and the take it is running, seen from the scheduler.
+    Each worker runs one take at a time, so a take's timeout starts when it
+    is sent, and a worker that hangs or crashes can be killed on its own.
+    """
+
+    def __init__(self, backend, backendOptions, tracing=False):
+        self.connection, workerConnection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=runWorker,
+                                               args=(backend, backendOptions, tracing, workerConnection))
+        self.process.daemon = True
+        self.process.start()
+        self.ready = False
+        self.task = None
+        self.deadline = None
+
+    def send(self, task, timeout):
+        self.task = task
+        self.deadline = time.time() + timeout if timeout else None
+        self.connection.send(task)
+
+    def poll(self):
+        """
+        Returns the message the worker sent, or None if it hasn't sent one.
+        """
+        try:
+            if self.connection.poll():
+                return self.connection.recv()
+        except (EOFError, IOError, OSError):
+            pass
+        return None
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+
+    def stop(self):
+        try:
+            self.connection.send(None)
+        except (IOError, OSError):
+            pass
+        self.process.join(5)
+        self.kill()
+
+#############
+# SCHEDULER #
+#############
+
+def runBatch(animationFiles, destFolder, rigPath, processes=None, backend="maya",
+             backendOptions=None, retries=1, taskTimeout=None, options=None,
+             incremental=False, progressCallback=None, tracePath=None, cancelEvent=None,
+             outputPathFunction=batchManifest.getOutputPath, indexPath=None):
+    """
+    Given a list of animation files, a destination folder and a rig file,
+    applies every take in worker processes (see WorkerProcess) and returns a
+    summary dict with one result per take (status, error, attempts, timings).
+
+    The backend (a name from WORKER_BACKENDS or a backend class) does the
+    work for each take; outputPathFunction(take, destFolder) names its
+    output, and rigPath may be None for backends that don't use a rig (e.g.
+    batchExportAnim).
+
+    Failed takes are retried up to retries more times. A take whose worker
+    crashes fails that attempt and the worker is replaced. If taskTimeout is
+    set, a take that hasn't reported back that many seconds after its worker
+    started it fails the attempt the same way, and its worker is killed.
+    progressCallback, if given, is called with each final result as it
+    comes in.
+
+    Every finished output is recorded in the destination folder's manifest.
+    With incremental, takes whose output is already up to date are skipped
+    (reported with status "skipped") and outputs whose source take was
+    removed are listed under "orphaned".
+
+    With tracePath, every worker traces its takes and all spans (failed
+    attempts included) are written there as one Chrome trace plus a summary.
+
+    If cancelEvent (a threading.Event) gets set, the workers are stopped and
+    every take that hadn't finished is reported with status "cancelled".
+    Finished takes stay in the manifest, so an incremental rerun resumes.
+
+    With indexPath, the animLibraryIndex there is brought up to date for
+    these takes and each task gets its take's entry as "takeInfo" (frame
+    range without loading the scene). The biggest takes are then started
+    first, so one long take doesn't hold up the end of the batch.
+    """
+    if not os.path.exists(destFolder):
+        os.makedirs(destFolder)
+    batchStartTime = time.time()
+
+    takeInfos = dict((animPath, None) for animPath in animationFiles)
+    if indexPath:
+        import animLibraryIndex
+        animLibraryIndex.updateIndex(animationFiles, indexPath, processes, removeMissing=False)
+        takeInfos = animLibraryIndex.getTakeInfos(indexPath, animationFiles)
+        animationFiles = sorted(animationFiles, key=lambda animPath: -(takeInfos[animPath] or {}).get("keyCount", 0))
+    # the index bakes each take's whole keyed range, so it changes the output
+    settings = batchManifest.getBakeSettings(dict(options or {}, frameRangeFromIndex=True) if indexPath else options)
+    manifest = batchManifest.loadManifest(destFolder)
+    inputs = {"rig": rigPath} if rigPath else {}
+    jobs = dict((animPath, batchManifest.createJob(outputPathFunction(animPath, destFolder),
+                                                   dict(inputs, anim=animPath)))
+                for animPath in animationFiles)
+    skipped = []
+    orphaned = []
+    if incremental:
+        plan = batchManifest.planIncrementalBatch(manifest, [jobs[animPath] for animPath in animationFiles],
+                                                  settings)
+        orphaned = plan["orphaned"]
+        for job in plan["skip"]:
+            skipped.append({
+                "animPath": job["inputs"]["anim"],
+                "status": "skipped",
+                "outputPath": job["outputPath"],
+                "error": None,
+                "attempt": None,
+            })
+            if progressCallback:
+                progressCallback(skipped[-1])
+        skippedFiles = set(result["animPath"] for result in skipped)
+        animationFiles = [animPath for animPath in animationFiles if animPath not in skippedFiles]
+
+    processes = min(processes or multiprocessing.cpu_count(), max(len(animationFiles), 1))
+    pending = [(animPath, 1) for animPath in animationFiles]
+    workers = []
+    finished = []
+    cancelled = []
+    spans = []
+    startupFailures = 0
+
+    def finishAttempt(result):
+        spans.extend(result.pop("spans", []))
+        if result["status"] != "ok" and result["attempt"] <= retries:
+            pending.append((result["animPath"], result["attempt"] + 1))
+            return
+        if result["status"] == "ok":
+            batchManifest.recordOutput(manifest, jobs[result["animPath"]], settings)
+            batchManifest.saveManifest(destFolder, manifest)
+        finished.append(result)
+        if progressCallback:
+            progressCallback(result)
+
+    try:
+        while pending or any(worker.task for worker in workers):
+            if cancelEvent is not None and cancelEvent.is_set():
+                finishedFiles = set(result["animPath"] for result in finished)
+                for animPath in animationFiles:
+                    if animPath in finishedFiles:
+                        continue
+                    cancelled.append({
+                        "animPath": animPath,
+                        "status": "cancelled",
+                        "error": None,
+                        "attempt": None,
+                        "outputPath": None,
+                    })
+                    if progressCallback:
+                        progressCallback(cancelled[-1])
+                break
+
+            while len(workers) < processes and (pending or any(worker.task for worker in workers)):
+                workers.append(WorkerProcess(backend, backendOptions, bool(tracePath)))
+
+            for worker in list(workers):
+                message = worker.poll()
+                if message is not None and message.get("event") == "ready":
+                    worker.ready = True
+                    startupFailures = 0
+                elif message is not None and worker.task is not None:
+                    worker.task = None
+                    finishAttempt(message)
+
+                if worker.task is not None and worker.deadline is not None and time.time() > worker.deadline:
+                    worker.kill()
+                    error = "Timed out after {0} seconds".format(taskTimeout)
+                elif not worker.process.is_alive():
+                    worker.process.join()
+                    error = "Worker crashed (exit code {0})".format(worker.process.exitcode)
+                else:
+                    continue
+                workers.remove(worker)
+                if not worker.ready:
+                    startupFailures += 1
+                    if startupFailures >= MAX_STARTUP_FAILURES:
+                        raise RuntimeError("Workers keep dying before they are ready: {0}".format(error))
+                if worker.task is not None:
+                    finishAttempt({
+                        "animPath": worker.task["animPath"],
+                        "status": "failed",
+                        "error": error,
+                        "attempt": worker.task["attempt"],
+                        "outputPath": None,
+                    })
+
+            for worker in workers:
+                if worker.ready and worker.task is None and pending:
+                    animPath, attempt = pending.pop(0)
+                    # the timeout only starts now that a worker has the take
+                    worker.send({
+                        "animPath": animPath,
+                        "destFolder": destFolder,
+                        "rigPath": rigPath,
+                        "outputPath": jobs[animPath]["outputPath"],
+                        "options": options or {},
+                        "takeInfo": takeInfos[animPath],
+                        "attempt": attempt,
+                    }, taskTimeout)
+            time.sleep(POLL_INTERVAL)
+    finally:
+        for worker in workers:
+            if worker.task is None and not cancelled:
+                worker.stop()
+            else:
+                worker.kill()
+
+    if tracePath:
+        pipelineTracing.writeTrace(tracePath, spans)
+    failed = [result for result in finished if result["status"] != "ok"]
+    return {
+        "results": skipped + finished + cancelled,
+        "succeeded": len(finished) - len(failed),
+        "failed": len(failed),
+        "skipped": len(skipped),
+        "cancelled": len(cancelled),
+        "orphaned": orphaned,
+        "seconds": time.time() - batchStartTime,
+    }
+
+##########
+# SCRIPT #
+##########
+
+def getIndexArgument(indexArgument, animFolder):
+    """
+    Given the value of --index (None, True for a bare --index, or a path)
+    and the animation folder, returns the index path to use or None.
+    """
+    if indexArgument is True:
+        import animLibraryIndex
+        return animLibraryIndex.getIndexPath(animFolder)
+    return indexArgument
+
+def listenForCancel(cancelEvent):
+    """
+    Given a threading.Event, starts a background thread that sets it as
+    soon as a line reading "cancel" arrives on stdin (e.g. from the dialog).
+    """
+    def readStdin():
+        for line in iter(sys.stdin.readline, ""):
+            if line.strip() == "cancel":
+                cancelEvent.set()
+                return
+
+    listener = threading.Thread(target=readStdin)
+    listener.daemon = True
+    listener.start()
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply a folder of takes to a rig in parallel.")
+    parser.add_argument("animFolder")
+    parser.add_argument("destFolder")
+    parser.add_argument("rigPath")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--backend", choices=sorted(WORKER_BACKENDS), default="maya")
+    parser.add_argument("--retries", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=None)
+    parser.add_argument("--direct-transfer", action="store_true")
+    parser.add_argument("--warm-rig", action="store_true", help="keep the rig loaded between takes")
+    parser.add_argument("--incremental", action="store_true", help="skip takes whose output is up to date")
+    parser.add_argument("--reduce-keys", action="store_true", help="remove redundant baked keys before saving")
+    parser.add_argument("--resample-fps", type=float, default=None,
+                        help="resample the baked curves to this frame rate (e.g. 30 for game delivery)")
+    parser.add_argument("--write-sidecar", action="store_true", help="also save the baked curves as a binary sidecar")
+    parser.add_argument("--trace", help="write a Chrome trace of every take to this file (plus a summary)")
+    parser.add_argument("--index", nargs="?", const=True,
+                        help="take frame ranges from this animLibraryIndex (default: the one in the animation folder)")
+    parser.add_argument("--validate", action="store_true",
+                        help="check every take against the rig without Maya first and skip takes with errors")
+    parser.add_argument("--cache-sources", action="store_true",
+                        help="reference the rig and takes from local cached copies (see sourceCache)")
+    parser.add_argument("--json", action="store_true", help="print one JSON line per take")
+    parser.add_argument("--stdin-cancel", action="store_true", help='stop the batch when "cancel" is read from stdin')
+    args = parser.parse_args()
+
+    cancelEvent = threading.Event()
+    if args.stdin_cancel:
+        listenForCancel(cancelEvent)
+    animationFiles = getAnimationFiles(args.animFolder)
+    if args.validate:
+        import validateTakes
+        report = validateTakes.validateTakes(animationFiles, args.rigPath, processes=args.processes)
+        if not os.path.exists(args.destFolder):
+            os.makedirs(args.destFolder)
+        validateTakes.writeReport(os.path.join(args.destFolder, validateTakes.REPORT_FILE_NAME), report)
+        invalidTakes = validateTakes.getInvalidTakes(report)
+        for result in report["takes"]:
+            if result["path"] in invalidTakes and not args.json:
+                print("invalid  {0} {1}".format(result["name"], "; ".join(result["errors"])))
+        animationFiles = [animPath for animPath in animationFiles if animPath not in invalidTakes]
+    if args.json:
+        print(json.dumps({"event": "start", "takes": len(animationFiles)}))
+        sys.stdout.flush()
+
+    def printResult(result):
+        if args.json:
+            print(json.dumps(dict(result, event="result")))
+        else:
+            print("{0:8} {1} {2}".format(result["status"], os.path.basename(result["animPath"]),
+                                         result["error"] or ""))
+        sys.stdout.flush()
+
+    cacheStats = sourceCache.SourceCache().getTotalStats() if args.cache_sources else None
+    summary = runBatch(
+        animationFiles, args.destFolder, args.rigPath,
+        processes=args.processes, backend=args.backend, retries=args.retries,
+        backendOptions={"cacheSources": True} if args.cache_sources else None,
+        taskTimeout=args.timeout, options={"directTransfer": args.direct_transfer, "warmRig": args.warm_rig,
+                                           "reduceTolerances": {} if args.reduce_keys else None,
+                                           "writeSidecar": args.write_sidecar, "resampleFps": args.resample_fps},
+        incremental=args.incremental, progressCallback=printResult, tracePath=args.trace,
+        cancelEvent=cancelEvent, indexPath=getIndexArgument(args.index, args.animFolder))
+    savedSeconds = sum(result.get("savedSeconds", 0.0) for result in summary["results"])
+    if args.json:
+        print(json.dumps({"event": "summary", "succeeded": summary["succeeded"],
+                          "failed": summary["failed"], "skipped": summary["skipped"],
+                          "cancelled": summary["cancelled"], "orphaned": summary["orphaned"], "seconds": summary["seconds"],
+                          "savedSeconds": savedSeconds}))
+    else:
+        for outputName in summary["orphaned"]:
+            print("orphaned {0} (source take was removed)".format(outputName))
+        print("{0} succeeded, {1} failed, {2} skipped, {3} cancelled in {4:.1f}s".format(
+            summary["succeeded"], summary["failed"], summary["skipped"], summary["cancelled"],
+            summary["seconds"]))
+        if args.warm_rig:
+            print("Warm rig saved an estimated {0:.1f}s of rig loading".format(savedSeconds))
+        if cacheStats is not None:
+            # the workers kept their own counts, stats.json has all of them
+            totals = sourceCache.SourceCache().getTotalStats()
+            print(sourceCache.getStatsSummary(dict((key, totals[key] - cacheStats[key]) for key in totals)))
+    sys.exit(1 if summary["failed"] or summary["cancelled"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+'''
+Usage - run this from mayapy (or plain python with --backend local)
+
+mayapy batchExportAnim.py <folder of rig_with_*.ma files> <fbx folder> --processes 4 --incremental
+
+Exports the animation of every scene in the folder to a Z up FBX for Unreal,
+using the same worker pool, retries and manifest as batchApplyAnim. Each
+worker starts Maya standalone and sets up the FBX exporter once, then only
+opens scenes and exports. With --incremental, scenes whose FBX is already up
+to date are skipped. With --index, each scene's bake range is its first to
+last key from animLibraryIndex instead of the saved playback range.
+'''
+
+import argparse
+import json
+import os
+import sys
+
+import batchApplyAnim
+
+#############
+# CONSTANTS #
+#############
+
+# the rig's skeleton root in the saved rig_with_* scenes
+DEFAULT_ROOT = "character:Reference"
+
+###################
+# WORKER BACKENDS #
+###################
+
+class MayaExportBackend(object):
+    """
+    Exports scenes with exportAnimation inside a Maya standalone session.
+    The FBX plugin is loaded and configured once per worker in initialize();
+    each task only opens its scene, sets the bake range and exports.
+    """
+
+    def __init__(self, root=DEFAULT_ROOT, upAxis="z", ascii=True):
+        self.root = root
+        self.upAxis = upAxis
+        self.ascii = ascii
+        self.exportAnimation = None
+
+    def initialize(self):
+        import maya.standalone
+        maya.standalone.initialize(name="python")
+        import exportAnimation
+        exportAnimation.configure_fbx_export(ascii=self.ascii, up_axis=self.upAxis)
+        self.exportAnimation = exportAnimation
+
+    def processTask(self, task):
+        import pymel.core
+
+        pymel.core.openFile(task["animPath"], force=True)
+        root = pymel.core.PyNode(self.root)
+        pymel.core.select(clear=True)
+        takeInfo = task.get("takeInfo")
+        frameRange = (takeInfo["firstKey"], takeInfo["lastKey"]) if takeInfo else None
+        self.exportAnimation.export_anim(root, task["outputPath"], configure=False, frame_range=frameRange)
+        return {"outputPath": task["outputPath"]}
+
+# backends that can be picked by name from the command line
+EXPORT_BACKENDS = {
+    "maya": MayaExportBackend,
+    "local": batchApplyAnim.LocalWorkerBackend,
+}
+
+##################
+# HELPER METHODS #
+##################
+
+def getExportPath(scenePath, destFolder):
+    """
+    Given the path of a scene and a destination folder, returns the path of
+    the FBX exported from it (same name, .fbx extension).
+    """
+    sceneName = os.path.splitext(os.path.basename(scenePath))[0]
+    return "{0}/{1}.fbx".format(destFolder.rstrip("/\\"), sceneName)
+
+def runExportBatch(sceneFiles, destFolder, root=DEFAULT_ROOT, upAxis="z", ascii=True, backend="maya",
+                   backendOptions=None, **batchOptions):
+    """
+    Given a list of scenes and a destination folder, exports every scene's
+    animation to FBX in parallel and returns the summary from
+    batchApplyAnim.runBatch. Export settings go into the manifest, so
+    changing any of them rebuilds every FBX in an incremental run.
+    """
+    backendClass = EXPORT_BACKENDS.get(backend, backend)
+    if backendClass is MayaExportBackend:
+        backendOptions = dict(backendOptions or {}, root=root, upAxis=upAxis, ascii=ascii)
+    options = {"root": root, "upAxis": upAxis, "ascii": ascii}
+    return batchApplyAnim.runBatch(sceneFiles, destFolder, None, backend=backendClass,
+                                   backendOptions=backendOptions, options=options,
+                                   outputPathFunction=getExportPath, **batchOptions)
+
+##########
+# SCRIPT #
+##########
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a folder of scenes to FBX in parallel.")
+    parser.add_argument("sceneFolder")
+    parser.add_argument("destFolder")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help="node whose hierarchy gets exported")
+    parser.add_argument("--up-axis", choices=("y", "z"), default="z")
+    parser.add_argument("--binary", action="store_true", help="write binary instead of ASCII FBX")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--backend", choices=sorted(EXPORT_BACKENDS), default="maya")
+    parser.add_argument("--retries", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=None)
+    parser.add_argument("--incremental", action="store_true", help="skip scenes whose FBX is up to date")
+    parser.add_argument("--index", nargs="?", const=True,
+                        help="take bake ranges from this animLibraryIndex (default: the one in the scene folder)")
+    parser.add_argument("--json", action="store_true", help="print one JSON line per scene")
+    args = parser.parse_args()
+
+    def printResult(result):
+        if args.json:
+            print(json.dumps(dict(result, event="result")))
+        else:
+            print("{0:8} {1} {2}".format(result["status"], os.path.basename(result["animPath"]),
+                                         result["error"] or ""))
+        sys.stdout.flush()
+
+    summary = runExportBatch(
+        batchApplyAnim.getAnimationFiles(args.sceneFolder), args.destFolder, root=args.root,
+        upAxis=args.up_axis, ascii=not args.binary, backend=args.backend, processes=args.processes,
+        retries=args.retries, taskTimeout=args.timeout, incremental=args.incremental,
+        progressCallback=printResult, indexPath=batchApplyAnim.getIndexArgument(args.index, args.sceneFolder))
+    if args.json:
+        print(json.dumps({"event": "summary", "succeeded": summary["succeeded"],
+                          "failed": summary["failed"], "skipped": summary["skipped"],
+                          "orphaned": summary["orphaned"], "seconds": summary["seconds"]}))
+    else:
+        print("{0} exported, {1} failed, {2} skipped in {3:.1f}s".format(
+            summary["succeeded"], summary["failed"], summary["skipped"], summary["seconds"]))
+    sys.exit(1 if summary["failed"] else 0)
+
+if __name__ == "__main__":
+    main()
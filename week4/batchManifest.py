@@ -0,0 +1,181 @@
+import json
+import os
+import time
+
+import fileHashing
+
+#############
+# CONSTANTS #
+#############
+
+# name of the manifest file kept in each destination folder
+MANIFEST_FILE_NAME = "applyAnimManifest.json"
+
+# bump this whenever the output of a bake changes for the same inputs and
+# options (e.g. a change to BAKE_SETTINGS in applyAnimWithBatching), so that
+# every output built by an older version is rebuilt
+TOOL_VERSION = 1
+
+# options that change how a take is processed but not what gets saved, so
+# they don't make an existing output stale
+OUTPUT_NEUTRAL_OPTIONS = ("warmRig",)
+
+##################
+# HELPER METHODS #
+##################
+
+def getBaseName(filePath):
+    """
+    Given a file path, returns the file name without its extension.
+    """
+    return os.path.splitext(os.path.basename(filePath))[0]
+
+def getTakeName(animPath):
+    """
+    Given the path of an animation file (or of a curve sidecar saved next to
+    an output, e.g. rig_with_AAA_0010_tk01.animcurves), returns the take's
+    name.
+    """
+    takeName = getBaseName(animPath)
+    if takeName.startswith("rig_with_"):
+        takeName = takeName[len("rig_with_"):]
+    return takeName
+
+def getOutputPath(animPath, destFolder):
+    """
+    Given the path of an animation file and a destination folder, returns
+    the path its result is saved to: rig_with_{take name}.ma .
+    """
+    return "{0}/rig_with_{1}.ma".format(destFolder.rstrip("/\\"), getTakeName(animPath))
+
+def getMatrixOutputPath(animPath, rigPath, destFolder):
+    """
+    Given the path of an animation file, the path of one of several rigs and
+    a destination folder, returns the path the take applied to that rig is
+    saved to: rig_{rig file name}_with_{take name}.ma .
+    """
+    return "{0}/rig_{1}_with_{2}.ma".format(destFolder.rstrip("/\\"), getBaseName(rigPath), getTakeName(animPath))
+
+def getDuplicateRigNames(rigPaths):
+    """
+    Given a list of rig paths, returns the file names shared by more than
+    one of them. Matrix outputs (and the rigs' namespaces) are named after
+    the rig's file name, so rigs applied together need different ones.
+    """
+    rigNames = [getBaseName(rigPath) for rigPath in rigPaths]
+    return sorted(set(rigName for rigName in rigNames if rigNames.count(rigName) > 1))
+
+def getManifestPath(destFolder, manifestName=MANIFEST_FILE_NAME):
+    """
+    Given a destination folder, returns the path of its manifest.
+    """
+    return os.path.join(destFolder, manifestName)
+
+def loadManifest(destFolder, manifestName=MANIFEST_FILE_NAME):
+    """
+    Given a destination folder, returns its manifest, or an empty one if the
+    folder doesn't have one yet (or it was written by a different version).
+    """
+    manifestPath = getManifestPath(destFolder, manifestName)
+    if os.path.exists(manifestPath):
+        with open(manifestPath, "r") as input:
+            manifest = json.load(input)
+        if manifest.get("toolVersion") == TOOL_VERSION:
+            return manifest
+    return {"toolVersion": TOOL_VERSION, "entries": {}}
+
+def saveManifest(destFolder, manifest, manifestName=MANIFEST_FILE_NAME):
+    """
+    Given a destination folder and a manifest, writes the manifest to the
+    folder. It is written to a temporary file first and then moved into
+    place, so an interrupted batch never leaves a half-written manifest.
+    """
+    fileHashing.writeJsonFile(getManifestPath(destFolder, manifestName), manifest, indent=2, sort_keys=True)
+
+def getBakeSettings(options):
+    """
+    Given the options a batch is run with, returns the settings recorded in
+    (and compared against) the manifest. Options left at None are dropped so
+    that callers which don't pass them compare equal.
+    """
+    options = dict((key, value) for key, value in (options or {}).items()
+                   if key not in OUTPUT_NEUTRAL_OPTIONS and value is not None)
+    return {"options": options, "toolVersion": TOOL_VERSION}
+
+def createJob(outputPath, inputs):
+    """
+    Given an output path and a dict of role -> input path (e.g. {"anim": ...,
+    "rig": ...}), returns a job dict for planIncrementalBatch.
+    """
+    return {"outputPath": outputPath, "inputs": inputs}
+
+def getInputHashes(job):
+    """
+    Given a job, returns a dict of role -> content hash of each input.
+    Hashes are computed once per job and remembered on it.
+    """
+    if "inputHashes" not in job:
+        job["inputHashes"] = dict((role, fileHashing.getFileHash(path))
+                                  for role, path in job["inputs"].items())
+    return job["inputHashes"]
+
+############
+# PLANNING #
+############
+
+def isUpToDate(entry, job, settingsHash):
+    """
+    Given a manifest entry, a job and the hash of the current settings,
+    returns True if the job's output was built from exactly these inputs and
+    settings and is still on disk unchanged.
+    """
+    outputPath = job["outputPath"]
+    if entry is None or not os.path.exists(outputPath):
+        return False
+    if entry["settingsHash"] != settingsHash:
+        return False
+    if entry["inputHashes"] != getInputHashes(job):
+        return False
+    return os.path.getsize(outputPath) == entry["outputSize"]
+
+def planIncrementalBatch(manifest, jobs, settings):
+    """
+    Given a manifest, a list of jobs and the settings they will be built
+    with, returns a dict with:
+      build: jobs whose output is missing or stale
+      skip: jobs whose output is up to date
+      orphaned: outputs in the manifest whose inputs are no longer in the batch
+    """
+    settingsHash = fileHashing.getDataHash(settings)
+    plan = {"build": [], "skip": [], "orphaned": []}
+    outputNames = set()
+    for job in jobs:
+        outputName = os.path.basename(job["outputPath"])
+        outputNames.add(outputName)
+        entry = manifest["entries"].get(outputName)
+        if isUpToDate(entry, job, settingsHash):
+            plan["skip"].append(job)
+        else:
+            plan["build"].append(job)
+    for outputName, entry in sorted(manifest["entries"].items()):
+        if outputName in outputNames:
+            continue
+        removedInputs = [path for path in entry["inputs"].values() if not os.path.exists(path)]
+        if removedInputs:
+            plan["orphaned"].append(outputName)
+    return plan
+
+def recordOutput(manifest, job, settings):
+    """
+    Given a manifest, a job whose output was just built and the settings it
+    was built with, records the output in the manifest.
+    """
+    outputPath = job["outputPath"]
+    manifest["entries"][os.path.basename(outputPath)] = {
+        "inputs": job["inputs"],
+        "inputHashes": getInputHashes(job),
+        "settings": settings,
+        "settingsHash": fileHashing.getDataHash(settings),
+        "outputSize": os.path.getsize(outputPath),
+        "builtAt": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
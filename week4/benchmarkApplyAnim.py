@@ -0,0 +1,274 @@
+'''
+Usage - times each stage of applying animation to the rig
+
+python benchmarkApplyAnim.py ../week3/animations/ character.mb --backend fake --output before.json
+python benchmarkApplyAnim.py ../week3/animations/ character.mb --backend fake --output after.json --compare before.json
+
+Runs the same stages as applyAnimationForOneFile for every take in the
+folder and records wall time, CPU time and peak Python memory per stage.
+With --backend maya it runs in mayapy against the real rig; with --backend
+fake it runs against fakeMaya (the rig's joints are taken from the first
+take, or --skeleton), so the Python side can be tracked in CI without Maya.
+With --compare, stages that got slower than --max-regression allows make the
+script exit with 1.
+'''
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import batchManifest
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2 (Maya 2020's mayapy) has no tracemalloc
+    tracemalloc = None
+
+#############
+# CONSTANTS #
+#############
+
+# stages in the order applyAnimationForOneFile runs them
+STAGES = (
+    "newScene",
+    "referenceRig",
+    "referenceAnim",
+    "jointMatching",
+    "constraints",
+    "bake",
+    "removeReference",
+    "save",
+)
+
+# bumped whenever the results format changes
+RESULTS_VERSION = 1
+
+##################
+# HELPER METHODS #
+##################
+
+def getCpuSeconds():
+    """
+    Returns the CPU time (user + system) used by this process so far.
+    """
+    times = os.times()
+    return times[0] + times[1]
+
+def getMaxRssKilobytes():
+    """
+    Returns the process's peak resident memory in kilobytes, or None where
+    the resource module isn't available.
+    """
+    if resource is None:
+        return None
+    maxRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return maxRss // 1024 if sys.platform == "darwin" else maxRss
+
+class StageTimer(object):
+    """
+    Measures wall time, CPU time and peak Python memory of each stage run
+    through it, keeping one dict of numbers per stage.
+    """
+
+    def __init__(self, traceMemory=True):
+        self.traceMemory = traceMemory and tracemalloc is not None and hasattr(tracemalloc, "reset_peak")
+        self.stages = {}
+
+    def run(self, stageName, function, *args, **kwargs):
+        """
+        Given a stage name and a function, calls the function with the given
+        arguments, records its numbers under the stage name and returns
+        whatever the function returned.
+        """
+        if self.traceMemory:
+            tracemalloc.reset_peak()
+            startBytes = tracemalloc.get_traced_memory()[0]
+        startWall = time.time()
+        startCpu = getCpuSeconds()
+        result = function(*args, **kwargs)
+        stats = {
+            "wallSeconds": time.time() - startWall,
+            "cpuSeconds": getCpuSeconds() - startCpu,
+            "peakBytes": None,
+            "maxRssKb": getMaxRssKilobytes(),
+        }
+        if self.traceMemory:
+            stats["peakBytes"] = tracemalloc.get_traced_memory()[1] - startBytes
+        self.stages[stageName] = stats
+        return result
+
+def benchmarkTake(pipeline, animPath, rigPath, destFolder, traceMemory=True):
+    """
+    Given the applyAnimWithBatching module, an animation file, a rig file
+    and a destination folder, runs the steps of applyAnimationForOneFile one
+    stage at a time and returns a dict of stage name -> numbers.
+    """
+    import pymel.core
+
+    timer = StageTimer(traceMemory)
+    rigNs = pipeline.getFileNamespace(rigPath)
+    animNs = pipeline.getFileNamespace(animPath)
+
+    def referenceRig():
+        pipeline.createReference(rigPath, rigNs)
+        return pipeline.getJointsFromNamespace(rigNs)
+
+    def referenceAnim():
+        animRefNode = pipeline.createReference(animPath, animNs)
+        pymel.core.select(cl=True)
+        animJoints = pipeline.getJointsFromNamespace(animNs)
+        firstKeyframe = pymel.core.findKeyframe(animJoints[0], which="first")
+        pymel.core.playbackOptions(animationStartTime=firstKeyframe, minTime=firstKeyframe)
+        pymel.core.currentTime(firstKeyframe)
+        return animRefNode, animJoints
+
+    def bake(joints, timeRange):
+        pymel.core.select(joints)
+        pymel.core.bakeResults(time=timeRange, **pipeline.BAKE_SETTINGS)
+
+    timer.run("newScene", pipeline.createNewScene)
+    rigJoints = timer.run("referenceRig", referenceRig)
+    animRefNode, animJoints = timer.run("referenceAnim", referenceAnim)
+    timeRange = (pymel.core.playbackOptions(q=True, min=True), pymel.core.playbackOptions(q=True, max=True))
+    jointMap = timer.run("jointMatching", pipeline.getJointMapForTake, rigPath, animJoints, rigJoints)
+    timer.run("constraints", pipeline.connectAnimAndRigJoints, animJoints, rigJoints, False, timeRange, jointMap)
+    timer.run("bake", bake, rigJoints, timeRange)
+    timer.run("removeReference", pipeline.removeReference, animRefNode)
+    outputPath = batchManifest.getOutputPath(animPath, destFolder)
+    timer.run("save", pipeline.saveFile, "{0}/temp.ma".format(destFolder), outputPath)
+    timer.stages["save"]["bytesWritten"] = os.path.getsize(outputPath) if os.path.exists(outputPath) else None
+    return timer.stages
+
+def getTotals(takeResults):
+    """
+    Given the per-take results, returns a dict of stage name -> summed
+    wall and CPU seconds and the largest peak memory across takes.
+    """
+    totals = {}
+    for stageName in STAGES:
+        stages = [take["stages"][stageName] for take in takeResults]
+        peaks = [stage["peakBytes"] for stage in stages if stage["peakBytes"] is not None]
+        totals[stageName] = {
+            "wallSeconds": sum(stage["wallSeconds"] for stage in stages),
+            "cpuSeconds": sum(stage["cpuSeconds"] for stage in stages),
+            "peakBytes": max(peaks) if peaks else None,
+        }
+    return totals
+
+def compareResults(baseline, current, maxRegression):
+    """
+    Given two results dicts and the largest allowed slow-down (0.2 = 20%),
+    returns a list of (stage, baseline seconds, current seconds, change,
+    regressed) for every stage, comparing total wall time.
+    """
+    rows = []
+    for stageName in STAGES:
+        before = baseline["totals"][stageName]["wallSeconds"]
+        after = current["totals"][stageName]["wallSeconds"]
+        change = (after - before) / before if before else 0.0
+        rows.append((stageName, before, after, change, change > maxRegression))
+    return rows
+
+#############
+# BENCHMARK #
+#############
+
+def runBenchmark(animFolder, rigPath, backend="fake", skeletonPath=None, repeat=1, traceMemory=True):
+    """
+    Given a folder of takes and a rig file, benchmarks every take (repeat
+    times each) with the given backend and returns the results dict.
+    """
+    import batchApplyAnim
+
+    animationFiles = batchApplyAnim.getAnimationFiles(animFolder)
+    if not animationFiles:
+        raise ValueError("No animation files in {0}".format(animFolder))
+    if backend == "fake":
+        import fakeMaya
+        fakeMaya.install(skeletonPath or animationFiles[0])
+    else:
+        import maya.standalone
+        maya.standalone.initialize()
+    import applyAnimWithBatching
+
+    if traceMemory and tracemalloc is not None:
+        tracemalloc.start()
+    destFolder = tempfile.mkdtemp(prefix="benchmarkApplyAnim")
+    takeResults = []
+    try:
+        for run in range(repeat):
+            for animPath in animationFiles:
+                stages = benchmarkTake(applyAnimWithBatching, animPath, rigPath, destFolder, traceMemory)
+                takeResults.append({"take": os.path.basename(animPath), "run": run, "stages": stages})
+    finally:
+        shutil.rmtree(destFolder, ignore_errors=True)
+        if traceMemory and tracemalloc is not None:
+            tracemalloc.stop()
+
+    return {
+        "version": RESULTS_VERSION,
+        "backend": backend,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "createdAt": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "repeat": repeat,
+        "takes": takeResults,
+        "totals": getTotals(takeResults),
+    }
+
+##########
+# SCRIPT #
+##########
+
+def main():
+    parser = argparse.ArgumentParser(description="Time each stage of applying animation to the rig.")
+    parser.add_argument("animFolder")
+    parser.add_argument("rigPath")
+    parser.add_argument("--backend", choices=("fake", "maya"), default="fake")
+    parser.add_argument("--skeleton", help="take whose joints stand in for the rig (fake backend)")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--no-memory", action="store_true", help="don't trace memory (tracing slows Python code down several times)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="largest allowed slow-down per stage with --compare (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    results = runBenchmark(args.animFolder, args.rigPath, args.backend, args.skeleton, args.repeat,
+                           not args.no_memory)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+
+    print("{0:16} {1:>10} {2:>10} {3:>12}".format("stage", "wall (s)", "cpu (s)", "peak (KB)"))
+    for stageName in STAGES:
+        stats = results["totals"][stageName]
+        peak = "-" if stats["peakBytes"] is None else "{0:.0f}".format(stats["peakBytes"] / 1024.0)
+        print("{0:16} {1:10.3f} {2:10.3f} {3:>12}".format(stageName, stats["wallSeconds"], stats["cpuSeconds"], peak))
+
+    if args.compare:
+        with open(args.compare, "r") as input:
+            baseline = json.load(input)
+        regressed = False
+        print("\n{0:16} {1:>10} {2:>10} {3:>8}".format("stage", "before", "after", "change"))
+        for stageName, before, after, change, stageRegressed in compareResults(baseline, results, args.max_regression):
+            print("{0:16} {1:10.3f} {2:10.3f} {3:+7.0%}{4}".format(
+                stageName, before, after, change, "  REGRESSED" if stageRegressed else ""))
+            regressed = regressed or stageRegressed
+        sys.exit(1 if regressed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+'''
+Binary sidecar files for baked animation.
+
+A sidecar holds every baked curve of one take as contiguous little-endian
+float64 arrays, so tools can read thousands of takes without parsing Maya ASCII:
+
+    8 bytes     magic, b"ANIMCRV1"
+    4 bytes     header length (uint32, little-endian)
+    n bytes     JSON header: fps, time unit, frame range and one entry per curve
+                (name, curve type, joint, channel, key count, data offset)
+    padding     up to the next multiple of 8 bytes
+    data        for each curve, its key times followed by its key values
+'''
+
+import json
+import mmap
+import os
+import struct
+
+import numpy
+
+import readAnimCurves
+
+#############
+# CONSTANTS #
+#############
+
+SIDECAR_MAGIC = b"ANIMCRV1"
+SIDECAR_VERSION = 1
+SIDECAR_EXTENSION = ".animcurves"
+
+# every array in the data block is stored as this type
+SIDECAR_DTYPE = numpy.dtype("<f8")
+
+##################
+# HELPER METHODS #
+##################
+
+def getSidecarPath(mayaFilePath):
+    """
+    Given the path of a Maya file, returns the path of its sidecar.
+    """
+    return os.path.splitext(mayaFilePath)[0] + SIDECAR_EXTENSION
+
+def getPaddedLength(length, alignment=8):
+    """
+    Given a length in bytes, returns it rounded up to the given alignment.
+    """
+    return (length + alignment - 1) // alignment * alignment
+
+###########
+# WRITING #
+###########
+
+def writeCurveSidecar(filePath, curves, fps, timeUnit=None):
+    """
+    Given a file path, a list of AnimCurves (see readAnimCurves) and the fps
+    they were keyed at, writes them all to a binary sidecar file.
+    """
+    itemSize = SIDECAR_DTYPE.itemsize
+    header = {
+        "version": SIDECAR_VERSION,
+        "fps": fps,
+        "timeUnit": timeUnit,
+        "frameRange": None,
+        "curves": [],
+    }
+    offset = 0
+    for curve in curves:
+        header["curves"].append({
+            "name": curve.name,
+            "curveType": curve.curveType,
+            "joint": curve.joint,
+            "channel": curve.channel,
+            "keyCount": len(curve.times),
+            "offset": offset,
+        })
+        offset += 2 * len(curve.times) * itemSize
+    keyed = [curve for curve in curves if len(curve.times)]
+    if keyed:
+        header["frameRange"] = [float(min(curve.times[0] for curve in keyed)),
+                                float(max(curve.times[-1] for curve in keyed))]
+
+    headerBytes = json.dumps(header, sort_keys=True).encode("utf-8")
+    prefixLength = len(SIDECAR_MAGIC) + 4 + len(headerBytes)
+    with open(filePath, "wb") as output:
+        output.write(SIDECAR_MAGIC)
+        output.write(struct.pack("<I", len(headerBytes)))
+        output.write(headerBytes)
+        output.write(b"\0" * (getPaddedLength(prefixLength) - prefixLength))
+        for curve in curves:
+            output.write(numpy.ascontiguousarray(curve.times, dtype=SIDECAR_DTYPE).tobytes())
+            output.write(numpy.ascontiguousarray(curve.values, dtype=SIDECAR_DTYPE).tobytes())
+
+def writeTakeSidecar(take, filePath=None):
+    """
+    Given an AnimTake, writes its curves to a sidecar next to the take (or
+    to filePath) and returns the sidecar's path.
+    """
+    filePath = filePath or getSidecarPath(take.filePath)
+    writeCurveSidecar(filePath, take.curves, take.fps, take.timeUnit)
+    return filePath
+
+###########
+# READING #
+###########
+
+def readCurveSidecar(filePath):
+    """
+    Given the path of a sidecar, memory-maps it and returns an AnimTake whose
+    curve times and values are read-only NumPy views straight into the
+    mapped file, so nothing is copied until it is used.
+    """
+    with open(filePath, "rb") as input:
+        if os.path.getsize(filePath) == 0:
+            raise ValueError("Empty sidecar: {0}".format(filePath))
+        mapped = mmap.mmap(input.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapped[:len(SIDECAR_MAGIC)] != SIDECAR_MAGIC:
+        raise ValueError("Not a curve sidecar: {0}".format(filePath))
+    headerStart = len(SIDECAR_MAGIC) + 4
+    headerLength = struct.unpack("<I", mapped[len(SIDECAR_MAGIC):headerStart])[0]
+    header = json.loads(mapped[headerStart:headerStart + headerLength].decode("utf-8"))
+    if header["version"] != SIDECAR_VERSION:
+        raise ValueError("Unsupported sidecar version {0}: {1}".format(header["version"], filePath))
+    dataStart = getPaddedLength(headerStart + headerLength)
+
+    take = readAnimCurves.AnimTake(filePath)
+    take.fps = header["fps"]
+    take.timeUnit = header["timeUnit"]
+    for entry in header["curves"]:
+        keyCount = entry["keyCount"]
+        timesOffset = dataStart + entry["offset"]
+        valuesOffset = timesOffset + keyCount * SIDECAR_DTYPE.itemsize
+        times = numpy.frombuffer(mapped, dtype=SIDECAR_DTYPE, count=keyCount, offset=timesOffset)
+        values = numpy.frombuffer(mapped, dtype=SIDECAR_DTYPE, count=keyCount, offset=valuesOffset)
+        take.curves.append(readAnimCurves.AnimCurve(
+            entry["name"], entry["curveType"], times, values, entry["joint"], entry["channel"]))
+    return take
+
+###############
+# MAYA LOADER #
+###############
+
+def applySidecarToRig(filePath, rigNs):
+    """
+    Given the path of a sidecar and the namespace of a rig referenced into
+    the open scene, replaces the animation on each rig joint channel with the
+    sidecar's curve, creating all keys of a curve in one MFnAnimCurve call.
+    Returns the number of curves applied. Needs Maya.
+    """
+    import math
+    import maya.api.OpenMaya as om
+    import maya.api.OpenMayaAnim as oma
+    import maya.cmds
+
+    take = readCurveSidecar(filePath)
+    applied = 0
+    for curve in take.curves:
+        if curve.joint is None or curve.channel is None:
+            continue
+        plugName = "{0}:{1}.{2}".format(rigNs, curve.joint, curve.channel)
+        if not maya.cmds.objExists(plugName):
+            continue
+        maya.cmds.cutKey(plugName, clear=True)
+        plug = om.MSelectionList().add(plugName).getPlug(0)
+        animCurveFn = oma.MFnAnimCurve()
+        animCurveFn.create(plug)
+        times = om.MTimeArray([om.MTime(time / take.fps, om.MTime.kSeconds) for time in curve.times])
+        values = curve.values
+        if curve.curveType == "animCurveTA":
+            # angular curves are stored in degrees but keyed in radians
+            values = values * (math.pi / 180.0)
+        animCurveFn.addKeys(times, om.MDoubleArray(values.tolist()))
+        applied += 1
+    return applied
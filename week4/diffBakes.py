@@ -0,0 +1,283 @@
+'''
+Usage - compares baked takes against known-good outputs, without Maya
+
+python diffBakes.py ../week3/finished-files/ finished-files/
+python diffBakes.py reference/rig_with_AAA_0010_tk01.ma candidate/rig_with_AAA_0010_tk01.ma --joints
+python diffBakes.py ../week3/finished-files/ finished-files/ --report bakeDiff.json --rotate-tolerance 0.01
+
+Loads both bakes with the Maya-free reader (or from their curve sidecars),
+pairs their curves by joint and channel, samples both on the union of
+their key times (in seconds, so takes resampled to another frame rate still
+line up) and compares every curve of a take at once as NumPy matrices.
+Each channel kind has its own tolerance, and rotations are compared modulo
+360 degrees. Every joint gets its max and RMS error and the first frame
+where it goes past its tolerance; curves that only exist on one side are
+listed too.
+
+Given two folders, every rig_with_*.ma in the reference folder is compared
+with the output of the same name in the candidate folder in a process
+pool. The exit code is 1 if any take differs or is missing, so this can
+gate a faster bake path in CI.
+'''
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy
+
+#############
+# CONSTANTS #
+#############
+
+# largest difference that still counts as the same bake, by channel kind
+# (centimeters, degrees, scale factor); anything else uses "other"
+DEFAULT_TOLERANCES = {
+    "translate": 1e-3,
+    "rotate": 1e-3,
+    "scale": 1e-4,
+    "other": 1e-4,
+}
+
+# baked outputs compared when given folders
+OUTPUT_PREFIX = "rig_with_"
+
+# takes handed to each worker at a time
+CHUNK_SIZE = 4
+
+##################
+# HELPER METHODS #
+##################
+
+def loadBakedTake(filePath, preferSidecar=False):
+    """
+    Given a baked .ma (or a curve sidecar), returns it as a
+    readAnimCurves.AnimTake. With preferSidecar, a .ma's sidecar is read
+    instead when there is one.
+    """
+    import curveSidecar
+    import readAnimCurves
+
+    sidecarPath = curveSidecar.getSidecarPath(filePath)
+    if filePath.endswith(curveSidecar.SIDECAR_EXTENSION) or (preferSidecar and os.path.exists(sidecarPath)):
+        return curveSidecar.readCurveSidecar(sidecarPath)
+    return readAnimCurves.readAnimTake(filePath)
+
+def getCurveKey(curve):
+    """
+    Given an anim curve, returns the key curves are paired on: joint.channel,
+    or the curve's own name for curves on other attributes.
+    """
+    if curve.joint and curve.channel:
+        return "{0}.{1}".format(curve.joint, curve.channel)
+    return curve.name
+
+def getChannelKind(curveKey, tolerances):
+    channel = curveKey.rsplit(".", 1)[-1]
+    return next((kind for kind in tolerances if kind != "other" and channel.startswith(kind)), "other")
+
+def getCurveMatrix(curves, sampleSeconds, fps):
+    """
+    Given curves, the times to sample them at (in seconds) and their take's
+    frame rate, returns a (curves, samples) matrix of values. Curves keyed
+    exactly on the sample times are copied, the others are interpolated
+    linearly and held past their first and last key.
+    """
+    sampleFrames = sampleSeconds * fps
+    matrix = numpy.empty((len(curves), len(sampleSeconds)))
+    for row, curve in enumerate(curves):
+        if len(curve.times) == len(sampleFrames) and numpy.array_equal(curve.times, sampleFrames):
+            matrix[row] = curve.values
+        elif len(curve.times):
+            matrix[row] = numpy.interp(sampleFrames, curve.times, curve.values)
+        else:
+            matrix[row] = numpy.nan
+    return matrix
+
+def summarizeErrors(errors, tolerances, sampleFrames):
+    """
+    Given a (curves, samples) error matrix, the tolerance of each curve and
+    the sample frames, returns per curve (max error, RMS error, first frame
+    over tolerance or None).
+    """
+    diverged = errors > tolerances[:, numpy.newaxis]
+    hasDiverged = diverged.any(axis=1)
+    firstIndices = numpy.argmax(diverged, axis=1)
+    maxErrors = errors.max(axis=1) if errors.shape[1] else numpy.zeros(len(errors))
+    rmsErrors = numpy.sqrt((errors ** 2).mean(axis=1)) if errors.shape[1] else numpy.zeros(len(errors))
+    return [(float(maxErrors[row]), float(rmsErrors[row]),
+             round(float(sampleFrames[firstIndices[row]]), 6) if hasDiverged[row] else None)
+            for row in range(len(errors))]
+
+###########
+# DIFFING #
+###########
+
+def diffTakes(reference, candidate, tolerances=None):
+    """
+    Given two AnimTakes (reference and candidate) and per channel kind
+    tolerances, returns the diff dict: status ("match" or "differ"), the
+    curves only one side has, and per joint the max and RMS error, the first
+    frame (in the reference's frame rate) past tolerance and the channels
+    that diverged.
+    """
+    tolerances = dict(DEFAULT_TOLERANCES, **(tolerances or {}))
+    referenceCurves = dict((getCurveKey(curve), curve) for curve in reference.curves)
+    candidateCurves = dict((getCurveKey(curve), curve) for curve in candidate.curves)
+    sharedKeys = sorted(key for key in referenceCurves if key in candidateCurves)
+    diff = {
+        "status": "match",
+        "missingCurves": sorted(key for key in referenceCurves if key not in candidateCurves),
+        "extraCurves": sorted(key for key in candidateCurves if key not in referenceCurves),
+        "curveCount": len(sharedKeys),
+        "joints": {},
+    }
+    if diff["missingCurves"] or diff["extraCurves"]:
+        diff["status"] = "differ"
+    if not sharedKeys:
+        diff["status"] = "differ"
+        return diff
+
+    # sample on every key time of either side, in seconds
+    keyTimes = [referenceCurves[key].times / reference.fps for key in sharedKeys] + \
+               [candidateCurves[key].times / candidate.fps for key in sharedKeys]
+    sampleSeconds = numpy.unique(numpy.round(numpy.concatenate(keyTimes), 9))
+    referenceMatrix = getCurveMatrix([referenceCurves[key] for key in sharedKeys], sampleSeconds, reference.fps)
+    candidateMatrix = getCurveMatrix([candidateCurves[key] for key in sharedKeys], sampleSeconds, candidate.fps)
+
+    kinds = [getChannelKind(key, tolerances) for key in sharedKeys]
+    errors = candidateMatrix - referenceMatrix
+    rotateRows = numpy.array([kind == "rotate" for kind in kinds])
+    if rotateRows.any():
+        # a rotation 360 degrees off is the same orientation
+        errors[rotateRows] = (errors[rotateRows] + 180.0) % 360.0 - 180.0
+    errors = numpy.abs(errors)
+    # a curve that is NaN on one side only is as wrong as it gets
+    errors[numpy.isnan(errors)] = numpy.inf
+    curveTolerances = numpy.array([tolerances[kind] for kind in kinds])
+    curveSummaries = summarizeErrors(errors, curveTolerances, sampleSeconds * reference.fps)
+
+    for key, (maxError, rmsError, firstFrame) in zip(sharedKeys, curveSummaries):
+        joint = key.rsplit(".", 1)[0] if "." in key else key
+        jointDiff = diff["joints"].setdefault(joint, {"maxError": 0.0, "rmsError": 0.0, "firstDivergentFrame": None,
+                                                      "divergedChannels": [], "squaredErrorSum": 0.0,
+                                                      "channelCount": 0})
+        jointDiff["maxError"] = max(jointDiff["maxError"], maxError)
+        jointDiff["squaredErrorSum"] += rmsError ** 2
+        jointDiff["channelCount"] += 1
+        if firstFrame is not None:
+            jointDiff["divergedChannels"].append(key.rsplit(".", 1)[-1])
+            if jointDiff["firstDivergentFrame"] is None or firstFrame < jointDiff["firstDivergentFrame"]:
+                jointDiff["firstDivergentFrame"] = firstFrame
+            diff["status"] = "differ"
+    for jointDiff in diff["joints"].values():
+        jointDiff["rmsError"] = float(numpy.sqrt(jointDiff.pop("squaredErrorSum") / jointDiff.pop("channelCount")))
+    diff["firstDivergentFrame"] = min([jointDiff["firstDivergentFrame"] for jointDiff in diff["joints"].values()
+                                       if jointDiff["firstDivergentFrame"] is not None] or [None])
+    return diff
+
+##########
+# WORKER #
+##########
+
+def diffFiles(arguments):
+    """
+    Given (reference path, candidate path, tolerances, preferSidecar),
+    returns the diff dict of the two files with their paths added. Never
+    raises; a file that is missing or can't be read gives status "missing"
+    or "error".
+    """
+    referencePath, candidatePath, tolerances, preferSidecar = arguments
+    result = {"name": os.path.basename(referencePath), "reference": referencePath, "candidate": candidatePath}
+    if not os.path.exists(candidatePath):
+        result.update({"status": "missing", "error": "no candidate output"})
+        return result
+    try:
+        startTime = time.time()
+        diff = diffTakes(loadBakedTake(referencePath, preferSidecar), loadBakedTake(candidatePath, preferSidecar),
+                         tolerances)
+        result.update(diff)
+        result["seconds"] = time.time() - startTime
+    except Exception as error:
+        result.update({"status": "error", "error": "{0}: {1}".format(type(error).__name__, error)})
+    return result
+
+def diffFolders(referenceFolder, candidateFolder, tolerances=None, preferSidecar=False, processes=None):
+    """
+    Given a folder of known-good outputs and a folder of new ones, diffs
+    every rig_with_*.ma of the reference folder against the file of the
+    same name in a pool of processes and returns the diffs in name order.
+    """
+    names = sorted(fileName for fileName in os.listdir(referenceFolder)
+                   if fileName.startswith(OUTPUT_PREFIX) and fileName.endswith(".ma"))
+    arguments = [(os.path.join(referenceFolder, name), os.path.join(candidateFolder, name), tolerances,
+                  preferSidecar) for name in names]
+    if len(arguments) > 1 and processes != 1:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = list(pool.imap_unordered(diffFiles, arguments, CHUNK_SIZE))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [diffFiles(argument) for argument in arguments]
+    return sorted(results, key=lambda result: result["name"])
+
+def formatFrame(frame):
+    return "-" if frame is None else "{0:g}".format(frame)
+
+##########
+# SCRIPT #
+##########
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare baked takes against known-good outputs.")
+    parser.add_argument("reference", help="known-good output, or a folder of them")
+    parser.add_argument("candidate", help="output to check, or a folder of them")
+    parser.add_argument("--translate-tolerance", type=float, default=DEFAULT_TOLERANCES["translate"])
+    parser.add_argument("--rotate-tolerance", type=float, default=DEFAULT_TOLERANCES["rotate"])
+    parser.add_argument("--scale-tolerance", type=float, default=DEFAULT_TOLERANCES["scale"])
+    parser.add_argument("--other-tolerance", type=float, default=DEFAULT_TOLERANCES["other"])
+    parser.add_argument("--prefer-sidecars", action="store_true", help="read curve sidecars where there are any")
+    parser.add_argument("--joints", action="store_true", help="print every joint, not only the ones that diverge")
+    parser.add_argument("--report", help="write every diff to this JSON file")
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    startTime = time.time()
+    tolerances = {"translate": args.translate_tolerance, "rotate": args.rotate_tolerance,
+                  "scale": args.scale_tolerance, "other": args.other_tolerance}
+    if os.path.isdir(args.reference):
+        results = diffFolders(args.reference, args.candidate, tolerances, args.prefer_sidecars, args.processes)
+    else:
+        results = [diffFiles((args.reference, args.candidate, tolerances, args.prefer_sidecars))]
+
+    for result in results:
+        print("{0:8} {1}{2}".format(result["status"], result["name"],
+                                    " ({0})".format(result["error"]) if result.get("error") else ""))
+        if result["status"] not in ("match", "differ"):
+            continue
+        for key in result["missingCurves"]:
+            print("         missing {0}".format(key))
+        for key in result["extraCurves"]:
+            print("         extra   {0}".format(key))
+        for joint, jointDiff in sorted(result["joints"].items()):
+            if args.joints or jointDiff["divergedChannels"]:
+                print("         {0:24} max {1:<12.6g} rms {2:<12.6g} from frame {3} {4}".format(
+                    joint, jointDiff["maxError"], jointDiff["rmsError"],
+                    formatFrame(jointDiff["firstDivergentFrame"]), " ".join(jointDiff["divergedChannels"])))
+    if args.report:
+        with open(args.report, "w") as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+
+    statuses = [result["status"] for result in results]
+    print("{0} match, {1} differ, {2} missing, {3} failed in {4:.2f}s".format(
+        statuses.count("match"), statuses.count("differ"), statuses.count("missing"), statuses.count("error"),
+        time.time() - startTime))
+    sys.exit(0 if statuses.count("match") == len(statuses) else 1)
+
+if __name__ == "__main__":
+    main()
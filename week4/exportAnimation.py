@@ -29,28 +29,38 @@ from PySide2 import QtUiTools
 from shiboken2 import wrapInstance
 import maya.OpenMayaUI
 
-def export_anim(root, export_file_path):
-
-    # select the root node and all the children
-    # hi -> select all children in hierarchy
-    # add -> add to list of selected items without removing what's already selected
-    pymel.core.select(root, hi = True, add = True)
-
-    # get start frame and end frame
-    start = int(pymel.core.playbackOptions(q = True, min = True))
-    end = int(pymel.core.playbackOptions(q = True, max = True))
+def configure_fbx_export(ascii = True, up_axis = "z"):
 
     # load a plugin to export an fbx maybe?
     pymel.core.loadPlugin('fbxmaya.mll', quiet = True)
     # a shit ton of export settings probably
+    # these stay set for the whole Maya session, so a batch only needs to do this once
     pymel.core.mel.FBXResetExport()
-    pymel.core.mel.FBXExportInAscii(v = True)
-    pymel.core.mel.FBXExportUpAxis("z")
+    pymel.core.mel.FBXExportInAscii(v = ascii)
+    pymel.core.mel.FBXExportUpAxis(up_axis)
     pymel.core.mel.FBXExportAnimationOnly(v = False)
     pymel.core.mel.FBXExportBakeComplexAnimation(v = True)
+    pymel.core.mel.FBXExportBakeResampleAnimation(v = True)
+
+def export_anim(root, export_file_path, configure = True, frame_range = None):
+
+    # select the root node and all the children
+    # hi -> select all children in hierarchy
+    # add -> add to list of selected items without removing what's already selected
+    pymel.core.select(root, hi = True, add = True)
+
+    # get start frame and end frame, unless the batch already knows them from the take index
+    if frame_range is None:
+        frame_range = (pymel.core.playbackOptions(q = True, min = True), pymel.core.playbackOptions(q = True, max = True))
+    start = int(frame_range[0])
+    end = int(frame_range[1])
+
+    # batch exports configure the exporter once up front and pass configure = False
+    if configure:
+        configure_fbx_export()
+    # the bake range is the only setting that changes from scene to scene
     pymel.core.mel.FBXExportBakeComplexStart(v = start)
     pymel.core.mel.FBXExportBakeComplexEnd(v = end)
-    pymel.core.mel.FBXExportBakeResampleAnimation(v = True)
     pymel.core.mel.FBXExport(s = True, f = export_file_path)
 
 # returns maya window so that we can make a dialog inside of it
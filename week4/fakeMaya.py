@@ -0,0 +1,497 @@
+'''
+Stand-in for pymel.core and maya.cmds, for timing the Python side of the
+pipeline without Maya (e.g. in CI on Linux).
+
+    import fakeMaya
+    fakeMaya.install(skeletonPath="animations/AAA_0010_tk01.ma")
+    import applyAnimWithBatching
+
+Only the commands the cold pipeline (applyAnimationForOneFile, key
+reduction and sidecars) calls are implemented. References to .ma takes are
+read with the Maya-free reader; references to anything else (e.g. the
+character.mb rig) load the joints of skeletonPath with no animation.
+Constraints copy the driver's local channels, bakes sample them on every
+frame and saveAs writes a real rig_with_*.ma with writeMayaAscii, so each
+stage still does work that grows with the take. Direct transfer and warm
+rig mode are not supported.
+'''
+
+from collections import OrderedDict
+import fnmatch
+import sys
+import types
+
+import numpy
+
+import readAnimCurves
+import writeMayaAscii
+
+#############
+# CONSTANTS #
+#############
+
+# playback options after a new scene, as in a default Maya preferences setup
+DEFAULT_PLAYBACK_OPTIONS = {
+    "minTime": 1.0,
+    "maxTime": 120.0,
+    "animationStartTime": 1.0,
+    "animationEndTime": 200.0,
+}
+
+# short flags accepted by playbackOptions
+PLAYBACK_FLAGS = {
+    "min": "minTime",
+    "max": "maxTime",
+    "ast": "animationStartTime",
+    "aet": "animationEndTime",
+}
+
+# anim curve type for each channel a bake creates
+CHANNEL_CURVE_TYPES = {
+    "translateX": "animCurveTL",
+    "translateY": "animCurveTL",
+    "translateZ": "animCurveTL",
+    "rotateX": "animCurveTA",
+    "rotateY": "animCurveTA",
+    "rotateZ": "animCurveTA",
+    "scaleX": "animCurveTU",
+    "scaleY": "animCurveTU",
+    "scaleZ": "animCurveTU",
+    "visibility": "animCurveTU",
+}
+
+###########
+# CLASSES #
+###########
+
+class FakeNode(object):
+    """
+    A node in the fake scene. name is the full name, including any namespace.
+    """
+
+    def __init__(self, name, nodeType, parent=None):
+        self._name = name
+        self._type = nodeType
+        self.parent = parent
+
+    def name(self):
+        return self._name
+
+    def type(self):
+        return self._type
+
+    def stripNamespace(self):
+        return self._name.split(":")[-1]
+
+    def getParent(self):
+        return self.parent
+
+    def longName(self):
+        path = "|" + self._name
+        parent = self.parent
+        while parent is not None:
+            path = "|" + parent.name() + path
+            parent = parent.parent
+        return path
+
+    def __repr__(self):
+        return "FakeNode({0!r}, {1!r})".format(self._name, self._type)
+
+class FakeJoint(FakeNode):
+    """
+    A joint with its rest channel values, its anim curves by channel and
+    the joint driving it through a parent constraint (if any).
+    """
+
+    def __init__(self, name, parent=None, restValues=None):
+        FakeNode.__init__(self, name, "joint", parent)
+        self.restValues = restValues or {}
+        self.curves = OrderedDict()
+        self.driver = None
+
+    def listAttr(self, keyable=False, scalar=False):
+        return [FakePlug(self, channel) for channel in self.restValues]
+
+class FakeConstraint(FakeNode):
+    """
+    A parent constraint; deleting it stops it driving its joint.
+    """
+
+    def __init__(self, name, driven):
+        FakeNode.__init__(self, name, "parentConstraint")
+        self.driven = driven
+
+class FakeAnimCurve(FakeNode):
+    """
+    A time-driven anim curve connected to one joint channel.
+    """
+
+    def __init__(self, name, curveType, times, values, joint, channel):
+        FakeNode.__init__(self, name, curveType)
+        self.curveType = curveType
+        self.times = times
+        self.values = values
+        self.joint = joint
+        self.channel = channel
+
+class FakePlug(object):
+    """
+    A joint attribute, as returned by listConnections(connections=True).
+    """
+
+    def __init__(self, node, attribute):
+        self._node = node
+        self._attribute = attribute
+
+    def node(self):
+        return self._node
+
+    def longName(self):
+        return self._attribute
+
+    def get(self):
+        return self._node.restValues.get(self._attribute, 0.0)
+
+    def set(self, value):
+        self._node.restValues[self._attribute] = value
+
+    def isLocked(self):
+        return False
+
+    def isConnected(self):
+        curve = self._node.curves.get(self._attribute)
+        return curve is not None and curve.name() in scene.nodes
+
+    def __repr__(self):
+        return "FakePlug({0!r})".format("{0}.{1}".format(self._node.name(), self._attribute))
+
+class FakeReference(object):
+    """
+    A loaded reference and the nodes it brought into the scene.
+    """
+
+    def __init__(self, path, namespace):
+        self.path = path
+        self.namespace = namespace
+        self.refNode = "{0}RN".format(namespace)
+        self.nodes = []
+        # the fake only records the edits tests add here
+        self.edits = []
+
+    def getReferenceEdits(self):
+        return list(self.edits)
+
+    def removeReferenceEdits(self):
+        self.edits = []
+
+    def load(self):
+        loadReferenceFile(self)
+
+    def unload(self):
+        for node in self.nodes:
+            scene.nodes.pop(node.name(), None)
+        for node in scene.nodes.values():
+            if isinstance(node, FakeJoint) and node.driver in self.nodes:
+                node.driver = None
+        self.nodes = []
+
+    def remove(self):
+        self.unload()
+        scene.references.pop(self.namespace, None)
+
+class FakeScene(object):
+    """
+    Everything in the open fake scene.
+    """
+
+    def __init__(self):
+        self.nodes = OrderedDict()
+        self.references = OrderedDict()
+        self.selection = []
+        self.timeUnit = "film"
+        self.playbackOptions = dict(DEFAULT_PLAYBACK_OPTIONS)
+        self.currentTime = DEFAULT_PLAYBACK_OPTIONS["minTime"]
+
+    def addNode(self, node):
+        if node.name() in self.nodes:
+            raise RuntimeError("Node already exists: {0}".format(node.name()))
+        self.nodes[node.name()] = node
+        return node
+
+    def getUniqueName(self, name):
+        if name not in self.nodes:
+            return name
+        index = 1
+        while "{0}{1}".format(name, index) in self.nodes:
+            index += 1
+        return "{0}{1}".format(name, index)
+
+# the open scene, and the take whose joints stand in for non-.ma rigs
+scene = FakeScene()
+standInSkeletonPath = None
+
+##################
+# HELPER METHODS #
+##################
+
+def getRestValues(joint):
+    """
+    Given a readAnimCurves Joint, returns a dict of channel -> rest value.
+    """
+    restValues = {"visibility": 1.0}
+    for axisIndex, axis in enumerate("XYZ"):
+        restValues["translate" + axis] = joint.translate[axisIndex]
+        restValues["rotate" + axis] = joint.rotate[axisIndex]
+        restValues["scale" + axis] = joint.scale[axisIndex]
+    return restValues
+
+def loadTake(take, namespace, reference, withCurves):
+    """
+    Given an AnimTake, adds its joints (and, withCurves, their curves
+    converted to the scene's time unit) to the scene under the namespace.
+    """
+    timeScale = readAnimCurves.getFramesPerSecond(scene.timeUnit) / take.fps
+    groups = {}
+    for joint in take.joints.values():
+        parent = None
+        if joint.parent in take.joints:
+            parent = scene.nodes["{0}:{1}".format(namespace, joint.parent)]
+        elif joint.parent is not None:
+            groupName = "{0}:{1}".format(namespace, joint.parent)
+            if groupName not in groups:
+                groups[groupName] = scene.addNode(FakeNode(groupName, "transform"))
+                reference.nodes.append(groups[groupName])
+            parent = groups[groupName]
+        node = scene.addNode(FakeJoint("{0}:{1}".format(namespace, joint.name), parent, getRestValues(joint)))
+        reference.nodes.append(node)
+    if not withCurves:
+        return
+    for curve in take.curves:
+        jointName = "{0}:{1}".format(namespace, curve.joint)
+        if jointName not in scene.nodes or curve.channel is None:
+            continue
+        joint = scene.nodes[jointName]
+        animCurve = scene.addNode(FakeAnimCurve("{0}:{1}".format(namespace, curve.name), curve.curveType,
+                                                curve.times * timeScale, curve.values, joint, curve.channel))
+        joint.curves[curve.channel] = animCurve
+        reference.nodes.append(animCurve)
+
+def loadReferenceFile(reference):
+    """
+    Given a FakeReference, adds the nodes of its file to the scene: a take's
+    joints and curves, or the stand-in skeleton's joints for other files.
+    """
+    if reference.path.lower().endswith(".ma"):
+        loadTake(readAnimCurves.readAnimTake(reference.path), reference.namespace, reference, withCurves=True)
+    else:
+        if standInSkeletonPath is None:
+            raise RuntimeError("fakeMaya can't load {0}; install it with a skeletonPath".format(reference.path))
+        loadTake(readAnimCurves.readAnimTake(standInSkeletonPath), reference.namespace, reference, withCurves=False)
+
+def toList(objects):
+    """
+    Given a node or a list of nodes, returns a flat list of nodes.
+    """
+    if objects is None:
+        return []
+    if isinstance(objects, (list, tuple, set)):
+        return list(objects)
+    return [objects]
+
+############
+# COMMANDS #
+############
+
+def newFile(force=False):
+    global scene
+    scene = FakeScene()
+
+def createReference(filePath, namespace=None):
+    reference = FakeReference(filePath, namespace)
+    loadReferenceFile(reference)
+    scene.references[namespace] = reference
+    return reference
+
+def FileReference(namespace=None):
+    if namespace not in scene.references:
+        raise RuntimeError("No reference with namespace {0}".format(namespace))
+    return scene.references[namespace]
+
+def ls(pattern=None, type=None):
+    nodes = scene.nodes.values()
+    if pattern is not None:
+        nodes = [node for node in nodes if fnmatch.fnmatchcase(node.name(), pattern)]
+    if type is not None:
+        nodes = [node for node in nodes if node.type() == type]
+    return list(nodes)
+
+def objExists(name):
+    return name.split(".")[0] in scene.nodes
+
+def select(objects=None, cl=False, clear=False):
+    scene.selection = [] if cl or clear else toList(objects)
+
+def delete(objects):
+    referencedNodes = set(node for reference in scene.references.values() for node in reference.nodes)
+    for node in toList(objects):
+        if node in referencedNodes:
+            # Maya refuses to delete nodes that come from a reference
+            raise RuntimeError("Cannot delete referenced node: {0}".format(node.name()))
+        scene.nodes.pop(node.name(), None)
+        if isinstance(node, FakeConstraint) and node.driven.driver is not None:
+            node.driven.driver = None
+
+def findKeyframe(objects, which="first"):
+    times = [curve.times[0 if which == "first" else -1]
+             for node in toList(objects) for curve in node.curves.values() if len(curve.times)]
+    if not times:
+        return scene.currentTime
+    return float(min(times) if which == "first" else max(times))
+
+def playbackOptions(q=False, **flags):
+    flags = dict((PLAYBACK_FLAGS.get(flag, flag), value) for flag, value in flags.items())
+    if q:
+        return scene.playbackOptions[list(flags)[0]]
+    scene.playbackOptions.update(flags)
+
+def currentTime(value=None, q=False):
+    if q or value is None:
+        return scene.currentTime
+    scene.currentTime = value
+    return value
+
+def currentUnit(q=False, time=None):
+    if q:
+        return scene.timeUnit
+    scene.timeUnit = time
+
+def parentConstraint(driver, driven, mo=False):
+    constraintName = scene.getUniqueName("{0}_parentConstraint1".format(driven.stripNamespace()))
+    driven.driver = driver
+    return scene.addNode(FakeConstraint(constraintName, driven))
+
+def bakeResults(objects=None, time=None, **settings):
+    startTime, endTime = time
+    frames = numpy.arange(startTime, endTime + 1)
+    for joint in toList(objects) or scene.selection:
+        if joint.driver is None:
+            continue
+        for channel, curveType in CHANNEL_CURVE_TYPES.items():
+            driverCurve = joint.driver.curves.get(channel)
+            if driverCurve is not None and len(driverCurve.times):
+                values = numpy.interp(frames, driverCurve.times, driverCurve.values)
+            else:
+                values = numpy.full(len(frames), joint.restValues.get(channel, 0.0))
+            oldCurve = joint.curves.get(channel)
+            if oldCurve is not None:
+                scene.nodes.pop(oldCurve.name(), None)
+            curveName = scene.getUniqueName("{0}_{1}".format(joint.stripNamespace(), channel))
+            joint.curves[channel] = scene.addNode(
+                FakeAnimCurve(curveName, curveType, frames.copy(), values, joint, channel))
+
+def listConnections(objects, type=None, source=True, destination=True, connections=False, plugs=False):
+    results = []
+    for node in toList(objects):
+        if not isinstance(node, FakeJoint) or not source:
+            continue
+        for channel, curve in node.curves.items():
+            if curve.name() not in scene.nodes:
+                continue
+            results.append((FakePlug(node, channel), curve) if connections else curve)
+    return results
+
+def keyframe(curve, q=False, timeChange=False, valueChange=False):
+    if timeChange:
+        return curve.times.tolist()
+    if valueChange:
+        return curve.values.tolist()
+    return len(curve.times)
+
+def cutKey(curve, time=None, clear=False):
+    removeTimes = numpy.array([start for start, end in time or []])
+    keep = ~numpy.isin(curve.times, removeTimes)
+    curve.times = curve.times[keep]
+    curve.values = curve.values[keep]
+
+def keyTangent(curve, inTangentType=None, outTangentType=None):
+    pass
+
+def writeReference(filePath, reference, playbackRange=None):
+    """
+    Given a file path and a FakeReference, writes a Maya ASCII file that
+    references the reference's file and holds the curves of its joints (and
+    the playback range, if given, the way saveAs does).
+    """
+    with open(filePath, "w") as output:
+        writer = writeMayaAscii.MayaAsciiWriter(output, filePath.replace("\\", "/").split("/")[-1],
+                                                reference.path, scene.timeUnit, reference.namespace)
+        writer.writeHeader()
+        for node in reference.nodes:
+            if not isinstance(node, FakeJoint):
+                continue
+            dagPath = "|".join(part.split(":")[-1] for part in node.longName().split("|"))
+            for channel, curve in node.curves.items():
+                if curve.name() in scene.nodes:
+                    writer.writeAnimCurve(readAnimCurves.AnimCurve(
+                        curve.name(), curve.curveType, curve.times, curve.values, None, channel), dagPath)
+        writer.writeFooter(playbackRange)
+    return filePath
+
+def saveAs(filePath):
+    rigReferences = list(scene.references.values())
+    if len(rigReferences) != 1:
+        raise RuntimeError("fakeMaya can only save scenes with exactly one reference")
+    return writeReference(filePath, rigReferences[0],
+                          (scene.playbackOptions["minTime"], scene.playbackOptions["maxTime"]))
+
+def exportSelected(filePath, **flags):
+    selectedReferences = [reference for reference in scene.references.values()
+                          if any(node in reference.nodes for node in scene.selection)]
+    if len(selectedReferences) != 1:
+        raise RuntimeError("fakeMaya can only export a selection from exactly one reference")
+    # like Maya, exporting a selection leaves out the scene configuration
+    return writeReference(filePath, selectedReferences[0])
+
+def referenceEdit(referenceNode, failedEdits=False, successfulEdits=False, removeEdits=False):
+    pass
+
+def warning(message):
+    print("// Warning: {0}".format(message))
+
+def error(message):
+    raise RuntimeError(message)
+
+# commands exposed as both pymel.core and maya.cmds
+COMMANDS = (
+    newFile, createReference, FileReference, ls, objExists, select, delete, findKeyframe, playbackOptions,
+    currentTime, currentUnit, parentConstraint, bakeResults, listConnections, keyframe, cutKey,
+    keyTangent, saveAs, exportSelected, referenceEdit, warning, error,
+)
+
+###########
+# INSTALL #
+###########
+
+def install(skeletonPath=None):
+    """
+    Given the path of a take whose joints stand in for rigs the fake can't
+    read, registers this module as pymel.core and maya.cmds so that
+    pipeline modules imported afterwards use it. Returns the fake pymel.core
+    module.
+    """
+    global standInSkeletonPath
+    standInSkeletonPath = skeletonPath
+    newFile(force=True)
+
+    pymelCore = types.ModuleType("pymel.core")
+    mayaCmds = types.ModuleType("maya.cmds")
+    for command in COMMANDS:
+        setattr(pymelCore, command.__name__, command)
+        setattr(mayaCmds, command.__name__, command)
+
+    pymel = types.ModuleType("pymel")
+    pymel.core = pymelCore
+    maya = types.ModuleType("maya")
+    maya.cmds = mayaCmds
+    sys.modules.update({"pymel": pymel, "pymel.core": pymelCore, "maya": maya, "maya.cmds": mayaCmds})
+    return pymelCore
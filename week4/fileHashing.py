@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import sys
+import time
+import uuid
+
+#############
+# CONSTANTS #
+#############
+
+# how much of a file we hash at a time
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# how often (and how long apart) replaceFile retries a move on Windows under
+# Python 2, where another process can be holding or replacing the file
+REPLACE_ATTEMPTS = 10
+REPLACE_RETRY_SECONDS = 0.05
+
+##################
+# HELPER METHODS #
+##################
+
+# (path, size, mtime) -> hex digest, so a file is only hashed once per process
+# as long as it doesn't change on disk
+fileHashCache = {}
+
+def getFileStamp(filePath):
+    """
+    Given a file path, returns its (size, modification time), which is
+    enough to tell whether it changed without reading it.
+    """
+    stat = os.stat(filePath)
+    return stat.st_size, stat.st_mtime
+
+def getFileHash(filePath):
+    """
+    Given a file path, returns the SHA-1 hex digest of the file's contents.
+    Results are remembered for as long as the file's size and modification
+    time stay the same.
+    """
+    stat = os.stat(filePath)
+    cacheKey = (os.path.abspath(filePath), stat.st_size, stat.st_mtime)
+    if cacheKey in fileHashCache:
+        return fileHashCache[cacheKey]
+    digest = hashlib.sha1()
+    with open(filePath, "rb") as input:
+        chunk = input.read(HASH_CHUNK_SIZE)
+        while chunk:
+            digest.update(chunk)
+            chunk = input.read(HASH_CHUNK_SIZE)
+    fileHashCache[cacheKey] = digest.hexdigest()
+    return fileHashCache[cacheKey]
+
+def getDataHash(data):
+    """
+    Given any JSON-serializable value (settings dicts, lists of joint names...),
+    returns a SHA-1 hex digest that only depends on its contents.
+    """
+    text = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def replaceFile(sourcePath, destinationPath):
+    """
+    Given two paths, moves the source file onto the destination, replacing
+    it in one step so readers see either the old file or the new one, never
+    a missing one.
+    """
+    if hasattr(os, "replace"):
+        os.replace(sourcePath, destinationPath)
+    elif sys.platform != "win32":
+        # Python 2's rename already replaces atomically on POSIX
+        os.rename(sourcePath, destinationPath)
+    else:
+        # Python 2 on Windows can't rename onto an existing file, so the old
+        # one is removed first; another writer can get in between, so retry
+        for attempt in range(REPLACE_ATTEMPTS):
+            try:
+                if os.path.exists(destinationPath):
+                    os.remove(destinationPath)
+                os.rename(sourcePath, destinationPath)
+                return
+            except OSError:
+                if attempt == REPLACE_ATTEMPTS - 1:
+                    raise
+                time.sleep(REPLACE_RETRY_SECONDS)
+
+def writeJsonFile(filePath, data, **dumpOptions):
+    """
+    Given a path, any JSON-serializable value and json.dump options, writes
+    the value to a uniquely named temporary file and then replaces the file
+    with it (see replaceFile), so readers never see it half-written or
+    missing. With several writers, the last one to finish wins.
+    """
+    tempPath = "{0}.{1}.tmp".format(filePath, uuid.uuid4().hex)
+    try:
+        with open(tempPath, "w") as output:
+            json.dump(data, output, **dumpOptions)
+        replaceFile(tempPath, filePath)
+    finally:
+        if os.path.exists(tempPath):
+            os.remove(tempPath)
@@ -0,0 +1,299 @@
+'''
+Usage - run this from mayapy (or plain python with "backend": "local")
+
+mayapy jobScheduler.py applyAnimJob.json
+mayapy jobScheduler.py applyAnimJob.json --retry-failed
+
+Runs the takes listed in a job spec (JSON, or YAML if PyYAML is installed)
+with per-job timeouts and retry limits. Paths in the spec are relative to
+the spec file, so the same spec works on any machine:
+
+{
+    "takes": ["../week3/animations/*.ma"],
+    "rig": "character.mb",
+    "destination": "scheduled-files",
+    "options": {"directTransfer": false, "reduceTolerances": null},
+    "processes": 4,
+    "timeout": 600,
+    "retries": 2,
+    "backend": "maya",
+    "backendOptions": {}
+}
+
+Each worker is its own process that starts its backend once and then runs
+one job at a time. A worker that crashes or runs past the timeout is killed
+and replaced, its job is retried or recorded as failed, and the other jobs
+carry on. Job state is saved to jobState.json in the destination folder
+after every change, so an interrupted batch resumes where it stopped;
+failed jobs are only tried again with --retry-failed.
+'''
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import batchApplyAnim
+import batchManifest
+import fileHashing
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+try:
+    # json gives unicode strings under Python 2 (Maya 2020's mayapy)
+    stringTypes = (str, basestring)
+except NameError:
+    stringTypes = (str,)
+
+#############
+# CONSTANTS #
+#############
+
+# name of the state file kept in the destination folder
+STATE_FILE_NAME = "jobState.json"
+
+# bump this whenever the state format changes
+STATE_VERSION = 1
+
+SPEC_DEFAULTS = {
+    "options": {},
+    "processes": None,
+    "timeout": None,
+    "retries": 1,
+    "backend": "maya",
+    "backendOptions": {},
+}
+
+##################
+# HELPER METHODS #
+##################
+
+def loadJobSpec(specPath):
+    """
+    Given the path of a JSON or YAML job spec, returns the spec with
+    defaults filled in, every take pattern expanded (globs and folders) and
+    every path made absolute relative to the spec's folder.
+    """
+    with open(specPath, "r") as input:
+        if specPath.lower().endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise ImportError("PyYAML is needed to read {0}".format(specPath))
+            spec = yaml.safe_load(input)
+        else:
+            spec = json.load(input)
+    for key in ("takes", "destination"):
+        if key not in spec:
+            raise ValueError("Job spec {0} has no {1}".format(specPath, key))
+    spec = dict(SPEC_DEFAULTS, **spec)
+
+    specFolder = os.path.dirname(os.path.abspath(specPath))
+    def getPath(path):
+        return os.path.normpath(os.path.join(specFolder, os.path.expanduser(path)))
+
+    takes = []
+    for pattern in ([spec["takes"]] if isinstance(spec["takes"], stringTypes) else spec["takes"]):
+        path = getPath(pattern)
+        if os.path.isdir(path):
+            takes.extend(batchApplyAnim.getAnimationFiles(path))
+        else:
+            takes.extend(sorted(glob.glob(path)) if glob.has_magic(path) else [path])
+    spec["takes"] = sorted(set(takes))
+    spec["destination"] = getPath(spec["destination"])
+    spec["rig"] = getPath(spec["rig"]) if spec.get("rig") else None
+    return spec
+
+def getStatePath(destFolder):
+    return os.path.join(destFolder, STATE_FILE_NAME)
+
+def loadJobState(destFolder):
+    """
+    Given a destination folder, returns its job state, or an empty one.
+    """
+    statePath = getStatePath(destFolder)
+    if os.path.exists(statePath):
+        with open(statePath, "r") as input:
+            state = json.load(input)
+        if state.get("version") == STATE_VERSION:
+            return state
+    return {"version": STATE_VERSION, "jobs": {}}
+
+def saveJobState(destFolder, state):
+    """
+    Given a destination folder and a job state, writes the state to the
+    folder through a temporary file, so it is never left half-written.
+    """
+    fileHashing.writeJsonFile(getStatePath(destFolder), state, indent=2, sort_keys=True)
+
+def getJobsToRun(spec, state, retryFailed=False):
+    """
+    Given a spec and its saved state, returns the takes that still need to
+    run: new takes, takes that were running or waiting when the last batch
+    stopped, finished takes whose output is gone or whose settings changed,
+    and (with retryFailed) takes that failed. Their state entries are reset.
+    """
+    settingsHash = fileHashing.getDataHash([spec["rig"], spec["options"]])
+    takes = []
+    for animPath in spec["takes"]:
+        job = state["jobs"].get(animPath)
+        if job is not None and job["settingsHash"] == settingsHash:
+            if job["status"] == "ok" and job["outputPath"] and os.path.exists(job["outputPath"]):
+                continue
+            if job["status"] == "failed" and not retryFailed:
+                continue
+        state["jobs"][animPath] = {
+            "status": "pending",
+            "settingsHash": settingsHash,
+            "attempts": 0,
+            "errors": [],
+            "outputPath": None,
+            "seconds": None,
+        }
+        takes.append(animPath)
+    return takes
+
+#############
+# SCHEDULER #
+#############
+
+def runJobs(spec, retryFailed=False, progressCallback=None):
+    """
+    Given a loaded job spec, runs every take that still needs to run (see
+    getJobsToRun) in worker processes and returns a summary dict with the
+    counts and the final state of every job. progressCallback, if given,
+    is called with (take path, job state) whenever a job finishes or fails
+    an attempt.
+    """
+    destFolder = spec["destination"]
+    if not os.path.exists(destFolder):
+        os.makedirs(destFolder)
+    startTime = time.time()
+    state = loadJobState(destFolder)
+    pending = getJobsToRun(spec, state, retryFailed)
+    saveJobState(destFolder, state)
+    manifest = batchManifest.loadManifest(destFolder)
+    settings = batchManifest.getBakeSettings(spec["options"])
+
+    processes = min(spec["processes"] or multiprocessing.cpu_count(), max(len(pending), 1))
+    workers = []
+    startupFailures = 0
+
+    def finishAttempt(animPath, result):
+        job = state["jobs"][animPath]
+        job["attempts"] += 1
+        if result["status"] == "ok":
+            job["status"] = "ok"
+            job["outputPath"] = result["outputPath"]
+            job["seconds"] = result.get("seconds")
+            inputs = dict({"rig": spec["rig"]} if spec["rig"] else {}, anim=animPath)
+            batchManifest.recordOutput(manifest, batchManifest.createJob(result["outputPath"], inputs), settings)
+            batchManifest.saveManifest(destFolder, manifest)
+        else:
+            job["errors"].append(result["error"])
+            if job["attempts"] <= spec["retries"]:
+                job["status"] = "pending"
+                pending.append(animPath)
+            else:
+                job["status"] = "failed"
+        saveJobState(destFolder, state)
+        if progressCallback:
+            progressCallback(animPath, job)
+
+    try:
+        while pending or any(worker.task for worker in workers):
+            while len(workers) < processes and (pending or any(worker.task for worker in workers)):
+                workers.append(batchApplyAnim.WorkerProcess(spec["backend"], spec["backendOptions"]))
+
+            for worker in list(workers):
+                message = worker.poll()
+                if message is not None and message.get("event") == "ready":
+                    worker.ready = True
+                    startupFailures = 0
+                elif message is not None and worker.task is not None:
+                    animPath = worker.task["animPath"]
+                    worker.task = None
+                    finishAttempt(animPath, message)
+
+                if worker.task is not None and worker.deadline is not None and time.time() > worker.deadline:
+                    worker.kill()
+                    error = "Timed out after {0} seconds".format(spec["timeout"])
+                elif not worker.process.is_alive():
+                    worker.process.join()
+                    error = "Worker crashed (exit code {0})".format(worker.process.exitcode)
+                else:
+                    continue
+                workers.remove(worker)
+                if not worker.ready:
+                    startupFailures += 1
+                    if startupFailures >= batchApplyAnim.MAX_STARTUP_FAILURES:
+                        raise RuntimeError("Workers keep dying before they are ready: {0}".format(error))
+                if worker.task is not None:
+                    finishAttempt(worker.task["animPath"], {"status": "failed", "error": error})
+
+            for worker in workers:
+                if worker.ready and worker.task is None and pending:
+                    animPath = pending.pop(0)
+                    state["jobs"][animPath]["status"] = "running"
+                    worker.send({
+                        "animPath": animPath,
+                        "destFolder": destFolder,
+                        "rigPath": spec["rig"],
+                        "outputPath": batchManifest.getOutputPath(animPath, destFolder),
+                        "options": spec["options"],
+                        "attempt": state["jobs"][animPath]["attempts"] + 1,
+                    }, spec["timeout"])
+            time.sleep(batchApplyAnim.POLL_INTERVAL)
+    finally:
+        for worker in workers:
+            if worker.task is None:
+                worker.stop()
+            else:
+                worker.kill()
+        saveJobState(destFolder, state)
+
+    jobs = dict((animPath, state["jobs"][animPath]) for animPath in spec["takes"])
+    statuses = [job["status"] for job in jobs.values()]
+    return {
+        "jobs": jobs,
+        "succeeded": statuses.count("ok"),
+        "failed": statuses.count("failed"),
+        "seconds": time.time() - startTime,
+    }
+
+##########
+# SCRIPT #
+##########
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the takes of a job spec with timeouts, retries and resume.")
+    parser.add_argument("specPath")
+    parser.add_argument("--retry-failed", action="store_true", help="also rerun jobs that failed last time")
+    parser.add_argument("--json", action="store_true", help="print one JSON line per finished job")
+    args = parser.parse_args()
+
+    spec = loadJobSpec(args.specPath)
+
+    def printJob(animPath, job):
+        if args.json:
+            print(json.dumps(dict(job, animPath=animPath, event="job")))
+        else:
+            print("{0:8} {1} (attempt {2}) {3}".format(job["status"], os.path.basename(animPath), job["attempts"],
+                                                        job["errors"][-1] if job["status"] != "ok" else ""))
+        sys.stdout.flush()
+
+    summary = runJobs(spec, args.retry_failed, printJob)
+    if args.json:
+        print(json.dumps({"event": "summary", "succeeded": summary["succeeded"], "failed": summary["failed"],
+                          "seconds": summary["seconds"]}))
+    else:
+        print("{0} of {1} takes done, {2} failed in {3:.1f}s".format(
+            summary["succeeded"], len(summary["jobs"]), summary["failed"], summary["seconds"]))
+    sys.exit(1 if summary["failed"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+import json
+import os
+
+import fileHashing
+
+#############
+# CONSTANTS #
+#############
+
+# where resolved joint maps are saved between runs
+DEFAULT_CACHE_FOLDER = os.environ.get(
+    "JOINT_MAP_CACHE", os.path.join(os.path.expanduser("~"), ".applyAnimCache", "jointMaps"))
+
+# rules used when none are given: match joints by their exact short name
+DEFAULT_RULES = {
+    "renames": {},
+    "stripPrefixes": [],
+    "stripSuffixes": [],
+    "caseSensitive": True,
+}
+
+# bumped whenever the way maps are resolved changes, so old cache files are ignored
+JOINT_MAP_VERSION = 1
+
+##################
+# HELPER METHODS #
+##################
+
+def stripNamespaces(jointPath):
+    """
+    Given a joint name or DAG path, returns it with every namespace removed
+    (e.g. |character:Reference|character:Hips -> |Reference|Hips).
+    """
+    return "|".join(part.split(":")[-1] for part in jointPath.split("|"))
+
+def getRules(rules=None):
+    """
+    Given a partial rules dict (or None), returns a full one with the
+    defaults filled in.
+    """
+    fullRules = dict(DEFAULT_RULES)
+    fullRules.update(rules or {})
+    return fullRules
+
+def normalizeJointName(jointName, rules):
+    """
+    Given a single joint name and a rules dict, returns the name we match on:
+    namespace removed, the first matching prefix and suffix stripped, then
+    renamed if it appears in the renames dict.
+    """
+    name = jointName.split(":")[-1]
+    for prefix in rules["stripPrefixes"]:
+        if prefix and name.startswith(prefix) and len(name) > len(prefix):
+            name = name[len(prefix):]
+            break
+    for suffix in rules["stripSuffixes"]:
+        if suffix and name.endswith(suffix) and len(name) > len(suffix):
+            name = name[:-len(suffix)]
+            break
+    name = rules["renames"].get(name, name)
+    if not rules["caseSensitive"]:
+        name = name.lower()
+    return name
+
+def normalizeJointPath(jointPath, rules):
+    """
+    Given a DAG path and a rules dict, returns the path with every part
+    normalized, used to tell apart joints that share a short name.
+    """
+    parts = [part for part in jointPath.split("|") if part]
+    return "|".join(normalizeJointName(part, rules) for part in parts)
+
+def buildJointIndex(jointPaths, rules):
+    """
+    Given a list of joint DAG paths and a rules dict, returns two hash
+    indexes: normalized short name -> list of paths, and normalized
+    hierarchy path -> path.
+    """
+    byName = {}
+    byPath = {}
+    for jointPath in jointPaths:
+        shortName = jointPath.split("|")[-1]
+        byName.setdefault(normalizeJointName(shortName, rules), []).append(jointPath)
+        byPath[normalizeJointPath(jointPath, rules)] = jointPath
+    return byName, byPath
+
+def getSkeletonSignature(jointPaths, rules=None):
+    """
+    Given a list of joint DAG paths, returns a hash that identifies the
+    skeleton (and the rules it will be matched with) independently of its
+    namespace and of the order the joints were listed in.
+    """
+    paths = sorted(stripNamespaces(jointPath) for jointPath in jointPaths)
+    return fileHashing.getDataHash({"joints": paths, "rules": getRules(rules)})
+
+###########
+# MAPPING #
+###########
+
+def resolveJointMap(animJointPaths, rigJointPaths, rules=None):
+    """
+    Given the DAG paths of the animation joints and the rig joints, returns
+    a dict with:
+      map: namespace-free anim joint path -> namespace-free rig joint path
+      unmatchedAnim: anim joints with no rig joint
+      unmatchedRig: rig joints that no anim joint drives
+    A joint is matched by its normalized short name when that name is unique
+    in the rig, and by its normalized hierarchy path otherwise.
+    """
+    rules = getRules(rules)
+    animJointPaths = [stripNamespaces(jointPath) for jointPath in animJointPaths]
+    rigJointPaths = [stripNamespaces(jointPath) for jointPath in rigJointPaths]
+    rigByName, rigByPath = buildJointIndex(rigJointPaths, rules)
+
+    jointMap = {}
+    unmatchedAnim = []
+    for animJointPath in animJointPaths:
+        shortName = normalizeJointName(animJointPath.split("|")[-1], rules)
+        candidates = rigByName.get(shortName, [])
+        if len(candidates) == 1:
+            jointMap[animJointPath] = candidates[0]
+            continue
+        rigJointPath = rigByPath.get(normalizeJointPath(animJointPath, rules))
+        if rigJointPath is None and candidates:
+            # same short name more than once and the hierarchy differs: pick
+            # the candidate whose path ends the same way as the most parents
+            rigJointPath = max(candidates, key=lambda candidate: getCommonSuffixLength(
+                normalizeJointPath(candidate, rules), normalizeJointPath(animJointPath, rules)))
+        if rigJointPath is None:
+            unmatchedAnim.append(animJointPath)
+        else:
+            jointMap[animJointPath] = rigJointPath
+
+    mappedRigJoints = set(jointMap.values())
+    return {
+        "map": jointMap,
+        "unmatchedAnim": unmatchedAnim,
+        "unmatchedRig": [path for path in rigJointPaths if path not in mappedRigJoints],
+    }
+
+def getCommonSuffixLength(pathA, pathB):
+    """
+    Given two normalized joint paths, returns how many trailing parts they
+    share.
+    """
+    partsA = pathA.split("|")[::-1]
+    partsB = pathB.split("|")[::-1]
+    count = 0
+    for partA, partB in zip(partsA, partsB):
+        if partA != partB:
+            break
+        count += 1
+    return count
+
+#########
+# CACHE #
+#########
+
+# (rig hash, skeleton signature) -> resolved map, so a worker only reads the
+# cache file once per rig
+jointMapMemory = {}
+
+def getJointMapCachePath(rigHash, animSignature, cacheFolder=None):
+    """
+    Given a rig content hash and an anim skeleton signature, returns the
+    path of the file the resolved map is saved to.
+    """
+    cacheFolder = cacheFolder or DEFAULT_CACHE_FOLDER
+    return os.path.join(cacheFolder, "{0}_{1}.json".format(rigHash[:16], animSignature[:16]))
+
+def getJointMap(rigPath, animJointPaths, rigJointPaths, rules=None, cacheFolder=None):
+    """
+    Given a rig file, the anim joint paths and the rig joint paths (or a
+    function returning them, so they are only listed on a cache miss),
+    returns the resolved map dict (see resolveJointMap). Maps are saved to
+    disk keyed by the rig file's content hash and the anim skeleton's
+    signature, so each rig/skeleton pair is only resolved once.
+    """
+    rigHash = fileHashing.getFileHash(rigPath)
+    animSignature = getSkeletonSignature(animJointPaths, rules)
+    memoryKey = (rigHash, animSignature)
+    if memoryKey in jointMapMemory:
+        return jointMapMemory[memoryKey]
+
+    cachePath = getJointMapCachePath(rigHash, animSignature, cacheFolder)
+    if os.path.exists(cachePath):
+        with open(cachePath, "r") as input:
+            cached = json.load(input)
+        if cached.get("version") == JOINT_MAP_VERSION:
+            jointMapMemory[memoryKey] = cached
+            return cached
+
+    if callable(rigJointPaths):
+        rigJointPaths = rigJointPaths()
+    resolved = resolveJointMap(animJointPaths, rigJointPaths, rules)
+    resolved["version"] = JOINT_MAP_VERSION
+    resolved["rigPath"] = rigPath
+    resolved["rigHash"] = rigHash
+    resolved["rigJoints"] = [stripNamespaces(jointPath) for jointPath in rigJointPaths]
+    saveJointMap(cachePath, resolved)
+    jointMapMemory[memoryKey] = resolved
+    return resolved
+
+def getCachedRigJoints(rigPath, cacheFolder=None):
+    """
+    Given a rig file, returns the namespace-free joint paths saved with any
+    map already resolved for it (so the rig's skeleton is known without
+    opening it in Maya), or None if no map was cached for this rig yet.
+    """
+    cacheFolder = cacheFolder or DEFAULT_CACHE_FOLDER
+    if not os.path.exists(cacheFolder):
+        return None
+    prefix = fileHashing.getFileHash(rigPath)[:16] + "_"
+    for fileName in sorted(os.listdir(cacheFolder)):
+        if fileName.startswith(prefix) and fileName.endswith(".json"):
+            with open(os.path.join(cacheFolder, fileName), "r") as input:
+                cached = json.load(input)
+            if cached.get("version") == JOINT_MAP_VERSION and cached.get("rigJoints"):
+                return cached["rigJoints"]
+    return None
+
+def saveJointMap(cachePath, resolved):
+    """
+    Given a cache path and a resolved map, writes the map to disk. The file
+    is written under a temporary name first so that other workers never
+    read a half-written map.
+    """
+    cacheFolder = os.path.dirname(cachePath)
+    if not os.path.exists(cacheFolder):
+        try:
+            os.makedirs(cacheFolder)
+        except OSError:
+            # another worker created it first
+            pass
+    try:
+        fileHashing.writeJsonFile(cachePath, resolved, indent=2, sort_keys=True)
+    except OSError:
+        # another worker is saving the same map
+        pass
@@ -0,0 +1,337 @@
+'''
+Usage - looks up single nodes in Maya ASCII files without reading the whole file
+
+python maIndex.py finished-files/*.ma --node Hips_rotateX
+python maIndex.py finished-files/*.ma --type parentConstraint
+python maIndex.py finished-files/*.ma --stats
+
+The first time a file is opened, one pass over it records the byte offsets
+of every createNode, connectAttr and file block (plus currentUnit) and
+caches them next to the file (<file>.maindex). After that, MayaAsciiFile
+memory-maps the file and only parses the blocks that are asked for, so
+checking one curve across a thousand outputs reads a few kilobytes of each.
+The cache is rebuilt whenever the file's size or modification time changes.
+'''
+
+import argparse
+import json
+import mmap
+import os
+import re
+
+import fileHashing
+import readAnimCurves
+
+#############
+# CONSTANTS #
+#############
+
+# bump this whenever the index format changes
+INDEX_VERSION = 2
+
+INDEX_EXTENSION = ".maindex"
+
+# the start of every top-level statement (anything not indented by a tab)
+TOP_LEVEL_LINE = re.compile(b"^[^\t\r\n]", re.MULTILINE)
+
+# what getStatement looks at: escaped characters, quotes and semicolons
+STATEMENT_TOKEN = re.compile(b'\\\\.|"|;', re.DOTALL)
+
+##################
+# HELPER METHODS #
+##################
+
+def getIndexPath(filePath):
+    """
+    Given the path of a Maya ASCII file, returns the path of its cached index.
+    """
+    return filePath + INDEX_EXTENSION
+
+def getStatement(data, start, end):
+    """
+    Given the file's bytes and a block's offsets, returns the block's first
+    statement (up to its semicolon) as text. Semicolons inside quoted strings
+    (e.g. a reference's -op "v=0;") don't end the statement.
+    """
+    statementEnd = end
+    inQuotes = False
+    for match in STATEMENT_TOKEN.finditer(data, start, end):
+        token = match.group()
+        if token == b'"':
+            inQuotes = not inQuotes
+        elif token == b";" and not inQuotes:
+            statementEnd = match.end()
+            break
+    return data[start:statementEnd].decode("utf-8", "replace")
+
+def getStatements(blockText):
+    """
+    Given the text of a node block, returns its statements (the createNode
+    line and every setAttr/addAttr under it), each joined onto one line.
+    """
+    statements = []
+    for line in blockText.splitlines():
+        if line.startswith("\t\t") and statements:
+            statements[-1] += " " + line.strip()
+        elif line.strip():
+            statements.append(line.strip())
+    return statements
+
+def stripNamespace(name):
+    """
+    Given a node name or DAG path, returns the short name without namespaces.
+    """
+    return name.split("|")[-1].split(":")[-1]
+
+############
+# INDEXING #
+############
+
+def buildIndex(filePath):
+    """
+    Given the path of a Maya ASCII file, returns its index: one pass over the
+    file's top-level lines records every node block (name, type, parent and
+    byte range), every connectAttr (source, destination, byte range), every
+    file reference and the time unit.
+    """
+    index = {"version": INDEX_VERSION, "stamp": list(fileHashing.getFileStamp(filePath)), "timeUnit": None,
+             "nodes": [], "connections": [], "files": []}
+    with open(filePath, "rb") as input:
+        data = input.read()
+    starts = [match.start() for match in TOP_LEVEL_LINE.finditer(data)] + [len(data)]
+    for start, end in zip(starts[:-1], starts[1:]):
+        if data.startswith(b"createNode ", start):
+            words = getStatement(data, start, end).rstrip(";").split()
+            index["nodes"].append([readAnimCurves.getFlagValue(words, "-n"), words[1],
+                                   readAnimCurves.getFlagValue(words, "-p"), start, end])
+        elif data.startswith(b"connectAttr ", start):
+            plugs = readAnimCurves.getQuotedStrings(getStatement(data, start, end))
+            if len(plugs) >= 2:
+                index["connections"].append([plugs[0], plugs[1], start, end])
+        elif data.startswith(b"file ", start):
+            statement = getStatement(data, start, end)
+            words = statement.split()
+            strings = readAnimCurves.getQuotedStrings(statement)
+            index["files"].append({
+                "namespace": readAnimCurves.getFlagValue(words, "-ns"),
+                "referenceNode": readAnimCurves.getFlagValue(words, "-rfn"),
+                "path": strings[-1] if strings else None,
+                "deferred": readAnimCurves.getFlagValue(words, "-dr") == "1",
+                "start": start,
+                "end": end,
+            })
+        elif data.startswith(b"currentUnit ", start):
+            index["timeUnit"] = readAnimCurves.getFlagValue(getStatement(data, start, end).split(), "-t")
+    return index
+
+def loadIndex(filePath, useCache=True):
+    """
+    Given the path of a Maya ASCII file, returns its index, read from the
+    cache next to the file if it is still up to date and built (and cached,
+    if the folder is writable) otherwise.
+    """
+    indexPath = getIndexPath(filePath)
+    if useCache and os.path.exists(indexPath):
+        try:
+            with open(indexPath, "r") as input:
+                index = json.load(input)
+            stamp = list(fileHashing.getFileStamp(filePath))
+            if index.get("version") == INDEX_VERSION and index.get("stamp") == stamp:
+                return index
+        except ValueError:
+            pass
+    index = buildIndex(filePath)
+    if useCache:
+        try:
+            fileHashing.writeJsonFile(indexPath, index, separators=(",", ":"))
+        except (IOError, OSError):
+            # read-only folder: keep the index in memory only
+            pass
+    return index
+
+###########
+# CLASSES #
+###########
+
+class MayaAsciiFile(object):
+    """
+    Random access to the blocks of one Maya ASCII file. The index is loaded
+    and the file memory-mapped on first use; blocks are only parsed when
+    they are asked for. Use it as a context manager (or call close()) to
+    release the mapping.
+    """
+
+    def __init__(self, filePath, useCache=True):
+        self.filePath = filePath
+        self.useCache = useCache
+        self._index = None
+        self._nodes = None
+        self._file = None
+        self._data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, errorType, error, tb):
+        self.close()
+        return False
+
+    def close(self):
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = loadIndex(self.filePath, self.useCache)
+        return self._index
+
+    def getNodes(self):
+        """
+        Returns a dict of node name -> (type, parent, start, end). Nodes are
+        also listed under their name without namespaces, unless that short
+        name is taken by a node that really has it.
+        """
+        if self._nodes is None:
+            self._nodes = {}
+            for name, nodeType, parent, start, end in self.index["nodes"]:
+                self._nodes[name] = (nodeType, parent, start, end)
+            for name, nodeType, parent, start, end in self.index["nodes"]:
+                self._nodes.setdefault(stripNamespace(name), (nodeType, parent, start, end))
+        return self._nodes
+
+    def getData(self):
+        """
+        Returns the memory-mapped file.
+        """
+        if self._data is None:
+            self._file = open(self.filePath, "rb")
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._data
+
+    def getBlockText(self, start, end):
+        return self.getData()[start:end].decode("utf-8", "replace")
+
+    def getTimeUnit(self):
+        return self.index["timeUnit"] or "film"
+
+    def getNodeNames(self, nodeType=None):
+        """
+        Returns the names of every node in the file (of the given type only,
+        if one is given), in file order.
+        """
+        return [name for name, thisType, parent, start, end in self.index["nodes"]
+                if nodeType is None or thisType == nodeType]
+
+    def hasNode(self, name):
+        return name in self.getNodes()
+
+    def getNodeType(self, name):
+        return self.getNodes()[name][0]
+
+    def getNodeText(self, name):
+        """
+        Given a node name, returns the text of its whole block (createNode
+        line and everything under it). Raises KeyError for unknown nodes.
+        """
+        nodeType, parent, start, end = self.getNodes()[name]
+        return self.getBlockText(start, end)
+
+    def getSetAttrs(self, name):
+        """
+        Given a node name, returns a list of (attribute, valueText) for every
+        setAttr in its block, in order.
+        """
+        setAttrs = []
+        for statement in getStatements(self.getNodeText(name)):
+            if statement.startswith("setAttr"):
+                setAttrs.append(readAnimCurves.splitSetAttr(statement))
+        return setAttrs
+
+    def getConnections(self, source=None, destination=None):
+        """
+        Returns a list of (source plug, destination plug) for every
+        connectAttr whose source node and/or destination node match the
+        given names (with or without namespaces). Only the index is read.
+        """
+        connections = []
+        for sourcePlug, destinationPlug, start, end in self.index["connections"]:
+            if source is not None and not self._plugMatches(sourcePlug, source):
+                continue
+            if destination is not None and not self._plugMatches(destinationPlug, destination):
+                continue
+            connections.append((sourcePlug, destinationPlug))
+        return connections
+
+    def _plugMatches(self, plug, nodeName):
+        # cheap substring test first, most connections don't mention the node
+        if nodeName not in plug:
+            return False
+        node = plug.split(".", 1)[0]
+        return nodeName == node or nodeName == stripNamespace(node)
+
+    def getAnimCurve(self, name):
+        """
+        Given the name of an anim curve node, parses only its block and
+        returns it as a readAnimCurves.AnimCurve (times in the file's time
+        unit), with the joint and channel worked out from its connection.
+        """
+        nodeType = self.getNodeType(name)
+        if nodeType not in readAnimCurves.ANIM_CURVE_TYPES:
+            raise ValueError("{0} is a {1}, not an anim curve".format(name, nodeType))
+        keyChunks = [valueText for attribute, valueText in self.getSetAttrs(name)
+                     if attribute.startswith(".ktv[") and valueText]
+        times, values = readAnimCurves.parseKeyValues(" ".join(keyChunks))
+        destinations = [destination for source, destination in self.getConnections(source=name)
+                        if source.endswith((".o", ".output"))]
+        joint, channel = readAnimCurves.getJointAndChannel(name, destinations[0] if destinations else None)
+        return readAnimCurves.AnimCurve(name, nodeType, times, values, joint, channel)
+
+    def getFileReferences(self):
+        """
+        Returns a dict per file statement (namespace, reference node, path,
+        deferred, byte range), straight from the index.
+        """
+        return list(self.index["files"])
+
+##########
+# SCRIPT #
+##########
+
+def main():
+    parser = argparse.ArgumentParser(description="Look up nodes in Maya ASCII files through a cached offset index.")
+    parser.add_argument("filePaths", nargs="+")
+    parser.add_argument("--node", action="append", default=[], help="print this anim curve's keys (or node's block)")
+    parser.add_argument("--type", help="list every node of this type")
+    parser.add_argument("--stats", action="store_true", help="print node, connection and reference counts")
+    args = parser.parse_args()
+
+    for filePath in args.filePaths:
+        with MayaAsciiFile(filePath) as mayaFile:
+            fileName = os.path.basename(filePath)
+            if args.stats:
+                print("{0}: {1} nodes, {2} connections, {3} file statements, time unit {4}".format(
+                    fileName, len(mayaFile.index["nodes"]), len(mayaFile.index["connections"]),
+                    len(mayaFile.index["files"]), mayaFile.getTimeUnit()))
+            if args.type:
+                print("{0}: {1}".format(fileName, " ".join(mayaFile.getNodeNames(args.type))))
+            for nodeName in args.node:
+                if not mayaFile.hasNode(nodeName):
+                    print("{0}: no node {1}".format(fileName, nodeName))
+                elif mayaFile.getNodeType(nodeName) in readAnimCurves.ANIM_CURVE_TYPES:
+                    curve = mayaFile.getAnimCurve(nodeName)
+                    if not len(curve):
+                        print("{0}: {1} has no keys".format(fileName, nodeName))
+                        continue
+                    print("{0}: {1} {2} keys, frames {3:g} - {4:g}, values {5:g} - {6:g}".format(
+                        fileName, nodeName, len(curve), curve.times[0], curve.times[-1],
+                        curve.values.min(), curve.values.max()))
+                else:
+                    print(mayaFile.getNodeText(nodeName))
+
+if __name__ == "__main__":
+    main()
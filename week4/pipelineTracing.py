@@ -0,0 +1,236 @@
+'''
+Lightweight tracing for the apply-animation pipeline.
+
+Pipeline functions are wrapped with @traced or with a span() block. While
+tracing is off (the default) both only check one global and call straight
+through. While it is on, every span records its name, start, duration, self
+time (minus nested spans), the take it ran for and any args such as frame
+count, joint count or bytes written. Spans can be written as a Chrome trace
+(open it in chrome://tracing or ui.perfetto.dev) and as a JSON summary of
+where each take's time went.
+'''
+
+import functools
+import json
+import os
+import threading
+import time
+
+#############
+# CONSTANTS #
+#############
+
+# bumped whenever the summary format changes
+SUMMARY_VERSION = 1
+
+###########
+# CLASSES #
+###########
+
+class Tracer(object):
+    """
+    Collects finished spans. Each thread keeps its own stack of open spans,
+    so spans nest per thread.
+    """
+
+    def __init__(self):
+        self.spans = []
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def getStack(self):
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        return self.local.stack
+
+    def popSpans(self):
+        """
+        Returns every span finished so far and forgets them.
+        """
+        with self.lock:
+            spans, self.spans = self.spans, []
+        return spans
+
+class Span(object):
+    """
+    An open span. Use it as a context manager; args can be added until it
+    closes with set().
+    """
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.take = None
+        self.startTime = None
+        self.childSeconds = 0.0
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def __enter__(self):
+        stack = self.tracer.getStack()
+        self.take = self.args.get("take") or (stack[-1].take if stack else None)
+        stack.append(self)
+        self.startTime = time.time()
+        return self
+
+    def __exit__(self, errorType, error, tb):
+        seconds = time.time() - self.startTime
+        stack = self.tracer.getStack()
+        stack.pop()
+        if stack:
+            stack[-1].childSeconds += seconds
+        if errorType is not None:
+            self.args["error"] = errorType.__name__
+        record = {
+            "name": self.name,
+            "start": self.startTime,
+            "seconds": seconds,
+            "selfSeconds": seconds - self.childSeconds,
+            "take": self.take,
+            "depth": len(stack),
+            "pid": os.getpid(),
+            "tid": threading.current_thread().ident,
+            "args": self.args,
+        }
+        with self.tracer.lock:
+            self.tracer.spans.append(record)
+        return False
+
+class NullSpan(object):
+    """
+    Stands in for a span while tracing is off.
+    """
+
+    def set(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, errorType, error, tb):
+        return False
+
+NULL_SPAN = NullSpan()
+
+# the tracer spans are recorded to, or None while tracing is off
+activeTracer = None
+
+###########
+# TRACING #
+###########
+
+def startTracing():
+    """
+    Turns tracing on for this process and returns the tracer.
+    """
+    global activeTracer
+    activeTracer = Tracer()
+    return activeTracer
+
+def stopTracing():
+    """
+    Turns tracing off and returns the spans that had not been popped yet.
+    """
+    global activeTracer
+    tracer, activeTracer = activeTracer, None
+    return tracer.popSpans() if tracer else []
+
+def isTracing():
+    return activeTracer is not None
+
+def popSpans():
+    """
+    Returns the spans finished since the last call and forgets them (an
+    empty list while tracing is off).
+    """
+    return activeTracer.popSpans() if activeTracer else []
+
+def span(name, **args):
+    """
+    Given a span name and args, returns a context manager that records the
+    span while tracing is on and does nothing otherwise.
+    """
+    if activeTracer is None:
+        return NULL_SPAN
+    return Span(activeTracer, name, args)
+
+def addSpanArgs(**args):
+    """
+    Adds args to the innermost open span of this thread, if tracing is on.
+    """
+    if activeTracer is None:
+        return
+    stack = activeTracer.getStack()
+    if stack:
+        stack[-1].set(**args)
+
+def traced(function):
+    """
+    Decorator that records every call to function as a span named after it.
+    """
+    @functools.wraps(function)
+    def tracedFunction(*args, **kwargs):
+        if activeTracer is None:
+            return function(*args, **kwargs)
+        with Span(activeTracer, function.__name__, {}):
+            return function(*args, **kwargs)
+    return tracedFunction
+
+#############
+# EXPORTING #
+#############
+
+def getChromeTrace(spans):
+    """
+    Given a list of spans, returns them in the Chrome trace event format.
+    """
+    events = []
+    for record in sorted(spans, key=lambda record: record["start"]):
+        args = dict(record["args"])
+        if record["take"]:
+            args["take"] = record["take"]
+        events.append({
+            "name": record["name"],
+            "cat": "applyAnim",
+            "ph": "X",
+            "ts": int(record["start"] * 1e6),
+            "dur": int(record["seconds"] * 1e6),
+            "pid": record["pid"],
+            "tid": record["tid"],
+            "args": args,
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+def getSummary(spans):
+    """
+    Given a list of spans, returns a dict with, per span name, the call
+    count and total, self and longest seconds, and per take the self seconds
+    spent under each span name.
+    """
+    summary = {"version": SUMMARY_VERSION, "spans": {}, "takes": {}}
+    for record in spans:
+        stats = summary["spans"].setdefault(record["name"], {
+            "count": 0, "totalSeconds": 0.0, "selfSeconds": 0.0, "maxSeconds": 0.0, "bytes": 0})
+        stats["count"] += 1
+        stats["totalSeconds"] += record["seconds"]
+        stats["selfSeconds"] += record["selfSeconds"]
+        stats["maxSeconds"] = max(stats["maxSeconds"], record["seconds"])
+        stats["bytes"] += record["args"].get("bytes", 0)
+        if record["take"]:
+            takeStats = summary["takes"].setdefault(record["take"], {})
+            takeStats[record["name"]] = takeStats.get(record["name"], 0.0) + record["selfSeconds"]
+    return summary
+
+def writeTrace(tracePath, spans):
+    """
+    Given a path and a list of spans, writes a Chrome trace to the path and
+    a summary next to it (<name>.summary.json). Returns the summary path.
+    """
+    with open(tracePath, "w") as output:
+        json.dump(getChromeTrace(spans), output)
+    summaryPath = "{0}.summary.json".format(os.path.splitext(tracePath)[0])
+    with open(summaryPath, "w") as output:
+        json.dump(getSummary(spans), output, indent=2, sort_keys=True)
+    return summaryPath
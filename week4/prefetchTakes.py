@@ -0,0 +1,278 @@
+'''
+Usage - stages upcoming takes on local disk while the current one is processed
+
+import prefetchTakes
+with prefetchTakes.TakePrefetcher(animationFiles, queueDepth=3) as prefetcher:
+    for animPath in animationFiles:
+        stagedTake = prefetcher.get(animPath)
+        ... work on stagedTake.localPath (or stagedTake.take with parse=True) ...
+        prefetcher.release(stagedTake)
+
+python prefetchTakes.py ../week3/animations/*.ma --queue-depth 4 --parse
+
+Background threads copy the takes, in the order they will be asked for, from
+wherever they live (a network share, usually) into a local staging folder,
+and with parse=True also read them with the Maya-free reader. At most
+queueDepth takes are staged ahead of the one being worked on, and staging
+pauses while the staged copies add up to more than budgetBytes, so a slow
+consumer never fills the local disk. Staged copies keep their file name
+(each take gets its own subfolder), so namespaces and output names derived
+from it don't change. A take that can't be staged is handed back with its
+original path and the error, and the caller simply reads it from the source.
+While sourceCache is on, takes are staged into the source cache instead, so
+the copies outlive the batch and don't count against budgetBytes (cached
+copies are named by content, so callers should keep using the original path
+for names and let the cache resolve it).
+'''
+
+import argparse
+import collections
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import pipelineTracing
+import sourceCache
+
+#############
+# CONSTANTS #
+#############
+
+# takes staged ahead of the one being worked on
+QUEUE_DEPTH = 2
+
+# staging pauses while the staged copies take up more than this
+BUDGET_BYTES = 2 * 1024 ** 3
+
+# copying threads; a couple is enough to keep a network share busy
+THREAD_COUNT = 2
+
+###########
+# CLASSES #
+###########
+
+class StagedTake(object):
+    """
+    One take handed out by a TakePrefetcher. localPath is the staged copy
+    (or the original path if it wasn't staged), take is the parsed
+    readAnimCurves.AnimTake when parsing is on, and error says why staging
+    or parsing failed, if it did.
+    """
+
+    def __init__(self, animPath, localPath=None, size=0, take=None, error=None):
+        self.animPath = animPath
+        self.localPath = localPath or animPath
+        self.size = size
+        # copies in the source cache belong to the cache, not the prefetcher
+        self.cached = False
+        self.take = take
+        self.error = error
+        self.waitSeconds = 0.0
+
+    def isStaged(self):
+        return self.localPath != self.animPath
+
+class TakePrefetcher(object):
+    """
+    Stages a list of takes in order on background threads (see the module
+    docstring). Use it as a context manager (or call close()) so the threads
+    stop and the staging folder is removed.
+    """
+
+    def __init__(self, animationFiles, stagingFolder=None, queueDepth=QUEUE_DEPTH, budgetBytes=BUDGET_BYTES,
+                 parse=False, threads=THREAD_COUNT):
+        self.queueDepth = max(queueDepth, 1)
+        self.budgetBytes = budgetBytes
+        self.parse = parse
+        self.ownsStagingFolder = stagingFolder is None
+        self.stagingFolder = stagingFolder or tempfile.mkdtemp(prefix="takeStaging")
+        if not os.path.exists(self.stagingFolder):
+            os.makedirs(self.stagingFolder)
+
+        self.condition = threading.Condition()
+        self.pending = collections.deque(enumerate(animationFiles))
+        self.inProgress = set()
+        self.staged = {}
+        self.usedBytes = 0
+        self.closed = False
+        self.stats = {"takes": 0, "ready": 0, "waitSeconds": 0.0, "stagedBytes": 0, "failed": 0}
+
+        self.threads = []
+        for threadIndex in range(min(threads, len(animationFiles))):
+            thread = threading.Thread(target=self.runThread, name="prefetch{0}".format(threadIndex))
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, errorType, error, tb):
+        self.close()
+        return False
+
+    def close(self):
+        """
+        Stops the threads and deletes every staged copy (and the staging
+        folder, if the prefetcher made it).
+        """
+        with self.condition:
+            self.closed = True
+            self.pending.clear()
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join()
+        for stagedTake in list(self.staged.values()):
+            self.release(stagedTake)
+        if self.ownsStagingFolder:
+            shutil.rmtree(self.stagingFolder, ignore_errors=True)
+
+    def canStageNext(self):
+        """
+        Returns True if a thread may start on the next pending take. Always
+        called with the condition held.
+        """
+        if not self.pending:
+            return False
+        if len(self.staged) + len(self.inProgress) >= self.queueDepth:
+            return False
+        # a take bigger than the whole budget is still staged on its own
+        return self.usedBytes == 0 or self.usedBytes < self.budgetBytes
+
+    def runThread(self):
+        while True:
+            with self.condition:
+                while not self.closed and not self.canStageNext():
+                    if not self.pending:
+                        return
+                    self.condition.wait(1.0)
+                if self.closed:
+                    return
+                takeIndex, animPath = self.pending.popleft()
+                self.inProgress.add(animPath)
+
+            stagedTake = self.stageTake(takeIndex, animPath)
+
+            with self.condition:
+                self.inProgress.discard(animPath)
+                self.staged[animPath] = stagedTake
+                self.usedBytes += stagedTake.size if stagedTake.isStaged() else 0
+                self.condition.notify_all()
+
+    def stageTake(self, takeIndex, animPath):
+        """
+        Given a take's position in the list and its path, copies it into its
+        own subfolder of the staging folder (and parses it, if parsing is on)
+        and returns a StagedTake. Errors are recorded on the StagedTake
+        instead of raised.
+        """
+        stagedTake = StagedTake(animPath)
+        try:
+            with pipelineTracing.span("prefetchTake", take=os.path.basename(animPath)) as span:
+                if sourceCache.activeCache:
+                    stagedTake.localPath = sourceCache.activeCache.getLocalPath(animPath)
+                    stagedTake.cached = True
+                else:
+                    self.copyTake(takeIndex, animPath, stagedTake)
+                    span.set(bytes=stagedTake.size)
+                if self.parse:
+                    import readAnimCurves
+                    stagedTake.take = readAnimCurves.readAnimTake(stagedTake.localPath)
+        except Exception as error:
+            stagedTake.error = "{0}: {1}".format(type(error).__name__, error)
+        return stagedTake
+
+    def copyTake(self, takeIndex, animPath, stagedTake):
+        """
+        Copies a take into its own subfolder of the staging folder and sets
+        the StagedTake's local path and size.
+        """
+        takeFolder = os.path.join(self.stagingFolder, str(takeIndex))
+        if not os.path.exists(takeFolder):
+            os.mkdir(takeFolder)
+        localPath = os.path.join(takeFolder, os.path.basename(animPath))
+        shutil.copyfile(animPath, localPath)
+        stagedTake.localPath = localPath
+        stagedTake.size = os.path.getsize(localPath)
+
+    def get(self, animPath):
+        """
+        Given the path of one of the takes, waits until it is staged and
+        returns its StagedTake. A take nobody has started on yet is taken off
+        the list and returned unstaged, so asking out of order never blocks.
+        """
+        startTime = time.time()
+        with self.condition:
+            self.stats["takes"] += 1
+            if animPath in self.staged:
+                self.stats["ready"] += 1
+            else:
+                for item in self.pending:
+                    if item[1] == animPath:
+                        self.pending.remove(item)
+                        return StagedTake(animPath)
+                with pipelineTracing.span("waitForTake", take=os.path.basename(animPath)):
+                    while animPath not in self.staged:
+                        if animPath not in self.inProgress:
+                            return StagedTake(animPath)
+                        self.condition.wait(1.0)
+            stagedTake = self.staged[animPath]
+            stagedTake.waitSeconds = time.time() - startTime
+            self.stats["waitSeconds"] += stagedTake.waitSeconds
+            self.stats["stagedBytes"] += stagedTake.size
+            self.stats["failed"] += 1 if stagedTake.error else 0
+            return stagedTake
+
+    def release(self, stagedTake):
+        """
+        Given a StagedTake that is no longer needed, deletes its staged copy
+        and lets the threads stage the next takes in its place.
+        """
+        with self.condition:
+            if self.staged.pop(stagedTake.animPath, None) is None:
+                return
+            if stagedTake.isStaged():
+                self.usedBytes -= stagedTake.size
+            self.condition.notify_all()
+        stagedTake.take = None
+        if stagedTake.isStaged() and not stagedTake.cached:
+            shutil.rmtree(os.path.dirname(stagedTake.localPath), ignore_errors=True)
+
+    def getSummary(self):
+        """
+        Returns a one-line summary of how often takes were already staged
+        when they were asked for and how long the caller waited in total.
+        """
+        return "Prefetch: {0} of {1} takes ready when needed, {2:.2f}s waiting, {3:.1f} MB staged".format(
+            self.stats["ready"], self.stats["takes"], self.stats["waitSeconds"],
+            self.stats["stagedBytes"] / (1024.0 ** 2))
+
+##########
+# SCRIPT #
+##########
+
+def main():
+    parser = argparse.ArgumentParser(description="Stage takes on local disk ahead of a (simulated) batch.")
+    parser.add_argument("animationFiles", nargs="+")
+    parser.add_argument("--queue-depth", type=int, default=QUEUE_DEPTH)
+    parser.add_argument("--budget-mb", type=float, default=BUDGET_BYTES / (1024.0 ** 2))
+    parser.add_argument("--parse", action="store_true", help="also read each take with the Maya-free reader")
+    parser.add_argument("--work-seconds", type=float, default=0.0, help="fake processing time per take")
+    args = parser.parse_args()
+
+    startTime = time.time()
+    with TakePrefetcher(args.animationFiles, queueDepth=args.queue_depth,
+                        budgetBytes=int(args.budget_mb * 1024 ** 2), parse=args.parse) as prefetcher:
+        for animPath in args.animationFiles:
+            stagedTake = prefetcher.get(animPath)
+            print("{0}: waited {1:.3f}s{2}".format(os.path.basename(animPath), stagedTake.waitSeconds,
+                                                   " ({0})".format(stagedTake.error) if stagedTake.error else ""))
+            time.sleep(args.work_seconds)
+            prefetcher.release(stagedTake)
+        print(prefetcher.getSummary())
+    print("{0} takes in {1:.2f}s".format(len(args.animationFiles), time.time() - startTime))
+
+if __name__ == "__main__":
+    main()
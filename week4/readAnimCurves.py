@@ -0,0 +1,377 @@
+from collections import OrderedDict
+import io
+import os
+import sys
+
+import numpy
+
+#############
+# CONSTANTS #
+#############
+
+# frames per second for each of Maya's named time units (currentUnit -t)
+TIME_UNIT_FPS = {
+    "game": 15.0,
+    "film": 24.0,
+    "pal": 25.0,
+    "ntsc": 30.0,
+    "show": 48.0,
+    "palf": 50.0,
+    "ntscf": 60.0,
+    "sec": 1.0,
+    "millisec": 1000.0,
+    "hour": 1.0 / 3600.0,
+    "min": 1.0 / 60.0,
+}
+
+# short attribute names used in connectAttr lines, mapped to the long channel
+# names that Maya also uses when it names anim curves (e.g. Hips_translateX)
+CHANNEL_NAMES = {
+    "tx": "translateX",
+    "ty": "translateY",
+    "tz": "translateZ",
+    "rx": "rotateX",
+    "ry": "rotateY",
+    "rz": "rotateZ",
+    "sx": "scaleX",
+    "sy": "scaleY",
+    "sz": "scaleZ",
+    "v": "visibility",
+}
+
+# time-driven anim curves; driven keys (animCurveUA etc.) are ignored
+ANIM_CURVE_TYPES = ("animCurveTA", "animCurveTL", "animCurveTU", "animCurveTT")
+
+# joint attributes that describe the rest pose
+JOINT_REST_ATTRIBUTES = {
+    ".t": "translate",
+    ".r": "rotate",
+    ".jo": "jointOrient",
+    ".s": "scale",
+}
+
+###########
+# CLASSES #
+###########
+
+class AnimCurve(object):
+    """
+    A single time-driven animation curve. times and values are NumPy arrays
+    of the same length; joint and channel are the short joint name and long
+    channel name the curve drives (or None if they could not be worked out).
+    """
+
+    def __init__(self, name, curveType, times, values, joint=None, channel=None):
+        self.name = name
+        self.curveType = curveType
+        self.times = times
+        self.values = values
+        self.joint = joint
+        self.channel = channel
+
+    def __len__(self):
+        return len(self.times)
+
+    def __repr__(self):
+        return "AnimCurve({0!r}, {1}, {2} keys)".format(self.name, self.curveType, len(self))
+
+class Joint(object):
+    """
+    A joint and its rest pose, as written in the file. Attributes that were
+    not written are left at Maya's defaults.
+    """
+
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent
+        self.translate = (0.0, 0.0, 0.0)
+        self.rotate = (0.0, 0.0, 0.0)
+        self.jointOrient = (0.0, 0.0, 0.0)
+        self.scale = (1.0, 1.0, 1.0)
+        # index into Maya's rotateOrder enum (0 is xyz)
+        self.rotateOrder = 0
+
+    def __repr__(self):
+        return "Joint({0!r}, parent={1!r})".format(self.name, self.parent)
+
+class AnimTake(object):
+    """
+    Everything we read out of one animation file: the time unit and fps from
+    currentUnit, the joints in file order and the anim curves in file order.
+    """
+
+    def __init__(self, filePath):
+        self.filePath = filePath
+        self.timeUnit = "film"
+        self.fps = TIME_UNIT_FPS["film"]
+        self.joints = OrderedDict()
+        self.curves = []
+
+    def getCurve(self, joint, channel):
+        """
+        Given a joint name and a channel name, returns the curve driving it,
+        or None if that channel isn't animated.
+        """
+        for curve in self.curves:
+            if curve.joint == joint and curve.channel == channel:
+                return curve
+        return None
+
+    def getCurvesByJoint(self):
+        """
+        Returns an ordered dict of joint name -> {channel: curve}.
+        """
+        curvesByJoint = OrderedDict()
+        for curve in self.curves:
+            curvesByJoint.setdefault(curve.joint, OrderedDict())[curve.channel] = curve
+        return curvesByJoint
+
+    def getFrameRange(self):
+        """
+        Returns the (first, last) key time across all curves, or None if the
+        take has no keys at all.
+        """
+        keyed = [curve for curve in self.curves if len(curve)]
+        if not keyed:
+            return None
+        first = min(curve.times[0] for curve in keyed)
+        last = max(curve.times[-1] for curve in keyed)
+        return (float(first), float(last))
+
+    def getKeyCount(self):
+        """
+        Returns the total number of keys across all curves.
+        """
+        return sum(len(curve) for curve in self.curves)
+
+##################
+# HELPER METHODS #
+##################
+
+def getFramesPerSecond(timeUnit):
+    """
+    Given a Maya time unit as written by currentUnit -t (e.g. "film" or
+    "120fps"), returns the number of frames per second.
+    """
+    if timeUnit in TIME_UNIT_FPS:
+        return TIME_UNIT_FPS[timeUnit]
+    if timeUnit.endswith("fps"):
+        return float(timeUnit[:-len("fps")])
+    raise ValueError("Unknown time unit: {0}".format(timeUnit))
+
+def getQuotedStrings(text):
+    """
+    Given a line of MEL, returns every double-quoted string in it, in order.
+    """
+    strings = []
+    start = text.find('"')
+    while start != -1:
+        end = text.find('"', start + 1)
+        while end != -1 and text[end - 1] == "\\":
+            end = text.find('"', end + 1)
+        if end == -1:
+            break
+        strings.append(text[start + 1:end])
+        start = text.find('"', end + 1)
+    return strings
+
+def getFlagValue(words, flag):
+    """
+    Given the words of a MEL command and a flag, returns the word that
+    follows the flag (with quotes removed), or None if the flag isn't there.
+    """
+    if flag not in words:
+        return None
+    index = words.index(flag) + 1
+    if index >= len(words):
+        return None
+    return words[index].strip('";')
+
+def splitSetAttr(statement):
+    """
+    Given a complete setAttr statement, returns (attribute, valueText) where
+    valueText is everything after the attribute name with any -type flag and
+    the trailing semicolon removed.
+    """
+    firstQuote = statement.find('"')
+    secondQuote = statement.find('"', firstQuote + 1)
+    if firstQuote == -1 or secondQuote == -1:
+        return None, ""
+    attribute = statement[firstQuote + 1:secondQuote]
+    valueText = statement[secondQuote + 1:].strip().rstrip(";")
+    if valueText.startswith("-type"):
+        typeEnd = valueText.find('"', valueText.find('"') + 1)
+        valueText = valueText[typeEnd + 1:]
+    return attribute, valueText
+
+def parseKeyValues(valueText):
+    """
+    Given the value text of a .ktv setAttr ("time value time value ..."),
+    returns (times, values) as NumPy float arrays.
+    """
+    pairs = numpy.array(valueText.split(), dtype=numpy.float64)
+    return pairs[0::2], pairs[1::2]
+
+def getJointAndChannel(curveName, destination=None):
+    """
+    Given an anim curve name and, optionally, the plug it is connected to,
+    returns (joint, channel). The connection is used when it points at a
+    joint attribute; otherwise we fall back on Maya's <joint>_<channel>
+    naming for baked curves (e.g. curves connected to a reference node's
+    placeholder list). Maya numbers a curve whose name is taken (e.g.
+    Head_rotateX1 when several rigs are baked in one scene), so trailing
+    digits are ignored.
+    """
+    if destination and "." in destination:
+        node, attribute = destination.rsplit(".", 1)
+        channel = CHANNEL_NAMES.get(attribute, attribute)
+        if channel in CHANNEL_NAMES.values():
+            joint = node.split("|")[-1].split(":")[-1]
+            return joint, channel
+    if "_" in curveName:
+        joint, channel = curveName.rsplit("_", 1)
+        channel = channel.rstrip("0123456789")
+        if channel in CHANNEL_NAMES.values():
+            return joint.split(":")[-1], channel
+    return None, None
+
+####################
+# STREAMING READER #
+####################
+
+class _TakeReader(object):
+    """
+    Line by line state machine over a Maya ASCII file. Only statements that
+    belong to joints, time-driven anim curves, currentUnit and connectAttr
+    are buffered; every other node (cameras, render layers, script nodes...)
+    is skipped without being parsed.
+    """
+
+    def __init__(self, take):
+        self.take = take
+        self.currentNode = None
+        self.currentType = None
+        self.keyChunks = []
+        self.statement = []
+        self.curveDestinations = {}
+
+    def feed(self, line):
+        if line.startswith("\t\t"):
+            if self.statement:
+                self.statement.append(line)
+                self._flushIfComplete()
+            return
+        if self.statement:
+            # a new statement started before the last one was terminated
+            self._processStatement("".join(self.statement))
+            self.statement = []
+        if line.startswith("\t"):
+            if self.currentType is None or not line.startswith("\tsetAttr"):
+                return
+        else:
+            if line.startswith("//"):
+                return
+            self._finishNode()
+            if not line.startswith(("createNode", "connectAttr", "currentUnit")):
+                return
+        self.statement.append(line)
+        self._flushIfComplete()
+
+    def finish(self):
+        if self.statement:
+            self._processStatement("".join(self.statement))
+            self.statement = []
+        self._finishNode()
+        for curve in self.take.curves:
+            curve.joint, curve.channel = getJointAndChannel(
+                curve.name, self.curveDestinations.get(curve.name))
+        return self.take
+
+    def _flushIfComplete(self):
+        if self.statement[-1].rstrip().endswith(";"):
+            self._processStatement("".join(self.statement))
+            self.statement = []
+
+    def _processStatement(self, statement):
+        statement = statement.strip()
+        if statement.startswith("createNode"):
+            self._startNode(statement)
+        elif statement.startswith("setAttr"):
+            self._processSetAttr(statement)
+        elif statement.startswith("connectAttr"):
+            plugs = getQuotedStrings(statement)
+            if len(plugs) >= 2:
+                source, destination = plugs[0], plugs[1]
+                if source.endswith(".o") or source.endswith(".output"):
+                    self.curveDestinations[source.rsplit(".", 1)[0]] = destination
+        elif statement.startswith("currentUnit"):
+            timeUnit = getFlagValue(statement.split(), "-t")
+            if timeUnit:
+                self.take.timeUnit = timeUnit
+                self.take.fps = getFramesPerSecond(timeUnit)
+
+    def _startNode(self, statement):
+        words = statement.rstrip(";").split()
+        nodeType = words[1]
+        name = getFlagValue(words, "-n")
+        if nodeType in ANIM_CURVE_TYPES:
+            self.currentType = nodeType
+            self.currentNode = name
+            self.keyChunks = []
+        elif nodeType == "joint":
+            parent = getFlagValue(words, "-p")
+            if parent is not None:
+                parent = parent.split("|")[-1]
+            self.currentType = nodeType
+            self.currentNode = Joint(name, parent)
+            self.take.joints[name] = self.currentNode
+
+    def _processSetAttr(self, statement):
+        attribute, valueText = splitSetAttr(statement)
+        if self.currentType == "joint":
+            restAttribute = JOINT_REST_ATTRIBUTES.get(attribute)
+            if restAttribute:
+                values = tuple(float(value) for value in valueText.split())
+                setattr(self.currentNode, restAttribute, values)
+            elif attribute == ".ro" and valueText:
+                self.currentNode.rotateOrder = int(valueText)
+        elif attribute.startswith(".ktv[") and valueText:
+            self.keyChunks.append(valueText)
+
+    def _finishNode(self):
+        if self.currentType in ANIM_CURVE_TYPES:
+            times, values = parseKeyValues(" ".join(self.keyChunks))
+            self.take.curves.append(AnimCurve(self.currentNode, self.currentType, times, values))
+        self.currentNode = None
+        self.currentType = None
+        self.keyChunks = []
+
+def readAnimTake(filePath):
+    """
+    Given the path of a Maya ASCII animation file, streams through it line
+    by line and returns an AnimTake with the file's fps, its joints and
+    every time-driven anim curve as NumPy arrays. Does not need Maya.
+    """
+    if not os.path.exists(filePath):
+        raise IOError("File does not exist: {0}".format(filePath))
+    if not filePath.lower().endswith(".ma"):
+        raise ValueError("Not a Maya ASCII file: {0}".format(filePath))
+    reader = _TakeReader(AnimTake(filePath))
+    with io.open(filePath, "r", encoding="utf-8", errors="replace") as input:
+        for line in input:
+            reader.feed(line)
+    return reader.finish()
+
+##########
+# SCRIPT #
+##########
+
+def main():
+    for filePath in sys.argv[1:]:
+        take = readAnimTake(filePath)
+        print("{0}: {1} fps, {2} joints, {3} curves, {4} keys, frames {5}".format(
+            os.path.basename(filePath), take.fps, len(take.joints),
+            len(take.curves), take.getKeyCount(), take.getFrameRange()))
+
+if __name__ == "__main__":
+    main()
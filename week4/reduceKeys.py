@@ -0,0 +1,144 @@
+import numpy
+
+#############
+# CONSTANTS #
+#############
+
+# default largest error allowed per curve type: degrees for rotation,
+# centimeters for translation, plain units for everything else
+DEFAULT_TOLERANCES = {
+    "animCurveTA": 0.01,
+    "animCurveTL": 0.001,
+    "animCurveTU": 0.0001,
+}
+
+##################
+# HELPER METHODS #
+##################
+
+def getRunPositions(mask):
+    """
+    Given a boolean array, returns for every element its position inside the
+    run of consecutive True values it belongs to (0 for the first element of
+    a run, and for every False element).
+    """
+    indices = numpy.arange(len(mask))
+    runStarts = mask & ~numpy.concatenate(([False], mask[:-1]))
+    lastRunStart = numpy.maximum.accumulate(numpy.where(runStarts, indices, 0))
+    return numpy.where(mask, indices - lastRunStart, 0)
+
+def getRemovalErrors(times, values, kept):
+    """
+    Given a curve's original times and values and the indices of the keys
+    currently kept, returns for every interior kept key the largest error
+    (over all original keys between its two kept neighbours) that removing it
+    would cause if its neighbours were joined by a straight line.
+    """
+    left = kept[:-2]
+    right = kept[2:]
+    lengths = right - left + 1
+    offsets = numpy.concatenate(([0], numpy.cumsum(lengths)[:-1]))
+    # the original key indices covered by each candidate's window, back to back
+    samples = numpy.arange(lengths.sum()) - numpy.repeat(offsets, lengths) + numpy.repeat(left, lengths)
+    startTimes = numpy.repeat(times[left], lengths)
+    endTimes = numpy.repeat(times[right], lengths)
+    startValues = numpy.repeat(values[left], lengths)
+    endValues = numpy.repeat(values[right], lengths)
+    weights = (times[samples] - startTimes) / (endTimes - startTimes)
+    errors = numpy.abs(values[samples] - (startValues + weights * (endValues - startValues)))
+    return numpy.maximum.reduceat(errors, offsets)
+
+def reduceCurveKeys(times, values, tolerance):
+    """
+    Given a curve's key times and values (NumPy arrays) and a tolerance,
+    returns a boolean mask of the keys to keep so that, with linear
+    interpolation between the kept keys, the curve never moves more than
+    tolerance away from any original key. The first and last keys are
+    always kept.
+
+    Each pass scores every remaining key at once and removes every other key
+    from each run of removable keys, so a pass never removes two neighbours
+    and the error bound holds against the original keys.
+    """
+    keep = numpy.ones(len(times), dtype=bool)
+    while True:
+        kept = numpy.flatnonzero(keep)
+        if len(kept) <= 2:
+            break
+        removable = getRemovalErrors(times, values, kept) <= tolerance
+        removable &= getRunPositions(removable) % 2 == 0
+        if not removable.any():
+            break
+        keep[kept[1:-1][removable]] = False
+    return keep
+
+def getNumberBytes(numbers):
+    """
+    Given an array of numbers, returns roughly how many characters each one
+    takes written the way Maya writes doubles (up to 17 significant digits):
+    exact for whole numbers such as frame times, and 17 digits plus the
+    point for anything else.
+    """
+    numbers = numpy.asarray(numbers, dtype=numpy.float64)
+    magnitudes = numpy.abs(numbers)
+    whole = (numbers == numpy.round(numbers)) & (magnitudes < 1e16)
+    integerDigits = numpy.floor(numpy.log10(numpy.maximum(magnitudes, 1.0))).astype(numpy.int64) + 1
+    # a leading "0" before the point below 1
+    fractionDigits = 18 + (magnitudes < 1.0)
+    return numpy.where(whole, integerDigits, fractionDigits) + (numbers < 0.0)
+
+def getKeyBytes(times, values):
+    """
+    Given a curve's key times and values, returns roughly how many bytes
+    each key takes up in the .ktv block of a Maya ASCII file (see
+    getNumberBytes), as an array.
+    """
+    # each time and value is followed by a space
+    return getNumberBytes(times) + getNumberBytes(values) + 2
+
+def getTolerance(curveType, tolerances=None):
+    """
+    Given an anim curve type and an optional dict of curve type -> tolerance,
+    returns the tolerance to use for that curve.
+    """
+    tolerances = tolerances or {}
+    return tolerances.get(curveType, DEFAULT_TOLERANCES.get(curveType, DEFAULT_TOLERANCES["animCurveTU"]))
+
+def createReport(name):
+    """
+    Given the name of a take, returns an empty reduction report.
+    """
+    return {"name": name, "keysBefore": 0, "keysAfter": 0, "bytesBefore": 0, "bytesAfter": 0}
+
+def addToReport(report, times, values, keep):
+    """
+    Given a report and one curve's keys and keep mask, adds the curve's key
+    and byte counts before and after reduction to the report.
+    """
+    report["keysBefore"] += len(times)
+    report["keysAfter"] += int(keep.sum())
+    keyBytes = getKeyBytes(times, values)
+    report["bytesBefore"] += int(keyBytes.sum())
+    report["bytesAfter"] += int(keyBytes[keep].sum())
+
+def formatReport(report):
+    """
+    Given a reduction report, returns a one line summary of it.
+    """
+    return "{0}: {1} -> {2} keys, {3} -> {4} bytes".format(
+        report["name"], report["keysBefore"], report["keysAfter"],
+        report["bytesBefore"], report["bytesAfter"])
+
+def reduceTakeCurves(take, tolerances=None):
+    """
+    Given an AnimTake from readAnimCurves (or anything with a curves list of
+    AnimCurves), reduces every curve in place and returns a report of the
+    keys and bytes before and after.
+    """
+    report = createReport(take.filePath)
+    for curve in take.curves:
+        keep = reduceCurveKeys(curve.times, curve.values, getTolerance(curve.curveType, tolerances))
+        addToReport(report, curve.times, curve.values, keep)
+        curve.times = curve.times[keep]
+        curve.values = curve.values[keep]
+    return report
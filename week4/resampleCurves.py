@@ -0,0 +1,337 @@
+import numpy
+
+#############
+# CONSTANTS #
+#############
+
+ROTATE_CHANNELS = ("rotateX", "rotateY", "rotateZ")
+
+# Maya's rotate orders, in the order of the rotateOrder enum; the first axis
+# is applied first
+ROTATE_ORDERS = ("xyz", "yzx", "zxy", "xzy", "yxz", "zyx")
+
+# Maya's named time units for the delivery rates we resample to
+FPS_TIME_UNITS = {
+    15.0: "game",
+    24.0: "film",
+    25.0: "pal",
+    30.0: "ntsc",
+    48.0: "show",
+    50.0: "palf",
+    60.0: "ntscf",
+}
+
+##################
+# HELPER METHODS #
+##################
+
+def getTimeUnit(fps):
+    """
+    Given a frame rate, returns the Maya time unit for it (e.g. "ntsc" or
+    "120fps").
+    """
+    fps = float(fps)
+    if fps in FPS_TIME_UNITS:
+        return FPS_TIME_UNITS[fps]
+    return "{0:g}fps".format(fps)
+
+def getSampleTimes(firstFrame, lastFrame, sourceFps, targetFps):
+    """
+    Given the first and last frame of a curve at sourceFps, returns the
+    times (in source frames) of every targetFps frame from the first frame
+    on. The last frame is always included, so the range doesn't shrink.
+    """
+    step = float(sourceFps) / targetFps
+    count = int(numpy.floor((lastFrame - firstFrame) / step + 1e-9)) + 1
+    times = firstFrame + numpy.arange(count) * step
+    if lastFrame - times[-1] > 1e-6:
+        times = numpy.append(times, lastFrame)
+    return times
+
+def getRotateOrder(rotateOrder):
+    """
+    Given a rotate order as Maya's rotateOrder enum index or as a name
+    ("xyz", "zxy"...), returns its name. Raises ValueError for anything else.
+    """
+    if hasattr(rotateOrder, "__index__"):
+        if 0 <= rotateOrder < len(ROTATE_ORDERS):
+            return ROTATE_ORDERS[rotateOrder]
+    elif str(rotateOrder).lower() in ROTATE_ORDERS:
+        return str(rotateOrder).lower()
+    raise ValueError("Unknown rotate order: {0!r}".format(rotateOrder))
+
+def getAxisIndices(rotateOrder):
+    """
+    Given a rotate order, returns the indices (0 for x...) of its axes in the
+    order they are applied.
+    """
+    return tuple("xyz".index(axis) for axis in getRotateOrder(rotateOrder))
+
+def wrapDegrees(angles):
+    """
+    Given an array of angles in degrees, returns them wrapped to [-180, 180).
+    """
+    return (angles + 180.0) % 360.0 - 180.0
+
+###############
+# QUATERNIONS #
+###############
+
+def multiplyQuaternions(first, second):
+    """
+    Given two (..., 4) arrays of (w, x, y, z) quaternions, returns their
+    Hamilton products (the rotation of second followed by that of first).
+    """
+    w1, x1, y1, z1 = first[..., 0], first[..., 1], first[..., 2], first[..., 3]
+    w2, x2, y2, z2 = second[..., 0], second[..., 1], second[..., 2], second[..., 3]
+    return numpy.stack((
+        w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+        w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+        w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+        w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2,
+    ), axis=-1)
+
+def eulerToQuaternions(rotations, rotateOrder="xyz"):
+    """
+    Given an (..., 3) array of Euler angles in degrees (x, y, z) and their
+    rotate order, returns the (..., 4) array of (w, x, y, z) unit quaternions.
+    """
+    halves = numpy.radians(numpy.asarray(rotations, dtype=numpy.float64)) * 0.5
+    quaternions = None
+    for axis in getAxisIndices(rotateOrder):
+        axisQuaternions = numpy.zeros(halves.shape[:-1] + (4,))
+        axisQuaternions[..., 0] = numpy.cos(halves[..., axis])
+        axisQuaternions[..., axis + 1] = numpy.sin(halves[..., axis])
+        # each axis is applied after the ones before it
+        quaternions = axisQuaternions if quaternions is None else multiplyQuaternions(axisQuaternions, quaternions)
+    return quaternions
+
+def quaternionsToEuler(quaternions, rotateOrder="xyz"):
+    """
+    Given an (..., 4) array of (w, x, y, z) unit quaternions and a rotate
+    order, returns the (..., 3) array of Euler angles in degrees (x, y, z),
+    each in [-180, 180] and the order's middle axis in [-90, 90].
+    """
+    w, x, y, z = quaternions[..., 0], quaternions[..., 1], quaternions[..., 2], quaternions[..., 3]
+    matrix = numpy.empty(quaternions.shape[:-1] + (3, 3))
+    matrix[..., 0, 0] = 1.0 - 2.0 * (y * y + z * z)
+    matrix[..., 0, 1] = 2.0 * (x * y - w * z)
+    matrix[..., 0, 2] = 2.0 * (x * z + w * y)
+    matrix[..., 1, 0] = 2.0 * (x * y + w * z)
+    matrix[..., 1, 1] = 1.0 - 2.0 * (x * x + z * z)
+    matrix[..., 1, 2] = 2.0 * (y * z - w * x)
+    matrix[..., 2, 0] = 2.0 * (x * z - w * y)
+    matrix[..., 2, 1] = 2.0 * (y * z + w * x)
+    matrix[..., 2, 2] = 1.0 - 2.0 * (x * x + y * y)
+    first, middle, last = getAxisIndices(rotateOrder)
+    # xyz, yzx and zxy are the cyclic orders; the others flip the signs
+    sign = 1.0 if getRotateOrder(rotateOrder) in ROTATE_ORDERS[:3] else -1.0
+    rotations = numpy.empty(quaternions.shape[:-1] + (3,))
+    rotations[..., first] = numpy.arctan2(sign * matrix[..., last, middle], matrix[..., last, last])
+    rotations[..., middle] = numpy.arcsin(numpy.clip(-sign * matrix[..., last, first], -1.0, 1.0))
+    rotations[..., last] = numpy.arctan2(sign * matrix[..., middle, first], matrix[..., first, first])
+    return numpy.degrees(rotations)
+
+def makeQuaternionsContinuous(quaternions):
+    """
+    Given an (n, 4) array of quaternions in time order, returns a copy where
+    each one is negated if needed to be on the same side as the previous
+    one, so interpolating between neighbours takes the short way round.
+    """
+    dots = numpy.sum(quaternions[1:] * quaternions[:-1], axis=-1)
+    signs = numpy.concatenate(([1.0], numpy.cumprod(numpy.where(dots < 0.0, -1.0, 1.0))))
+    return quaternions * signs[:, numpy.newaxis]
+
+def slerpQuaternions(times, quaternions, sampleTimes):
+    """
+    Given key times, an (n, 4) array of continuous quaternions at those
+    times and the times to sample at, returns the (m, 4) array of spherical
+    linear interpolations at the sample times (clamped at both ends).
+    """
+    if len(times) == 1:
+        return numpy.repeat(quaternions, len(sampleTimes), axis=0)
+    sampleTimes = numpy.clip(sampleTimes, times[0], times[-1])
+    lefts = numpy.clip(numpy.searchsorted(times, sampleTimes, side="right") - 1, 0, len(times) - 2)
+    weights = ((sampleTimes - times[lefts]) / (times[lefts + 1] - times[lefts]))[:, numpy.newaxis]
+    start = quaternions[lefts]
+    end = quaternions[lefts + 1]
+    angles = numpy.arccos(numpy.clip(numpy.sum(start * end, axis=-1), -1.0, 1.0))[:, numpy.newaxis]
+    sines = numpy.sin(angles)
+    # nearly identical neighbours: fall back on a normalized lerp
+    small = sines < 1e-6
+    safeSines = numpy.where(small, 1.0, sines)
+    startWeights = numpy.where(small, 1.0 - weights, numpy.sin((1.0 - weights) * angles) / safeSines)
+    endWeights = numpy.where(small, weights, numpy.sin(weights * angles) / safeSines)
+    result = start * startWeights + end * endWeights
+    return result / numpy.linalg.norm(result, axis=-1)[:, numpy.newaxis]
+
+################
+# EULER FILTER #
+################
+
+def getAlternateEuler(rotations, rotateOrder="xyz"):
+    """
+    Given an (..., 3) array of Euler angles in degrees and their rotate
+    order, returns the other Euler solution for the same orientations: 180
+    degrees added to the first and last axes and the middle one mirrored
+    ((x + 180, 180 - y, z + 180) for xyz).
+    """
+    alternate = numpy.array(rotations, dtype=numpy.float64) + 180.0
+    middle = getAxisIndices(rotateOrder)[1]
+    alternate[..., middle] = 180.0 - rotations[..., middle]
+    return alternate
+
+def getEulerDistances(rotations, previous):
+    """
+    Given two (..., 3) arrays of Euler angles in degrees, returns the summed
+    absolute difference of their channels, ignoring whole turns.
+    """
+    return numpy.sum(numpy.abs(wrapDegrees(rotations - previous)), axis=-1)
+
+def filterEulerRotations(rotations, reference=None, rotateOrder="xyz"):
+    """
+    Given an (..., frames, 3) array of Euler rotations in degrees (any number
+    of joints stacked in front), returns a filtered copy without flips: on
+    every frame the Euler solution closest to the previous frame is picked,
+    and whole turns are added so no channel jumps more than 180 degrees.
+    All joints and frames are handled in one go. reference, an (..., 3)
+    array, is the rotation the first frame should stay close to (e.g. the
+    original first key), so the filtered curves start where they used to.
+    All joints share rotateOrder.
+    """
+    rotations = numpy.asarray(rotations, dtype=numpy.float64)
+    alternate = getAlternateEuler(rotations, rotateOrder)
+    # switch solutions wherever the other one continues the previous frame better
+    previous = rotations[..., :-1, :]
+    switch = getEulerDistances(alternate[..., 1:, :], previous) < getEulerDistances(rotations[..., 1:, :], previous)
+    useAlternate = numpy.cumsum(switch, axis=-1) % 2 == 1
+    useAlternate = numpy.concatenate((numpy.zeros(useAlternate.shape[:-1] + (1,), dtype=bool), useAlternate), axis=-1)
+    if reference is not None:
+        reference = numpy.asarray(reference, dtype=numpy.float64)
+        startAlternate = (getEulerDistances(alternate[..., 0, :], reference) <
+                          getEulerDistances(rotations[..., 0, :], reference))
+        useAlternate ^= startAlternate[..., numpy.newaxis]
+    chosen = numpy.where(useAlternate[..., numpy.newaxis], alternate, rotations)
+
+    # unroll: remove every jump of more than half a turn
+    steps = wrapDegrees(numpy.diff(chosen, axis=-2))
+    unrolled = numpy.concatenate((chosen[..., :1, :], chosen[..., :1, :] + numpy.cumsum(steps, axis=-2)), axis=-2)
+    if reference is not None:
+        turns = numpy.round((reference - unrolled[..., 0, :]) / 360.0)
+        unrolled = unrolled + (turns * 360.0)[..., numpy.newaxis, :]
+    return unrolled
+
+##############
+# RESAMPLING #
+##############
+
+def resampleRotation(times, rotations, sampleTimes, rotateOrder="xyz"):
+    """
+    Given key times, an (n, 3) array of Euler rotations in degrees at those
+    times, the times to sample at and the rotate order, returns the (m, 3)
+    rotations at the sample times, interpolated as quaternions so the result
+    never flips through gimbal lock.
+    """
+    quaternions = makeQuaternionsContinuous(eulerToQuaternions(rotations, rotateOrder))
+    return quaternionsToEuler(slerpQuaternions(times, quaternions, sampleTimes), rotateOrder)
+
+def resampleJointChannels(channels, sourceFps, targetFps, restRotation=(0.0, 0.0, 0.0), rotateOrder="xyz"):
+    """
+    Given a dict of channel name -> (times, values) for one joint, the rate
+    the times are in and the rate to resample to, returns a dict of channel
+    name -> (times, values) with one key per targetFps frame. Times are
+    returned in target frames. Rotations are slerped as quaternions in the
+    joint's rotate order (a missing rotate channel uses restRotation) and
+    left unfiltered; anything else is interpolated linearly.
+    """
+    keyed = [times for times, values in channels.values() if len(times)]
+    if not keyed:
+        return dict(channels)
+    sampleTimes = getSampleTimes(min(times[0] for times in keyed), max(times[-1] for times in keyed),
+                                 sourceFps, targetFps)
+    targetTimes = sampleTimes * (float(targetFps) / sourceFps)
+    resampled = {}
+    for channel, (times, values) in channels.items():
+        if channel not in ROTATE_CHANNELS:
+            resampled[channel] = (targetTimes, numpy.interp(sampleTimes, times, values))
+
+    rotateChannels = [channel for channel in ROTATE_CHANNELS if channel in channels]
+    if rotateChannels:
+        rotateTimes = numpy.unique(numpy.concatenate([channels[channel][0] for channel in rotateChannels]))
+        rotations = numpy.empty((len(rotateTimes), 3))
+        for axis, channel in enumerate(ROTATE_CHANNELS):
+            if channel in channels:
+                rotations[:, axis] = numpy.interp(rotateTimes, *channels[channel])
+            else:
+                rotations[:, axis] = restRotation[axis]
+        newRotations = resampleRotation(rotateTimes, rotations, sampleTimes, rotateOrder)
+        for axis, channel in enumerate(ROTATE_CHANNELS):
+            if channel in channels:
+                resampled[channel] = (targetTimes, newRotations[:, axis])
+    return resampled
+
+def filterTakeRotations(jointChannels, rotateOrders=None):
+    """
+    Given a dict of joint -> {channel: (times, values)} whose rotate curves
+    share the same times within each joint, and a dict of joint -> rotate
+    order (xyz for joints not in it), runs filterEulerRotations on all joints
+    that are keyed at the same times with the same rotate order in one call
+    and replaces their rotate values in place. Each joint stays close to its
+    original first rotation.
+    """
+    rotateOrders = rotateOrders or {}
+    groups = {}
+    for joint, channels in jointChannels.items():
+        rotateChannels = [channel for channel in ROTATE_CHANNELS if channel in channels]
+        if len(rotateChannels) != 3:
+            # a lone rotate channel can't switch Euler solutions, only wrap
+            for channel in rotateChannels:
+                times, values = channels[channel]
+                steps = wrapDegrees(numpy.diff(values))
+                channels[channel] = (times, values[0] + numpy.concatenate(([0.0], numpy.cumsum(steps))))
+            continue
+        times = channels["rotateX"][0]
+        if any(len(channels[channel][0]) != len(times) for channel in ROTATE_CHANNELS):
+            continue
+        rotateOrder = getRotateOrder(rotateOrders.get(joint, "xyz"))
+        groups.setdefault((rotateOrder, len(times), times.tobytes()), []).append(joint)
+
+    for (rotateOrder, keyCount, timesBytes), joints in groups.items():
+        rotations = numpy.stack([numpy.stack([jointChannels[joint][channel][1] for channel in ROTATE_CHANNELS],
+                                             axis=-1) for joint in joints])
+        filtered = filterEulerRotations(rotations, rotations[:, 0, :], rotateOrder)
+        for jointIndex, joint in enumerate(joints):
+            for axis, channel in enumerate(ROTATE_CHANNELS):
+                jointChannels[joint][channel] = (jointChannels[joint][channel][0], filtered[jointIndex, :, axis])
+    return jointChannels
+
+def resampleTakeCurves(take, targetFps):
+    """
+    Given an AnimTake from readAnimCurves and a frame rate, resamples every
+    joint's curves to one key per targetFps frame, filters the rotations and
+    switches the take to the new time unit (key times are converted to the
+    new frames). Changes the take in place and returns (keys before, keys
+    after).
+    """
+    keysBefore = take.getKeyCount()
+    jointChannels = {}
+    rotateOrders = {}
+    for joint, curves in take.getCurvesByJoint().items():
+        if joint is None:
+            continue
+        channels = dict((channel, (curve.times, curve.values)) for channel, curve in curves.items())
+        restRotation = take.joints[joint].rotate if joint in take.joints else (0.0, 0.0, 0.0)
+        rotateOrders[joint] = take.joints[joint].rotateOrder if joint in take.joints else 0
+        jointChannels[joint] = resampleJointChannels(channels, take.fps, targetFps, restRotation,
+                                                     rotateOrders[joint])
+    filterTakeRotations(jointChannels, rotateOrders)
+    for curve in take.curves:
+        if curve.joint is None or curve.channel is None:
+            # curves we can't place on a joint are resampled on their own
+            curve.times, curve.values = resampleJointChannels(
+                {None: (curve.times, curve.values)}, take.fps, targetFps)[None]
+        else:
+            curve.times, curve.values = jointChannels[curve.joint][curve.channel]
+    take.fps = float(targetFps)
+    take.timeUnit = getTimeUnit(targetFps)
+    return keysBefore, take.getKeyCount()
@@ -0,0 +1,477 @@
+'''
+Usage - keeps local copies of rig and take files that live on a network share
+
+import sourceCache
+sourceCache.enableCache()            # or batchApplyAnim.py ... --cache-sources
+localPath = sourceCache.getLocalPath("//nas/rigs/character.mb")
+
+python sourceCache.py --stats
+python sourceCache.py //nas/rigs/character.mb ../week3/animations/*.ma   (warm the cache)
+python sourceCache.py --evict --max-mb 2048
+
+Files are stored by content (SHA-1) under the cache folder, so a rig that
+is referenced thousands of times only crosses the network when it changes,
+and identical files under different paths are stored once. Each source path
+remembers the size, modification time and hash it had when it was copied;
+an entry is reused while the size and time still match (or, with
+validate="hash", while the content hash still matches). The cache is capped
+at maxBytes, and the least recently used files are evicted first.
+
+Several worker processes can share one cache: each source is copied by one
+process at a time under a lock file, while the others wait and then reuse
+the copy. Copies are written to a temporary file and renamed into place,
+so a crash never leaves a half-written entry. Hit and miss counts are kept
+per process and in stats.json for every process together; each process adds
+its counts to stats.json every STATS_FLUSH_LOOKUPS lookups and when it is
+done, rather than on every lookup.
+
+Maya writes the local path into the file statements of any scene that
+references a cached file, so restoreSourcePaths swaps the original paths
+back into saved .ma files.
+'''
+
+import argparse
+import atexit
+import errno
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+import fileHashing
+
+#############
+# CONSTANTS #
+#############
+
+DEFAULT_CACHE_FOLDER = os.environ.get(
+    "SOURCE_CACHE", os.path.join(os.path.expanduser("~"), ".applyAnimCache", "sources"))
+
+DEFAULT_MAX_BYTES = int(float(os.environ.get("SOURCE_CACHE_MAX_MB", 20 * 1024)) * 1024 ** 2)
+
+# how entries are checked against their source: "stamp" (size and
+# modification time) or "hash" (content hash, reads the source every time)
+VALIDATE_MODES = ("stamp", "hash")
+
+# how much of a file is copied at a time
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# how long to wait for another process's lock before giving up, and how old
+# an untouched lock has to be before it counts as left behind by a crash
+LOCK_TIMEOUT = 600.0
+LOCK_STALE_SECONDS = 120.0
+
+STAT_KEYS = ("hits", "misses", "bytesCopied", "bytesServed")
+
+# how many lookups a process counts before adding them to stats.json, which
+# every process shares under one lock
+STATS_FLUSH_LOOKUPS = 100
+
+##################
+# HELPER METHODS #
+##################
+
+def getPathKey(filePath):
+    """
+    Given a file path, returns a SHA-1 of its absolute, normalized form.
+    """
+    path = os.path.normcase(os.path.abspath(filePath)).replace("\\", "/")
+    return hashlib.sha1(path.encode("utf-8")).hexdigest()
+
+def readJson(filePath):
+    """
+    Given a path, returns the JSON in it, or None if it is missing or broken.
+    """
+    try:
+        with open(filePath, "r") as input:
+            return json.load(input)
+    except (IOError, OSError, ValueError):
+        return None
+
+def copyAndHash(sourcePath, destinationPath, lock=None):
+    """
+    Given a source and a destination path, copies the file in chunks and
+    returns the SHA-1 of its contents, so the source is only read once.
+    The lock, if given, is kept fresh while the copy runs.
+    """
+    digest = hashlib.sha1()
+    with open(sourcePath, "rb") as input:
+        with open(destinationPath, "wb") as output:
+            chunk = input.read(COPY_CHUNK_SIZE)
+            while chunk:
+                digest.update(chunk)
+                output.write(chunk)
+                if lock:
+                    lock.refresh()
+                chunk = input.read(COPY_CHUNK_SIZE)
+    return digest.hexdigest()
+
+###########
+# CLASSES #
+###########
+
+class FileLock(object):
+    """
+    A lock shared between processes, held by creating the lock file
+    exclusively. Locks left behind by a crashed process are broken once they
+    haven't been touched for staleSeconds.
+    """
+
+    def __init__(self, lockPath, timeout=LOCK_TIMEOUT, staleSeconds=LOCK_STALE_SECONDS):
+        self.lockPath = lockPath
+        self.timeout = timeout
+        self.staleSeconds = staleSeconds
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, errorType, error, tb):
+        self.release()
+        return False
+
+    def acquire(self):
+        startTime = time.time()
+        while True:
+            try:
+                handle = os.open(self.lockPath, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(handle, str(os.getpid()).encode("utf-8"))
+                os.close(handle)
+                return
+            except OSError as error:
+                if error.errno != errno.EEXIST:
+                    raise
+            try:
+                if time.time() - os.path.getmtime(self.lockPath) > self.staleSeconds:
+                    os.remove(self.lockPath)
+                    continue
+            except OSError:
+                # released (or broken) while we looked at it
+                continue
+            if time.time() - startTime > self.timeout:
+                raise RuntimeError("Timed out waiting for lock {0}".format(self.lockPath))
+            time.sleep(0.05)
+
+    def refresh(self):
+        try:
+            os.utime(self.lockPath, None)
+        except OSError:
+            pass
+
+    def release(self):
+        try:
+            os.remove(self.lockPath)
+        except OSError:
+            pass
+
+class SourceCache(object):
+    """
+    A content-addressed cache of source files in cacheFolder (see the module
+    docstring). getLocalPath is the only call most code needs.
+    """
+
+    def __init__(self, cacheFolder=None, maxBytes=DEFAULT_MAX_BYTES, validate="stamp"):
+        if validate not in VALIDATE_MODES:
+            raise ValueError("validate must be one of {0}".format(", ".join(VALIDATE_MODES)))
+        self.cacheFolder = os.path.abspath(cacheFolder or DEFAULT_CACHE_FOLDER)
+        self.maxBytes = maxBytes
+        self.validate = validate
+        for folderName in ("objects", "sources", "locks", "tmp"):
+            folder = os.path.join(self.cacheFolder, folderName)
+            if not os.path.exists(folder):
+                try:
+                    os.makedirs(folder)
+                except OSError:
+                    # another process made it first
+                    pass
+        # local path -> source path, for restoreSourcePaths
+        self.sourcePaths = {}
+        self.stats = dict((key, 0) for key in STAT_KEYS)
+        # counts not yet added to stats.json
+        self.pendingStats = dict((key, 0) for key in STAT_KEYS)
+
+    def getObjectPath(self, contentHash, extension):
+        return os.path.join(self.cacheFolder, "objects", contentHash[:2], contentHash + extension.lower())
+
+    def getEntryPath(self, pathKey):
+        return os.path.join(self.cacheFolder, "sources", pathKey + ".json")
+
+    def getObjectLock(self, contentHash):
+        return self.getLock("object_" + contentHash)
+
+    def getLock(self, name):
+        return FileLock(os.path.join(self.cacheFolder, "locks", name + ".lock"))
+
+    def isInCache(self, filePath):
+        return os.path.abspath(filePath).startswith(os.path.join(self.cacheFolder, ""))
+
+    def getValidObjectPath(self, sourcePath, entry, stat):
+        """
+        Given a source path, its cache entry (or None) and its os.stat,
+        returns the cached copy's path if the entry is still valid, else None.
+        """
+        if entry is None:
+            return None
+        objectPath = self.getObjectPath(entry["hash"], os.path.splitext(sourcePath)[1])
+        if not os.path.exists(objectPath):
+            return None
+        if self.validate == "hash":
+            return objectPath if fileHashing.getFileHash(sourcePath) == entry["hash"] else None
+        return objectPath if [entry["size"], entry["mtime"]] == [stat.st_size, stat.st_mtime] else None
+
+    def getLocalPath(self, sourcePath):
+        """
+        Given the path of a source file, returns the path of an up to date
+        local copy, copying the file into the cache first if needed. Paths
+        that are already inside the cache are returned as they are.
+        """
+        if self.isInCache(sourcePath):
+            return sourcePath
+        stat = os.stat(sourcePath)
+        pathKey = getPathKey(sourcePath)
+        entryPath = self.getEntryPath(pathKey)
+        objectPath = self.getValidObjectPath(sourcePath, readJson(entryPath), stat)
+        hit = objectPath is not None
+        if not hit:
+            with self.getLock(pathKey) as lock:
+                # another process may have copied it while we waited
+                objectPath = self.getValidObjectPath(sourcePath, readJson(entryPath), stat)
+                hit = objectPath is not None
+                if not hit:
+                    objectPath = self.copyIntoCache(sourcePath, stat, entryPath, lock)
+
+        try:
+            # the modification time of a copy is its last use, for eviction
+            os.utime(objectPath, None)
+        except OSError:
+            pass
+        self.sourcePaths[os.path.abspath(objectPath)] = sourcePath
+        self.recordStats(hits=int(hit), misses=int(not hit), bytesServed=stat.st_size,
+                         bytesCopied=0 if hit else stat.st_size)
+        if not hit:
+            self.evict(keep=objectPath)
+        return objectPath
+
+    def copyIntoCache(self, sourcePath, stat, entryPath, lock):
+        """
+        Copies a source into the cache under its content hash, records its
+        entry and returns the copy's path. Must be called holding the
+        source's lock; the copy is moved into place under its content hash's
+        lock, since sources at other paths can have the same contents.
+        """
+        tempPath = os.path.join(self.cacheFolder, "tmp", uuid.uuid4().hex)
+        try:
+            contentHash = copyAndHash(sourcePath, tempPath, lock)
+            objectPath = self.getObjectPath(contentHash, os.path.splitext(sourcePath)[1])
+            with self.getObjectLock(contentHash):
+                if os.path.exists(objectPath):
+                    # same contents as a file we already have
+                    os.remove(tempPath)
+                else:
+                    if not os.path.exists(os.path.dirname(objectPath)):
+                        try:
+                            os.makedirs(os.path.dirname(objectPath))
+                        except OSError:
+                            pass
+                    os.rename(tempPath, objectPath)
+        except Exception:
+            if os.path.exists(tempPath):
+                os.remove(tempPath)
+            raise
+        fileHashing.writeJsonFile(entryPath, {"sourcePath": sourcePath, "size": stat.st_size, "mtime": stat.st_mtime,
+                              "hash": contentHash})
+        return objectPath
+
+    def getObjects(self):
+        """
+        Returns a list of (last use, size, path) for every cached copy.
+        """
+        objects = []
+        objectsFolder = os.path.join(self.cacheFolder, "objects")
+        for folderName in os.listdir(objectsFolder):
+            folder = os.path.join(objectsFolder, folderName)
+            for fileName in os.listdir(folder):
+                filePath = os.path.join(folder, fileName)
+                try:
+                    stat = os.stat(filePath)
+                except OSError:
+                    continue
+                objects.append((stat.st_mtime, stat.st_size, filePath))
+        return objects
+
+    def evict(self, keep=None, maxBytes=None):
+        """
+        Deletes the least recently used copies until the cache is at most
+        maxBytes (by default the cache's cap). The copy at keep is never
+        deleted. Returns the number of bytes freed.
+        """
+        maxBytes = self.maxBytes if maxBytes is None else maxBytes
+        freedBytes = 0
+        with self.getLock("cache"):
+            objects = sorted(self.getObjects())
+            totalBytes = sum(size for lastUse, size, filePath in objects)
+            for lastUse, size, filePath in objects:
+                if totalBytes <= maxBytes:
+                    break
+                if keep and os.path.abspath(filePath) == os.path.abspath(keep):
+                    continue
+                try:
+                    os.remove(filePath)
+                except OSError:
+                    # still open in another process on Windows, try next time
+                    continue
+                totalBytes -= size
+                freedBytes += size
+        return freedBytes
+
+    def recordStats(self, **counts):
+        """
+        Adds the given counts to this process's stats, and adds them to
+        stats.json once STATS_FLUSH_LOOKUPS lookups have been counted.
+        """
+        for key, count in counts.items():
+            self.stats[key] += count
+            self.pendingStats[key] += count
+        if self.pendingStats["hits"] + self.pendingStats["misses"] >= STATS_FLUSH_LOOKUPS:
+            self.flushStats()
+
+    def flushStats(self):
+        """
+        Adds the counts this process hasn't written yet to stats.json.
+        """
+        if not any(self.pendingStats.values()):
+            return
+        statsPath = os.path.join(self.cacheFolder, "stats.json")
+        with self.getLock("cache"):
+            totals = readJson(statsPath) or {}
+            for key, count in self.pendingStats.items():
+                totals[key] = totals.get(key, 0) + count
+            fileHashing.writeJsonFile(statsPath, totals)
+        self.pendingStats = dict((key, 0) for key in STAT_KEYS)
+
+    def getTotalStats(self):
+        """
+        Returns the stats of every process that used the cache so far.
+        """
+        self.flushStats()
+        totals = readJson(os.path.join(self.cacheFolder, "stats.json")) or {}
+        return dict((key, totals.get(key, 0)) for key in STAT_KEYS)
+
+    def restoreSourcePaths(self, mayaAsciiPath):
+        """
+        Given a Maya ASCII file saved while cached files were referenced,
+        puts the original paths back into its file statements. Only the lines
+        before the first createNode are rewritten; the rest is copied as is.
+        Returns the number of paths replaced.
+        """
+        replacements = [(localPath.replace("\\", "/"), sourcePath.replace("\\", "/"))
+                        for localPath, sourcePath in self.sourcePaths.items()]
+        if not replacements or not mayaAsciiPath.lower().endswith(".ma"):
+            return 0
+        replacedCount = 0
+        tempPath = "{0}.{1}.tmp".format(mayaAsciiPath, uuid.uuid4().hex)
+        with open(mayaAsciiPath, "rb") as input:
+            with open(tempPath, "wb") as output:
+                for line in input:
+                    if line.startswith(b"createNode "):
+                        output.write(line)
+                        break
+                    text = line.decode("utf-8")
+                    for localPath, sourcePath in replacements:
+                        if localPath in text:
+                            text = text.replace(localPath, sourcePath)
+                            replacedCount += 1
+                    output.write(text.encode("utf-8"))
+                shutil.copyfileobj(input, output, COPY_CHUNK_SIZE)
+        if replacedCount:
+            fileHashing.replaceFile(tempPath, mayaAsciiPath)
+        else:
+            os.remove(tempPath)
+        return replacedCount
+
+def getHitRate(stats):
+    """
+    Given a stats dict, returns the fraction of lookups that were hits.
+    """
+    lookups = stats["hits"] + stats["misses"]
+    return float(stats["hits"]) / lookups if lookups else 0.0
+
+def getStatsSummary(stats):
+    return "Source cache: {0} hits, {1} misses ({2:.0%} hit rate), {3:.1f} MB copied".format(
+        stats["hits"], stats["misses"], getHitRate(stats), stats["bytesCopied"] / (1024.0 ** 2))
+
+################
+# ACTIVE CACHE #
+################
+
+# the cache getLocalPath goes through, or None while caching is off
+activeCache = None
+
+def enableCache(cacheFolder=None, maxBytes=DEFAULT_MAX_BYTES, validate="stamp"):
+    """
+    Turns caching on for this process and returns the cache.
+    """
+    global activeCache
+    activeCache = SourceCache(cacheFolder, maxBytes, validate)
+    atexit.register(activeCache.flushStats)
+    return activeCache
+
+def disableCache():
+    global activeCache
+    if activeCache:
+        activeCache.flushStats()
+    activeCache = None
+
+def flushStats():
+    """
+    Adds the active cache's unwritten counts to stats.json. Worker processes
+    call this when they finish, since multiprocessing children skip atexit.
+    """
+    if activeCache:
+        activeCache.flushStats()
+
+def getLocalPath(filePath):
+    """
+    Given the path of a source file, returns a cached local copy while
+    caching is on, and the path itself otherwise.
+    """
+    return activeCache.getLocalPath(filePath) if activeCache else filePath
+
+def restoreSourcePaths(mayaAsciiPath):
+    """
+    Given a saved Maya ASCII file, swaps the original paths of any cached
+    files it references back in (see SourceCache.restoreSourcePaths).
+    """
+    return activeCache.restoreSourcePaths(mayaAsciiPath) if activeCache else 0
+
+##########
+# SCRIPT #
+##########
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local cache of rig and take files.")
+    parser.add_argument("filePaths", nargs="*", help="files to copy into the cache ahead of a batch")
+    parser.add_argument("--cache", default=None, help="cache folder (default: {0})".format(DEFAULT_CACHE_FOLDER))
+    parser.add_argument("--max-mb", type=float, default=DEFAULT_MAX_BYTES / (1024.0 ** 2))
+    parser.add_argument("--validate", choices=VALIDATE_MODES, default="stamp")
+    parser.add_argument("--evict", action="store_true", help="evict least recently used files down to --max-mb")
+    parser.add_argument("--stats", action="store_true", help="print hit and miss counts of every process")
+    args = parser.parse_args()
+
+    cache = SourceCache(args.cache, int(args.max_mb * 1024 ** 2), args.validate)
+    for filePath in args.filePaths:
+        print("{0} -> {1}".format(filePath, cache.getLocalPath(filePath)))
+    if args.filePaths:
+        cache.flushStats()
+        print(getStatsSummary(cache.stats))
+    if args.evict:
+        print("Evicted {0:.1f} MB".format(cache.evict() / (1024.0 ** 2)))
+    if args.stats:
+        objects = cache.getObjects()
+        print("{0} ({1} files, {2:.1f} MB)".format(getStatsSummary(cache.getTotalStats()), len(objects),
+                                                  sum(size for lastUse, size, filePath in objects) / (1024.0 ** 2)))
+
+if __name__ == "__main__":
+    main()
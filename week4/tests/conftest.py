@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+WEEK4_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the pipeline modules are flat scripts in week4, imported by name
+sys.path.insert(0, WEEK4_FOLDER)
+
+@pytest.fixture
+def animFolder():
+    """
+    The bundled takes (9 takes at 120fps).
+    """
+    return os.path.join(WEEK4_FOLDER, "..", "week3", "animations")
+
+@pytest.fixture
+def finishedFolder():
+    """
+    The bundled known-good bakes (10 rig_with_*.ma files at 24fps).
+    """
+    return os.path.join(WEEK4_FOLDER, "..", "week3", "finished-files")
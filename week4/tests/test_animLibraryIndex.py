@@ -0,0 +1,77 @@
+import os
+import shutil
+
+import pytest
+
+import animLibraryIndex
+
+@pytest.fixture
+def takeFolder(animFolder, tmp_path):
+    """
+    A copy of the bundled takes, so the index is never written next to them.
+    """
+    takeFolder = os.path.join(str(tmp_path), "animations")
+    shutil.copytree(animFolder, takeFolder)
+    return takeFolder
+
+def getNames(animPaths):
+    return sorted(os.path.basename(animPath) for animPath in animPaths)
+
+def test_incrementalUpdates(takeFolder):
+    indexPath = animLibraryIndex.getIndexPath(takeFolder)
+    summary = animLibraryIndex.updateFolderIndex(takeFolder, processes=2)
+    assert len(summary["indexed"]) == 9
+    assert summary["failed"] == []
+    assert os.path.exists(indexPath)
+
+    # the index file itself is not a take
+    summary = animLibraryIndex.updateFolderIndex(takeFolder, processes=1)
+    assert (len(summary["unchanged"]), summary["indexed"]) == (9, [])
+
+    touchedPath = os.path.join(takeFolder, "AAA_0010_tk01.ma")
+    os.utime(touchedPath, (0, 0))
+    editedPath = os.path.join(takeFolder, "AAA_0020_tk01.ma")
+    with open(editedPath, "a") as output:
+        output.write("// edited\n")
+    os.remove(os.path.join(takeFolder, "AAA_0030_tk01.ma"))
+    summary = animLibraryIndex.updateFolderIndex(takeFolder, processes=1)
+    assert getNames(summary["touched"]) == ["AAA_0010_tk01.ma"]
+    assert getNames(summary["indexed"]) == ["AAA_0020_tk01.ma"]
+    assert getNames(summary["removed"]) == ["AAA_0030_tk01.ma"]
+    assert len(summary["unchanged"]) == 6
+    assert len(animLibraryIndex.getAllTakes(indexPath)) == 8
+
+def test_takeInfo(takeFolder):
+    animPath = os.path.join(takeFolder, "AAA_0010_tk01.ma")
+    otherPath = os.path.join(takeFolder, "AAA_0020_tk01.ma")
+    indexPath = os.path.join(takeFolder, "library.sqlite")
+    animLibraryIndex.updateIndex([animPath], indexPath)
+
+    takeInfos = animLibraryIndex.getTakeInfos(indexPath, [animPath, otherPath])
+    assert takeInfos[otherPath] is None
+    takeInfo = takeInfos[animPath]
+    assert (takeInfo["name"], takeInfo["fps"], takeInfo["timeUnit"]) == ("AAA_0010_tk01", 120, "120fps")
+    assert (takeInfo["firstKey"], takeInfo["lastKey"]) == (0, 535)
+    assert (takeInfo["curveCount"], takeInfo["keyCount"], takeInfo["jointCount"]) == (72, 72 * 536, 23)
+    assert "Hips" in takeInfo["joints"]
+    assert animLibraryIndex.getSceneFrameRange(takeInfo, 24.0) == (0, 107)
+
+    # a take that changed since it was indexed is loaded instead
+    with open(animPath, "a") as output:
+        output.write("// edited\n")
+    assert animLibraryIndex.getTakeInfos(indexPath, [animPath])[animPath] is None
+
+def test_brokenTakeIsReported(takeFolder):
+    brokenPath = os.path.join(takeFolder, "AAA_0110_tk01.ma")
+    with open(brokenPath, "w") as output:
+        output.write('createNode animCurveTA -n "Hips_rotateX";\n\tsetAttr -s 2 ".ktv[0:1]" 0 1 1 broken;\n')
+    summary = animLibraryIndex.updateFolderIndex(takeFolder, processes=1)
+    assert len(summary["indexed"]) == 9
+    assert [(os.path.basename(animPath), error.split(":")[0]) for animPath, error in summary["failed"]] == \
+        [("AAA_0110_tk01.ma", "ValueError")]
+
+def test_indexFromAnotherVersionIsRebuilt(takeFolder, monkeypatch):
+    animLibraryIndex.updateFolderIndex(takeFolder, processes=1)
+    monkeypatch.setattr(animLibraryIndex, "INDEX_VERSION", animLibraryIndex.INDEX_VERSION + 1)
+    summary = animLibraryIndex.updateFolderIndex(takeFolder, processes=1)
+    assert len(summary["indexed"]) == 9
@@ -0,0 +1,141 @@
+import os
+import shutil
+
+import pytest
+
+import diffBakes
+import fakeMaya
+
+@pytest.fixture(scope="module")
+def pipeline():
+    """
+    applyAnimWithBatching running on fakeMaya, with the bundled takes'
+    skeleton standing in for the binary rigs.
+    """
+    skeletonPath = os.path.join(os.path.dirname(__file__), "..", "..", "week3", "animations", "AAA_0010_tk01.ma")
+    fakeMaya.install(skeletonPath)
+    import applyAnimWithBatching
+    return applyAnimWithBatching
+
+@pytest.fixture
+def rigFolder(tmp_path):
+    rigFolder = os.path.join(str(tmp_path), "rigs")
+    os.makedirs(rigFolder)
+    characterPath = os.path.join(os.path.dirname(fakeMaya.__file__), "character.mb")
+    for rigName in ("hero", "villain"):
+        shutil.copyfile(characterPath, os.path.join(rigFolder, rigName + ".mb"))
+    return rigFolder
+
+def getPlaybackRange(filePath):
+    with open(filePath, "r") as input:
+        return [line for line in input if "playbackOptions -min" in line]
+
+def test_matrixOutputsMatchSingleRigOutputs(pipeline, animFolder, rigFolder, tmp_path):
+    singleFolder = os.path.join(str(tmp_path), "single")
+    matrixFolder = os.path.join(str(tmp_path), "matrix")
+    heroPath = os.path.join(rigFolder, "hero.mb")
+    villainPath = os.path.join(rigFolder, "villain.mb")
+    pipeline.applyAnimationForAllFilesInFolder(animFolder + os.sep, singleFolder + os.sep, heroPath)
+    pipeline.applyAnimationForAllFilesInFolder(animFolder + os.sep, matrixFolder + os.sep, [heroPath, villainPath])
+
+    singleFiles = sorted(fileName for fileName in os.listdir(singleFolder) if fileName.endswith(".ma"))
+    assert len(singleFiles) == 9
+    for fileName in singleFiles:
+        singlePath = os.path.join(singleFolder, fileName)
+        for rigName in ("hero", "villain"):
+            matrixPath = os.path.join(matrixFolder, fileName.replace("rig_with_", "rig_{0}_with_".format(rigName)))
+            assert diffBakes.diffFiles((singlePath, matrixPath, None, False))["status"] == "match"
+            assert getPlaybackRange(matrixPath) == getPlaybackRange(singlePath) != []
+
+def test_matrixRejectsRigsWithTheSameName(pipeline, animFolder, rigFolder, tmp_path):
+    otherFolder = os.path.join(str(tmp_path), "other")
+    os.makedirs(otherFolder)
+    shutil.copyfile(os.path.join(rigFolder, "hero.mb"), os.path.join(otherFolder, "hero.mb"))
+    with pytest.raises(RuntimeError, match="need different file names: hero"):
+        pipeline.applyAnimationForAllFilesInFolder(animFolder + os.sep, str(tmp_path) + os.sep,
+                                                   [os.path.join(rigFolder, "hero.mb"),
+                                                    os.path.join(otherFolder, "hero.mb")])
+
+def test_warmRigOutputsMatchColdRun(pipeline, animFolder, rigFolder, tmp_path):
+    coldFolder = os.path.join(str(tmp_path), "cold")
+    warmFolder = os.path.join(str(tmp_path), "warm")
+    heroPath = os.path.join(rigFolder, "hero.mb")
+    pipeline.applyAnimationForAllFilesInFolder(animFolder + os.sep, coldFolder + os.sep, heroPath)
+    pipeline.applyAnimationForAllFilesInFolder(animFolder + os.sep, warmFolder + os.sep, heroPath, warmRig=True)
+
+    results = diffBakes.diffFolders(coldFolder, warmFolder, processes=1)
+    assert [result["status"] for result in results] == ["match"] * 9
+    for result in results:
+        coldPath, warmPath = result["reference"], result["candidate"]
+        assert getPlaybackRange(warmPath) == getPlaybackRange(coldPath)
+
+def test_warmRigSavedSecondsNeverNegative(pipeline, animFolder, rigFolder, tmp_path):
+    session = pipeline.WarmRigSession(os.path.join(rigFolder, "hero.mb"))
+    session.loadSeconds = 0.0
+    for fileName in ("AAA_0010_tk01.ma", "AAA_0020_tk01.ma"):
+        session.applyAnimation(os.path.join(animFolder, fileName), str(tmp_path))
+    assert [report["savedSeconds"] for report in session.takeReports] == [0.0, 0.0]
+    assert session.getSavedSeconds() == 0.0
+
+def test_warmRigReloadsTwiceAndMatchesColdRun(pipeline, animFolder, rigFolder, tmp_path):
+    heroPath = os.path.join(rigFolder, "hero.mb")
+    fileNames = ("AAA_0010_tk01.ma", "AAA_0020_tk01.ma", "AAA_0030_tk01.ma")
+    coldFolder = os.path.join(str(tmp_path), "cold")
+    warmFolder = os.path.join(str(tmp_path), "warm")
+    os.makedirs(coldFolder)
+    os.makedirs(warmFolder)
+    for fileName in fileNames:
+        pipeline.applyAnimationForOneFile(os.path.join(animFolder, fileName), coldFolder, heroPath)
+
+    session = pipeline.WarmRigSession(heroPath)
+    for fileName in fileNames[:2]:
+        # an edit left on the rig reference forces a reload after the take
+        session.rigRefNode.edits.append("setAttr hero:Hips.translateX 1")
+        session.applyAnimation(os.path.join(animFolder, fileName), warmFolder)
+    session.applyAnimation(os.path.join(animFolder, fileNames[2]), warmFolder)
+    assert [report["reloaded"] for report in session.takeReports] == [True, True, False]
+
+    for fileName in fileNames:
+        outputName = "rig_with_" + fileName
+        result = diffBakes.diffFiles((os.path.join(coldFolder, outputName), os.path.join(warmFolder, outputName),
+                                      None, False))
+        assert result["status"] == "match"
+
+    # the rest pose is restored on the reloaded joints, not the ones it replaced
+    hips = [joint for joint in session.rigJoints if joint.stripNamespace() == "Hips"][0]
+    restValue = hips.restValues["translateX"]
+    hips.restValues["translateX"] = restValue + 10.0
+    assert session.reset() is False
+    assert hips.restValues["translateX"] == restValue
+
+def test_folderRunOnlyBakesTakes(pipeline, animFolder, rigFolder, tmp_path):
+    import animLibraryIndex
+
+    takeFolder = os.path.join(str(tmp_path), "takes")
+    destFolder = os.path.join(str(tmp_path), "out")
+    os.makedirs(takeFolder)
+    shutil.copyfile(os.path.join(animFolder, "AAA_0010_tk01.ma"), os.path.join(takeFolder, "AAA_0010_tk01.ma"))
+    with open(os.path.join(takeFolder, "AAA_0010_tk01.ma.maindex"), "w") as output:
+        output.write("{}")
+    indexPath = animLibraryIndex.getIndexPath(takeFolder)
+    for run in range(2):
+        # the second run finds the index the first one left in the take folder
+        pipeline.applyAnimationForAllFilesInFolder(takeFolder + os.sep, destFolder + os.sep,
+                                                   os.path.join(rigFolder, "hero.mb"), indexPath=indexPath)
+    assert os.path.exists(indexPath)
+    assert sorted(fileName for fileName in os.listdir(destFolder) if fileName.endswith(".ma")) == [
+        "rig_with_AAA_0010_tk01.ma"]
+
+def test_failedTakeStopsTracing(pipeline, rigFolder, tmp_path):
+    import pipelineTracing
+
+    takeFolder = os.path.join(str(tmp_path), "takes")
+    os.makedirs(takeFolder)
+    with open(os.path.join(takeFolder, "broken.ma"), "w") as output:
+        output.write("//Maya ASCII 2020 scene\n")
+    tracePath = os.path.join(str(tmp_path), "trace.json")
+    with pytest.raises(Exception):
+        pipeline.applyAnimationForAllFilesInFolder(takeFolder + os.sep, os.path.join(str(tmp_path), "out") + os.sep,
+                                                   os.path.join(rigFolder, "hero.mb"), tracePath=tracePath)
+    assert not pipelineTracing.isTracing()
+    assert os.path.exists(tracePath)
@@ -0,0 +1,61 @@
+import os
+import time
+
+import batchApplyAnim
+import batchManifest
+
+def runLocalBatch(animFolder, destFolder, **batchOptions):
+    animationFiles = batchApplyAnim.getAnimationFiles(animFolder)
+    summary = batchApplyAnim.runBatch(animationFiles, str(destFolder), None, backend="local", **batchOptions)
+    results = dict((os.path.basename(result["animPath"]), result) for result in summary["results"])
+    return summary, results
+
+def test_everyTakeSucceeds(animFolder, tmp_path):
+    summary, results = runLocalBatch(animFolder, tmp_path, processes=2)
+    assert summary["succeeded"] == 9 and summary["failed"] == 0
+    for result in results.values():
+        assert os.path.exists(result["outputPath"])
+    assert len(batchManifest.loadManifest(str(tmp_path))["entries"]) == 9
+
+def test_failingTakeIsRetriedThenRecorded(animFolder, tmp_path):
+    summary, results = runLocalBatch(animFolder, tmp_path, processes=2, retries=2,
+                                     backendOptions={"failFiles": ["AAA_0010_tk01.ma"]})
+    assert summary["succeeded"] == 8 and summary["failed"] == 1
+    assert results["AAA_0010_tk01.ma"]["attempt"] == 3
+    assert "Simulated failure" in results["AAA_0010_tk01.ma"]["error"]
+
+def test_flakyTakeSucceedsOnRetry(animFolder, tmp_path):
+    summary, results = runLocalBatch(animFolder, tmp_path, processes=2,
+                                     backendOptions={"flakyFiles": ["AAA_0020_tk01.ma"]})
+    assert summary["succeeded"] == 9
+    assert results["AAA_0020_tk01.ma"]["attempt"] == 2
+
+def test_crashedWorkerIsReplaced(animFolder, tmp_path):
+    summary, results = runLocalBatch(animFolder, tmp_path, processes=2, retries=1,
+                                     backendOptions={"crashFiles": ["AAA_0030_tk01.ma"]})
+    assert summary["succeeded"] == 8 and summary["failed"] == 1
+    assert results["AAA_0030_tk01.ma"]["error"].startswith("Worker crashed")
+    assert results["AAA_0030_tk01.ma"]["attempt"] == 2
+
+def test_hungTakeTimesOutAndIsRetried(animFolder, tmp_path):
+    startTime = time.time()
+    summary, results = runLocalBatch(animFolder, tmp_path, processes=2, retries=1, taskTimeout=1,
+                                     backendOptions={"hangFiles": ["AAA_0040_tk01.ma"]})
+    assert time.time() - startTime < 30
+    assert summary["succeeded"] == 8 and summary["failed"] == 1
+    assert results["AAA_0040_tk01.ma"]["error"] == "Timed out after 1 seconds"
+    assert results["AAA_0040_tk01.ma"]["attempt"] == 2
+
+def test_queuedTakesDontCountTowardTimeout(animFolder, tmp_path):
+    # nine takes of 0.4s each on one worker take far longer than the timeout
+    summary, results = runLocalBatch(animFolder, tmp_path, processes=1, taskTimeout=2,
+                                     backendOptions={"delay": 0.4})
+    assert summary["succeeded"] == 9 and summary["failed"] == 0
+    assert len(batchManifest.loadManifest(str(tmp_path))["entries"]) == 9
+
+def test_incrementalSkipsFinishedTakes(animFolder, tmp_path):
+    runLocalBatch(animFolder, tmp_path, processes=2, backendOptions={"failFiles": ["AAA_0050_tk01.ma"]},
+                  retries=0)
+    summary, results = runLocalBatch(animFolder, tmp_path, processes=2, incremental=True)
+    assert summary["skipped"] == 8 and summary["succeeded"] == 1
+    assert results["AAA_0050_tk01.ma"]["status"] == "ok"
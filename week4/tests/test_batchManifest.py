@@ -0,0 +1,112 @@
+import os
+import shutil
+
+import pytest
+
+import batchManifest
+
+@pytest.fixture
+def batch(animFolder, finishedFolder, tmp_path):
+    """
+    Two of the bundled takes and a rig copied to a temporary folder, and an
+    empty destination folder.
+    """
+    sourceFolder = os.path.join(str(tmp_path), "source")
+    destFolder = os.path.join(str(tmp_path), "dest")
+    os.makedirs(sourceFolder)
+    os.makedirs(destFolder)
+    animPaths = []
+    for fileName in ("AAA_0010_tk01.ma", "AAA_0020_tk01.ma"):
+        shutil.copy(os.path.join(animFolder, fileName), sourceFolder)
+        animPaths.append(os.path.join(sourceFolder, fileName))
+    rigPath = os.path.join(sourceFolder, "hero.ma")
+    shutil.copy(os.path.join(finishedFolder, "rig_with_AAA_0010_tk01.ma"), rigPath)
+    return animPaths, rigPath, destFolder
+
+def getJobs(animPaths, rigPath, destFolder):
+    return [batchManifest.createJob(batchManifest.getOutputPath(animPath, destFolder),
+                                    {"anim": animPath, "rig": rigPath})
+            for animPath in animPaths]
+
+def buildAll(manifest, jobs, settings):
+    plan = batchManifest.planIncrementalBatch(manifest, jobs, settings)
+    for job in plan["build"]:
+        with open(job["outputPath"], "w") as output:
+            output.write("baked {0}\n".format(job["inputs"]["anim"]))
+        batchManifest.recordOutput(manifest, job, settings)
+    return plan
+
+def getOutputNames(jobs):
+    return [os.path.basename(job["outputPath"]) for job in jobs]
+
+def test_outputNames():
+    assert batchManifest.getTakeName("/anim/AAA_0010_tk01.ma") == "AAA_0010_tk01"
+    assert batchManifest.getTakeName("/dest/rig_with_AAA_0010_tk01.animcurves") == "AAA_0010_tk01"
+    assert batchManifest.getOutputPath("/anim/AAA_0010_tk01.ma", "/dest/") == "/dest/rig_with_AAA_0010_tk01.ma"
+    assert batchManifest.getMatrixOutputPath("/anim/AAA_0010_tk01.ma", "/rigs/hero.mb", "/dest") == \
+        "/dest/rig_hero_with_AAA_0010_tk01.ma"
+    assert batchManifest.getDuplicateRigNames(["/a/hero.ma", "/b/hero.mb", "/a/villain.ma"]) == ["hero"]
+
+def test_skipThenRebuild(batch):
+    animPaths, rigPath, destFolder = batch
+    settings = batchManifest.getBakeSettings({"step": 1, "warmRig": True, "fps": None})
+    assert settings == batchManifest.getBakeSettings({"step": 1})
+
+    manifest = batchManifest.loadManifest(destFolder)
+    plan = buildAll(manifest, getJobs(animPaths, rigPath, destFolder), settings)
+    assert getOutputNames(plan["build"]) == ["rig_with_AAA_0010_tk01.ma", "rig_with_AAA_0020_tk01.ma"]
+    batchManifest.saveManifest(destFolder, manifest)
+
+    # a second run with the same inputs and settings has nothing to do
+    manifest = batchManifest.loadManifest(destFolder)
+    plan = batchManifest.planIncrementalBatch(manifest, getJobs(animPaths, rigPath, destFolder), settings)
+    assert (plan["build"], plan["orphaned"]) == ([], [])
+    assert len(plan["skip"]) == 2
+
+    # a changed take only rebuilds its own output
+    with open(animPaths[1], "a") as output:
+        output.write("// edited\n")
+    plan = batchManifest.planIncrementalBatch(manifest, getJobs(animPaths, rigPath, destFolder), settings)
+    assert getOutputNames(plan["build"]) == ["rig_with_AAA_0020_tk01.ma"]
+
+    # so does an output that was deleted or changed by hand
+    os.remove(os.path.join(destFolder, "rig_with_AAA_0010_tk01.ma"))
+    plan = batchManifest.planIncrementalBatch(manifest, getJobs(animPaths, rigPath, destFolder), settings)
+    assert getOutputNames(plan["build"]) == ["rig_with_AAA_0010_tk01.ma", "rig_with_AAA_0020_tk01.ma"]
+
+def test_changedSettingsOrRigRebuildEverything(batch):
+    animPaths, rigPath, destFolder = batch
+    settings = batchManifest.getBakeSettings({"step": 1})
+    manifest = batchManifest.loadManifest(destFolder)
+    buildAll(manifest, getJobs(animPaths, rigPath, destFolder), settings)
+
+    plan = batchManifest.planIncrementalBatch(manifest, getJobs(animPaths, rigPath, destFolder),
+                                              batchManifest.getBakeSettings({"step": 2}))
+    assert len(plan["build"]) == 2
+
+    with open(rigPath, "a") as output:
+        output.write("// edited\n")
+    plan = batchManifest.planIncrementalBatch(manifest, getJobs(animPaths, rigPath, destFolder), settings)
+    assert len(plan["build"]) == 2
+
+def test_removedTakeIsOrphaned(batch):
+    animPaths, rigPath, destFolder = batch
+    settings = batchManifest.getBakeSettings({})
+    manifest = batchManifest.loadManifest(destFolder)
+    buildAll(manifest, getJobs(animPaths, rigPath, destFolder), settings)
+
+    os.remove(animPaths[0])
+    plan = batchManifest.planIncrementalBatch(manifest, getJobs(animPaths[1:], rigPath, destFolder), settings)
+    assert plan["orphaned"] == ["rig_with_AAA_0010_tk01.ma"]
+    assert len(plan["skip"]) == 1
+
+def test_manifestFromAnotherVersionIsIgnored(batch, monkeypatch):
+    animPaths, rigPath, destFolder = batch
+    settings = batchManifest.getBakeSettings({})
+    manifest = batchManifest.loadManifest(destFolder)
+    buildAll(manifest, getJobs(animPaths, rigPath, destFolder), settings)
+    batchManifest.saveManifest(destFolder, manifest)
+    assert batchManifest.loadManifest(destFolder)["entries"] == manifest["entries"]
+
+    monkeypatch.setattr(batchManifest, "TOOL_VERSION", batchManifest.TOOL_VERSION + 1)
+    assert batchManifest.loadManifest(destFolder)["entries"] == {}
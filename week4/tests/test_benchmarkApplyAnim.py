@@ -0,0 +1,28 @@
+import json
+import os
+import subprocess
+import sys
+
+import benchmarkApplyAnim
+
+def runBenchmarkScript(animFolder, *arguments):
+    # fakeMaya registers itself as pymel, so the benchmark gets its own process
+    week4Folder = os.path.dirname(os.path.abspath(benchmarkApplyAnim.__file__))
+    command = [sys.executable, os.path.join(week4Folder, "benchmarkApplyAnim.py"), animFolder,
+               os.path.join(week4Folder, "character.mb"), "--backend", "fake", "--no-memory"] + list(arguments)
+    return subprocess.call(command)
+
+def test_fakeBackendBenchmarksEveryTake(animFolder, tmp_path):
+    resultsPath = os.path.join(str(tmp_path), "before.json")
+    assert runBenchmarkScript(animFolder, "--output", resultsPath) == 0
+    with open(resultsPath, "r") as input:
+        results = json.load(input)
+    assert results["backend"] == "fake"
+    assert len(results["takes"]) == 9
+    for take in results["takes"]:
+        assert sorted(take["stages"]) == sorted(benchmarkApplyAnim.STAGES)
+        assert take["stages"]["save"]["bytesWritten"] > 0
+    assert all(results["totals"][stageName]["wallSeconds"] >= 0 for stageName in benchmarkApplyAnim.STAGES)
+
+    # comparing against itself with a generous limit never regresses
+    assert runBenchmarkScript(animFolder, "--compare", resultsPath, "--max-regression", "100") == 0
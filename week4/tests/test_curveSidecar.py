@@ -0,0 +1,55 @@
+import os
+
+import numpy
+import pytest
+
+import curveSidecar
+import readAnimCurves
+
+@pytest.fixture
+def take(finishedFolder):
+    return readAnimCurves.readAnimTake(os.path.join(finishedFolder, "rig_with_AAA_0010_tk01.ma"))
+
+def test_roundTrip(take, tmp_path):
+    sidecarPath = curveSidecar.writeTakeSidecar(take, os.path.join(str(tmp_path), "rig_with_AAA_0010_tk01.animcurves"))
+    sidecar = curveSidecar.readCurveSidecar(sidecarPath)
+    assert (sidecar.fps, sidecar.timeUnit) == (take.fps, take.timeUnit)
+    assert sidecar.getFrameRange() == take.getFrameRange()
+    assert len(sidecar.curves) == len(take.curves) == 694
+    for curve, sidecarCurve in zip(take.curves, sidecar.curves):
+        assert (sidecarCurve.name, sidecarCurve.curveType, sidecarCurve.joint, sidecarCurve.channel) == \
+            (curve.name, curve.curveType, curve.joint, curve.channel)
+        # the keys are read back bit for bit, as read-only views into the file
+        assert numpy.array_equal(sidecarCurve.times, curve.times)
+        assert numpy.array_equal(sidecarCurve.values, curve.values)
+        assert not sidecarCurve.values.flags.writeable
+
+def test_emptyCurvesAndDataAlignment(tmp_path):
+    curves = [
+        readAnimCurves.AnimCurve("Hips_visibility", "animCurveTU", numpy.array([]), numpy.array([]), "Hips", "visibility"),
+        readAnimCurves.AnimCurve("Hips_translateX", "animCurveTL", numpy.array([3.0, 4.0]), numpy.array([0.5, -0.25]),
+                                 "Hips", "translateX"),
+    ]
+    sidecarPath = os.path.join(str(tmp_path), "take.animcurves")
+    curveSidecar.writeCurveSidecar(sidecarPath, curves, 24.0, "film")
+    sidecar = curveSidecar.readCurveSidecar(sidecarPath)
+    assert sidecar.getFrameRange() == (3.0, 4.0)
+    assert len(sidecar.curves[0]) == 0
+    assert list(sidecar.curves[1].values) == [0.5, -0.25]
+    dataLength = 2 * 2 * curveSidecar.SIDECAR_DTYPE.itemsize
+    assert (os.path.getsize(sidecarPath) - dataLength) % 8 == 0
+
+def test_sidecarPath():
+    assert curveSidecar.getSidecarPath("/dest/rig_with_AAA_0010_tk01.ma") == "/dest/rig_with_AAA_0010_tk01.animcurves"
+
+def test_badSidecars(tmp_path):
+    emptyPath = os.path.join(str(tmp_path), "empty.animcurves")
+    open(emptyPath, "wb").close()
+    with pytest.raises(ValueError):
+        curveSidecar.readCurveSidecar(emptyPath)
+
+    otherPath = os.path.join(str(tmp_path), "other.animcurves")
+    with open(otherPath, "wb") as output:
+        output.write(b"//Maya ASCII 2020 scene\n")
+    with pytest.raises(ValueError):
+        curveSidecar.readCurveSidecar(otherPath)
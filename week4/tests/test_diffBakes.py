@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+
+import numpy
+import pytest
+
+import curveSidecar
+import diffBakes
+
+def test_finishedFilesMatchThemselves(finishedFolder):
+    results = diffBakes.diffFolders(finishedFolder, finishedFolder, processes=2)
+    assert len(results) == 10
+    assert [result["status"] for result in results] == ["match"] * 10
+    for result in results:
+        assert result["missingCurves"] == [] and result["extraCurves"] == []
+        assert all(jointDiff["maxError"] == 0.0 for jointDiff in result["joints"].values())
+
+def test_perturbedCurveIsReported(finishedFolder, tmp_path):
+    referencePath = os.path.join(finishedFolder, "rig_with_AAA_0010_tk01.ma")
+    take = diffBakes.loadBakedTake(referencePath)
+    curve = next(curve for curve in take.curves if diffBakes.getCurveKey(curve) == "Head.rotateY")
+    curve.values = numpy.where(curve.times >= 50, curve.values + 0.25, curve.values)
+    candidatePath = os.path.join(str(tmp_path), "rig_with_AAA_0010_tk01" + curveSidecar.SIDECAR_EXTENSION)
+    curveSidecar.writeTakeSidecar(take, candidatePath)
+
+    result = diffBakes.diffFiles((referencePath, candidatePath, None, False))
+    assert result["status"] == "differ"
+    assert result["firstDivergentFrame"] == 50
+    diverged = dict((joint, jointDiff) for joint, jointDiff in result["joints"].items()
+                    if jointDiff["divergedChannels"])
+    assert list(diverged) == ["Head"]
+    assert diverged["Head"]["divergedChannels"] == ["rotateY"]
+    assert diverged["Head"]["maxError"] == pytest.approx(0.25)
+    assert diverged["Head"]["firstDivergentFrame"] == 50
+
+def test_missingCandidateIsReported(finishedFolder, tmp_path):
+    results = diffBakes.diffFolders(finishedFolder, str(tmp_path), processes=1)
+    assert [result["status"] for result in results] == ["missing"] * 10
+
+def test_exitCodeGatesOnDifferences(finishedFolder, tmp_path):
+    scriptPath = diffBakes.__file__.replace(".pyc", ".py")
+    assert subprocess.call([sys.executable, scriptPath, finishedFolder, finishedFolder]) == 0
+    assert subprocess.call([sys.executable, scriptPath, finishedFolder, str(tmp_path)]) == 1
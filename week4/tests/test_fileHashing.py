@@ -0,0 +1,34 @@
+import json
+import os
+import threading
+
+import fileHashing
+
+def test_writeJsonFileNeverLeavesTheFileMissing(tmp_path):
+    filePath = os.path.join(str(tmp_path), "manifest.json")
+    fileHashing.writeJsonFile(filePath, {"writer": None, "count": 0})
+    stop = threading.Event()
+    errors = []
+
+    def write(writer):
+        count = 0
+        while not stop.is_set():
+            count += 1
+            try:
+                fileHashing.writeJsonFile(filePath, {"writer": writer, "count": count})
+            except (IOError, OSError) as error:
+                errors.append(error)
+
+    writers = [threading.Thread(target=write, args=(writer,)) for writer in range(3)]
+    for thread in writers:
+        thread.start()
+    try:
+        for read in range(500):
+            with open(filePath, "r") as input:
+                assert set(json.load(input)) == set(["writer", "count"])
+    finally:
+        stop.set()
+        for thread in writers:
+            thread.join()
+    assert errors == []
+    assert [fileName for fileName in os.listdir(str(tmp_path)) if fileName.endswith(".tmp")] == []
@@ -0,0 +1,83 @@
+import json
+import os
+
+import pytest
+
+import jobScheduler
+
+def writeSpec(folder, animFolder, **spec):
+    """
+    Writes a job spec for the bundled takes and the local stand-in worker
+    and returns it loaded.
+    """
+    spec = dict({
+        "takes": os.path.join(animFolder, "*.ma"),
+        "destination": "out",
+        "backend": "local",
+        "processes": 2,
+    }, **spec)
+    specPath = os.path.join(str(folder), "job.json")
+    with open(specPath, "w") as output:
+        json.dump(spec, output)
+    return jobScheduler.loadJobSpec(specPath)
+
+def getJob(summary, takeName):
+    for animPath, job in summary["jobs"].items():
+        if os.path.basename(animPath) == takeName:
+            return job
+
+def test_singleTakePatternIsExpanded(animFolder, tmp_path):
+    spec = writeSpec(tmp_path, animFolder)
+    assert len(spec["takes"]) == 9
+    assert spec["destination"] == os.path.join(str(tmp_path), "out")
+
+def test_crashAndHangFailOnlyTheirJobs(animFolder, tmp_path):
+    spec = writeSpec(tmp_path, animFolder, timeout=1, retries=1, backendOptions={
+        "crashFiles": ["AAA_0010_tk01.ma"],
+        "hangFiles": ["AAA_0020_tk01.ma"],
+        "flakyFiles": ["AAA_0030_tk01.ma"],
+    })
+    summary = jobScheduler.runJobs(spec)
+    assert summary["succeeded"] == 7 and summary["failed"] == 2
+
+    crashed = getJob(summary, "AAA_0010_tk01.ma")
+    assert crashed["status"] == "failed" and crashed["attempts"] == 2
+    assert all(error.startswith("Worker crashed") for error in crashed["errors"])
+    hung = getJob(summary, "AAA_0020_tk01.ma")
+    assert hung["status"] == "failed" and hung["attempts"] == 2
+    assert hung["errors"] == ["Timed out after 1 seconds"] * 2
+    flaky = getJob(summary, "AAA_0030_tk01.ma")
+    assert flaky["status"] == "ok" and flaky["attempts"] == 2
+    assert os.path.exists(flaky["outputPath"])
+
+def test_failedJobsOnlyRerunWithRetryFailed(animFolder, tmp_path):
+    spec = writeSpec(tmp_path, animFolder, retries=0, backendOptions={"failFiles": ["AAA_0040_tk01.ma"]})
+    assert jobScheduler.runJobs(spec)["failed"] == 1
+
+    spec = writeSpec(tmp_path, animFolder, retries=0)
+    rerun = []
+    summary = jobScheduler.runJobs(spec, progressCallback=lambda animPath, job: rerun.append(animPath))
+    assert rerun == [] and summary["failed"] == 1
+    summary = jobScheduler.runJobs(spec, retryFailed=True,
+                                   progressCallback=lambda animPath, job: rerun.append(animPath))
+    assert [os.path.basename(animPath) for animPath in rerun] == ["AAA_0040_tk01.ma"]
+    assert summary["succeeded"] == 9
+
+def test_resumeOnlyRunsUnfinishedJobs(animFolder, tmp_path):
+    spec = writeSpec(tmp_path, animFolder, processes=1, backendOptions={"delay": 0.1})
+
+    def interrupt(animPath, job):
+        if job["status"] == "ok":
+            raise KeyboardInterrupt()
+
+    with pytest.raises(KeyboardInterrupt):
+        jobScheduler.runJobs(spec, progressCallback=interrupt)
+    state = jobScheduler.loadJobState(spec["destination"])
+    done = set(animPath for animPath, job in state["jobs"].items() if job["status"] == "ok")
+    unfinished = set(animPath for animPath, job in state["jobs"].items() if job["status"] in ("pending", "running"))
+    assert len(done) == 1 and len(unfinished) == 8
+
+    rerun = []
+    summary = jobScheduler.runJobs(spec, progressCallback=lambda animPath, job: rerun.append(animPath))
+    assert set(rerun) == unfinished and len(rerun) == 8
+    assert summary["succeeded"] == 9
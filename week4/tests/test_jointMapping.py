@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+import jointMapping
+import readAnimCurves
+import writeMayaAscii
+
+@pytest.fixture
+def animJointPaths(animFolder):
+    take = readAnimCurves.readAnimTake(os.path.join(animFolder, "AAA_0010_tk01.ma"))
+    return sorted(writeMayaAscii.getJointPaths(take).values())
+
+@pytest.fixture(autouse=True)
+def emptyJointMapMemory(monkeypatch):
+    monkeypatch.setattr(jointMapping, "jointMapMemory", {})
+
+def test_sameSkeletonInANamespace(animJointPaths):
+    rigJointPaths = [writeMayaAscii.addNamespace(path, "character") for path in animJointPaths]
+    resolved = jointMapping.resolveJointMap(animJointPaths, rigJointPaths)
+    assert resolved["map"] == dict((path, path) for path in animJointPaths)
+    assert resolved["unmatchedAnim"] == []
+    assert resolved["unmatchedRig"] == []
+
+def test_rules():
+    animJointPaths = ["|Reference|Hips", "|Reference|Hips|Spine", "|Reference|Hips|LeftUpLeg"]
+    rigJointPaths = ["|root|mixamorig_hips_jnt", "|root|mixamorig_hips_jnt|mixamorig_spine_jnt",
+                     "|root|mixamorig_hips_jnt|mixamorig_leftthigh_jnt", "|root|mixamorig_hips_jnt|tail_jnt"]
+    rules = {
+        "renames": {"leftthigh": "LeftUpLeg"},
+        "stripPrefixes": ["mixamorig_"],
+        "stripSuffixes": ["_jnt"],
+        "caseSensitive": False,
+    }
+    resolved = jointMapping.resolveJointMap(animJointPaths, rigJointPaths, rules)
+    assert resolved["map"] == {
+        "|Reference|Hips": "|root|mixamorig_hips_jnt",
+        "|Reference|Hips|Spine": "|root|mixamorig_hips_jnt|mixamorig_spine_jnt",
+        "|Reference|Hips|LeftUpLeg": "|root|mixamorig_hips_jnt|mixamorig_leftthigh_jnt",
+    }
+    assert resolved["unmatchedRig"] == ["|root|mixamorig_hips_jnt|tail_jnt"]
+
+    # without the rules only exact names match
+    assert jointMapping.resolveJointMap(animJointPaths, rigJointPaths)["map"] == {}
+
+def test_sharedShortNamesMatchByHierarchy():
+    animJointPaths = ["|Hips|LeftArm|End", "|Hips|RightArm|End"]
+    rigJointPaths = ["|Hips|RightArm|End", "|Hips|LeftArm|End"]
+    resolved = jointMapping.resolveJointMap(animJointPaths, rigJointPaths)
+    assert resolved["map"] == {"|Hips|LeftArm|End": "|Hips|LeftArm|End",
+                               "|Hips|RightArm|End": "|Hips|RightArm|End"}
+
+    # with no exact hierarchy match, the candidate sharing the most parents wins
+    resolved = jointMapping.resolveJointMap(["|Rig|LeftArm|End"], rigJointPaths)
+    assert resolved["map"] == {"|Rig|LeftArm|End": "|Hips|LeftArm|End"}
+
+def test_skeletonSignatureIgnoresOrderAndNamespace(animJointPaths):
+    signature = jointMapping.getSkeletonSignature(animJointPaths)
+    namespaced = [writeMayaAscii.addNamespace(path, "take") for path in reversed(animJointPaths)]
+    assert jointMapping.getSkeletonSignature(namespaced) == signature
+    assert jointMapping.getSkeletonSignature(animJointPaths[1:]) != signature
+    assert jointMapping.getSkeletonSignature(animJointPaths, {"caseSensitive": False}) != signature
+
+def test_jointMapIsCached(finishedFolder, animJointPaths, tmp_path):
+    cacheFolder = os.path.join(str(tmp_path), "jointMaps")
+    rigPath = os.path.join(finishedFolder, "rig_with_AAA_0010_tk01.ma")
+    listedRigs = []
+
+    def listRigJoints():
+        listedRigs.append(rigPath)
+        return [writeMayaAscii.addNamespace(path, "character") for path in animJointPaths]
+
+    resolved = jointMapping.getJointMap(rigPath, animJointPaths, listRigJoints, cacheFolder=cacheFolder)
+    assert len(resolved["map"]) == len(animJointPaths)
+    assert resolved["rigJoints"] == animJointPaths
+    assert len(os.listdir(cacheFolder)) == 1
+
+    # a new worker reads the map from disk without listing the rig's joints
+    jointMapping.jointMapMemory.clear()
+    cached = jointMapping.getJointMap(rigPath, animJointPaths, listRigJoints, cacheFolder=cacheFolder)
+    assert cached["map"] == resolved["map"]
+    assert listedRigs == [rigPath]
+    assert jointMapping.getCachedRigJoints(rigPath, cacheFolder) == animJointPaths
+    otherRigPath = os.path.join(finishedFolder, "rig_with_AAA_0020_tk01.ma")
+    assert jointMapping.getCachedRigJoints(otherRigPath, cacheFolder) is None
@@ -0,0 +1,65 @@
+import os
+import shutil
+
+import maIndex
+import readAnimCurves
+
+REFERENCE_LINES = (
+    'file -rdi 1 -ns "rig" -op "v=0;" -rfn "rigRN" "C:/rigs/rig.ma";\n'
+    'file -r -ns "rig" -dr 1 -rfn "rigRN" -op "v=0;" "C:/rigs/rig.ma";\n'
+    'requires maya "2020";\n'
+    'currentUnit -l centimeter -a degree -t film;\n'
+)
+
+def copyFinishedFile(finishedFolder, tmp_path):
+    # the index is cached next to the file, so work on a copy
+    filePath = os.path.join(str(tmp_path), "rig_with_AAA_0010_tk01.ma")
+    shutil.copyfile(os.path.join(finishedFolder, "rig_with_AAA_0010_tk01.ma"), filePath)
+    return filePath
+
+def test_quotedSemicolonDoesNotEndStatement(tmp_path):
+    filePath = os.path.join(str(tmp_path), "options.ma")
+    with open(filePath, "w") as output:
+        output.write(REFERENCE_LINES)
+    with maIndex.MayaAsciiFile(filePath, useCache=False) as mayaFile:
+        references = mayaFile.getFileReferences()
+        assert mayaFile.getTimeUnit() == "film"
+    assert [(reference["namespace"], reference["referenceNode"], reference["path"], reference["deferred"])
+            for reference in references] == [("rig", "rigRN", "C:/rigs/rig.ma", False),
+                                             ("rig", "rigRN", "C:/rigs/rig.ma", True)]
+
+def test_escapedQuotesInStatements():
+    data = b'setAttr ".notes" -type "string" "say \\"hi;\\" twice";\nsetAttr ".v" 0;\n'
+    assert maIndex.getStatement(data, 0, len(data)) == 'setAttr ".notes" -type "string" "say \\"hi;\\" twice";'
+
+def test_finishedFileReferences(finishedFolder, tmp_path):
+    with maIndex.MayaAsciiFile(copyFinishedFile(finishedFolder, tmp_path)) as mayaFile:
+        references = mayaFile.getFileReferences()
+    assert [reference["deferred"] for reference in references] == [False, True]
+    for reference in references:
+        assert reference["namespace"] == "character"
+        assert reference["referenceNode"] == "characterRN"
+        assert reference["path"].endswith("/week3/character.mb")
+
+def test_animCurveMatchesFullRead(finishedFolder, tmp_path):
+    filePath = copyFinishedFile(finishedFolder, tmp_path)
+    take = readAnimCurves.readAnimTake(filePath)
+    expected = take.getCurve("Hips", "rotateX")
+    with maIndex.MayaAsciiFile(filePath) as mayaFile:
+        curve = mayaFile.getAnimCurve("Hips_rotateX")
+        assert mayaFile.getNodeType("Hips_rotateX") == "animCurveTA"
+    assert (curve.joint, curve.channel) == ("Hips", "rotateX")
+    assert curve.times.tolist() == expected.times.tolist()
+    assert curve.values.tolist() == expected.values.tolist()
+
+def test_indexIsCachedUntilTheFileChanges(finishedFolder, tmp_path):
+    filePath = copyFinishedFile(finishedFolder, tmp_path)
+    index = maIndex.loadIndex(filePath)
+    assert os.path.exists(maIndex.getIndexPath(filePath))
+    assert maIndex.loadIndex(filePath) == index
+
+    with open(filePath, "a") as output:
+        output.write('createNode transform -n "extra";\n')
+    rebuilt = maIndex.loadIndex(filePath)
+    assert rebuilt["nodes"][-1][:2] == ["extra", "transform"]
+    assert len(rebuilt["nodes"]) == len(index["nodes"]) + 1
@@ -0,0 +1,84 @@
+import filecmp
+import os
+import time
+
+import pytest
+
+import batchApplyAnim
+import prefetchTakes
+import readAnimCurves
+import sourceCache
+
+@pytest.fixture
+def animationFiles(animFolder):
+    return batchApplyAnim.getAnimationFiles(animFolder)
+
+def waitForStaged(prefetcher, count):
+    deadline = time.time() + 10.0
+    while len(prefetcher.staged) < count and time.time() < deadline:
+        time.sleep(0.01)
+    # give the threads a chance to stage more than they should
+    time.sleep(0.1)
+    return sorted(prefetcher.staged)
+
+def test_takesAreStagedInOrder(animationFiles, tmp_path):
+    stagingFolder = os.path.join(str(tmp_path), "staging")
+    with prefetchTakes.TakePrefetcher(animationFiles, stagingFolder, parse=True) as prefetcher:
+        for animPath in animationFiles:
+            stagedTake = prefetcher.get(animPath)
+            assert stagedTake.error is None
+            assert stagedTake.isStaged()
+            # staged copies keep their file name, so output names don't change
+            assert os.path.basename(stagedTake.localPath) == os.path.basename(animPath)
+            assert os.path.dirname(os.path.dirname(stagedTake.localPath)) == stagingFolder
+            assert filecmp.cmp(stagedTake.localPath, animPath, shallow=False)
+            assert stagedTake.take.filePath == stagedTake.localPath
+            assert stagedTake.take.getKeyCount() == readAnimCurves.readAnimTake(animPath).getKeyCount()
+            prefetcher.release(stagedTake)
+            assert not os.path.exists(stagedTake.localPath)
+        assert prefetcher.stats["takes"] == 9
+        assert prefetcher.stats["failed"] == 0
+        assert "of 9 takes ready" in prefetcher.getSummary()
+    assert os.listdir(stagingFolder) == []
+
+def test_queueDepthAndBudget(animationFiles, tmp_path):
+    with prefetchTakes.TakePrefetcher(animationFiles, queueDepth=3) as prefetcher:
+        assert waitForStaged(prefetcher, 3) == animationFiles[:3]
+        prefetcher.release(prefetcher.get(animationFiles[0]))
+        assert waitForStaged(prefetcher, 3) == animationFiles[1:4]
+        stagingFolder = prefetcher.stagingFolder
+    # the prefetcher made the staging folder, so it removes it
+    assert not os.path.exists(stagingFolder)
+
+    # one take is staged on its own even when it is bigger than the budget
+    with prefetchTakes.TakePrefetcher(animationFiles, queueDepth=3, budgetBytes=1) as prefetcher:
+        assert waitForStaged(prefetcher, 1) == animationFiles[:1]
+
+def test_unstagedTakes(animationFiles, tmp_path):
+    missingPath = os.path.join(str(tmp_path), "AAA_0110_tk01.ma")
+    with prefetchTakes.TakePrefetcher([missingPath] + animationFiles, queueDepth=1, threads=1) as prefetcher:
+        stagedTake = prefetcher.get(missingPath)
+        assert not stagedTake.isStaged()
+        assert stagedTake.localPath == missingPath
+        assert stagedTake.error.startswith("IOError") or stagedTake.error.startswith("FileNotFoundError")
+        prefetcher.release(stagedTake)
+
+        # asking for a take nobody started on returns it unstaged straight away
+        stagedTake = prefetcher.get(animationFiles[-1])
+        assert (stagedTake.isStaged(), stagedTake.error) == (False, None)
+        assert prefetcher.stats["failed"] == 1
+
+def test_takesAreStagedIntoTheSourceCache(animationFiles, tmp_path):
+    cache = sourceCache.enableCache(os.path.join(str(tmp_path), "cache"))
+    try:
+        with prefetchTakes.TakePrefetcher(animationFiles[:2]) as prefetcher:
+            for animPath in animationFiles[:2]:
+                stagedTake = prefetcher.get(animPath)
+                assert stagedTake.cached
+                assert cache.isInCache(stagedTake.localPath)
+                prefetcher.release(stagedTake)
+                # the cached copy belongs to the cache and outlives the batch
+                assert os.path.exists(stagedTake.localPath)
+            assert prefetcher.usedBytes == 0
+    finally:
+        sourceCache.disableCache()
@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+import readAnimCurves
+
+@pytest.fixture
+def take(animFolder):
+    return readAnimCurves.readAnimTake(os.path.join(animFolder, "AAA_0010_tk01.ma"))
+
+def test_takeSummary(take):
+    assert take.fps == 120
+    assert take.timeUnit == "120fps"
+    assert len(take.joints) == 23
+    assert len(take.curves) == 72
+    assert take.getFrameRange() == (0, 535)
+
+def test_jointHierarchy(take):
+    assert take.joints["Hips"].parent == "Reference"
+    assert take.joints["Spine"].parent == "Hips"
+
+def test_keyValuesMatchFile(take):
+    curve = next(curve for curve in take.curves if curve.name == "Hips_rotateX")
+    assert (curve.joint, curve.channel, curve.curveType) == ("Hips", "rotateX", "animCurveTA")
+    assert len(curve.times) == 536
+    # setAttr ".ktv[0:249]"  0 0 1 -363.3192138671875 2 -363.3070068359375 ...
+    assert list(curve.times[:3]) == [0, 1, 2]
+    assert list(curve.values[:3]) == [0, -363.3192138671875, -363.3070068359375]
+    # the second chunk, setAttr ".ktv[250:499]" 250 -446.22821044921875 ...
+    assert (curve.times[250], curve.values[250]) == (250, -446.22821044921875)
+    assert curve.values[-1] == -729.398681640625
+
+def test_framesPerSecond():
+    assert readAnimCurves.getFramesPerSecond("film") == 24
+    assert readAnimCurves.getFramesPerSecond("ntsc") == 30
+    assert readAnimCurves.getFramesPerSecond("120fps") == 120
+
+def test_numberedBakedCurveNames():
+    assert readAnimCurves.getJointAndChannel("Head_rotateX") == ("Head", "rotateX")
+    assert readAnimCurves.getJointAndChannel("Head_rotateX1") == ("Head", "rotateX")
+    assert readAnimCurves.getJointAndChannel("Head_notAChannel") == (None, None)
+
+def test_rotateOrder(take, tmp_path):
+    assert take.joints["Hips"].rotateOrder == 0
+    filePath = os.path.join(str(tmp_path), "zxy.ma")
+    with open(filePath, "w") as output:
+        output.write('createNode joint -n "Hips";\n\tsetAttr ".ro" 2;\n')
+    assert readAnimCurves.readAnimTake(filePath).joints["Hips"].rotateOrder == 2
@@ -0,0 +1,26 @@
+import os
+
+import numpy
+
+import readAnimCurves
+import reduceKeys
+
+def test_reducedTakeStaysWithinTolerance(animFolder):
+    take = readAnimCurves.readAnimTake(os.path.join(animFolder, "AAA_0010_tk01.ma"))
+    originals = [(curve.curveType, curve.times, curve.values) for curve in take.curves]
+    report = reduceKeys.reduceTakeCurves(take)
+    assert report["keysBefore"] == sum(len(times) for curveType, times, values in originals)
+    assert report["keysAfter"] == take.getKeyCount() < report["keysBefore"]
+    assert report["bytesAfter"] < report["bytesBefore"]
+    for curve, (curveType, times, values) in zip(take.curves, originals):
+        assert (curve.times[0], curve.times[-1]) == (times[0], times[-1])
+        error = numpy.abs(numpy.interp(times, curve.times, curve.values) - values).max()
+        assert error <= reduceKeys.getTolerance(curveType) + 1e-9
+
+def test_keyBytesAreCloseToTheWrittenSize(animFolder):
+    take = readAnimCurves.readAnimTake(os.path.join(animFolder, "AAA_0010_tk01.ma"))
+    for curve in take.curves[:10]:
+        written = sum(len("{0:.17g} {1:.17g} ".format(time, value)) for time, value in zip(curve.times, curve.values))
+        estimated = reduceKeys.getKeyBytes(curve.times, curve.values).sum()
+        assert abs(estimated - written) <= 0.05 * written
+    assert reduceKeys.getNumberBytes([0.0, 7.0, -120.0, 535.0]).tolist() == [1, 1, 4, 3]
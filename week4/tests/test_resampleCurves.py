@@ -0,0 +1,91 @@
+import os
+
+import numpy
+import pytest
+
+import readAnimCurves
+import resampleCurves
+
+def getAxisMatrix(axis, degrees):
+    """
+    The rotation matrix (column vectors) of the given angle about one axis.
+    """
+    cosine, sine = numpy.cos(numpy.radians(degrees)), numpy.sin(numpy.radians(degrees))
+    return [
+        numpy.array([[1.0, 0.0, 0.0], [0.0, cosine, -sine], [0.0, sine, cosine]]),
+        numpy.array([[cosine, 0.0, sine], [0.0, 1.0, 0.0], [-sine, 0.0, cosine]]),
+        numpy.array([[cosine, -sine, 0.0], [sine, cosine, 0.0], [0.0, 0.0, 1.0]]),
+    ][axis]
+
+def getQuaternionMatrix(quaternion):
+    w, x, y, z = quaternion
+    return numpy.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)],
+        [2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)],
+        [2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)],
+    ])
+
+def assertSameRotations(first, second):
+    # q and -q are the same rotation
+    assert numpy.allclose(numpy.abs(numpy.sum(first * second, axis=-1)), 1.0)
+
+@pytest.mark.parametrize("rotateOrder", resampleCurves.ROTATE_ORDERS)
+def test_eulerRoundTripForEveryRotateOrder(rotateOrder):
+    rotations = numpy.random.RandomState(1).uniform(-170.0, 170.0, (100, 3))
+    middle = resampleCurves.getAxisIndices(rotateOrder)[1]
+    rotations[:, middle] = numpy.clip(rotations[:, middle], -85.0, 85.0)
+    quaternions = resampleCurves.eulerToQuaternions(rotations, rotateOrder)
+
+    # the first axis of the order is applied first, as in Maya
+    for rotation, quaternion in zip(rotations[:10], quaternions):
+        matrix = numpy.eye(3)
+        for axis in resampleCurves.getAxisIndices(rotateOrder):
+            matrix = getAxisMatrix(axis, rotation[axis]).dot(matrix)
+        assert numpy.allclose(getQuaternionMatrix(quaternion), matrix)
+    assert numpy.allclose(resampleCurves.quaternionsToEuler(quaternions, rotateOrder), rotations)
+    alternate = resampleCurves.getAlternateEuler(rotations, rotateOrder)
+    assertSameRotations(resampleCurves.eulerToQuaternions(alternate, rotateOrder), quaternions)
+
+@pytest.mark.parametrize("rotateOrder", resampleCurves.ROTATE_ORDERS)
+def test_resampleRoundTripForEveryRotateOrder(rotateOrder, animFolder):
+    take = readAnimCurves.readAnimTake(os.path.join(animFolder, "AAA_0010_tk01.ma"))
+    for joint in take.joints.values():
+        joint.rotateOrder = resampleCurves.ROTATE_ORDERS.index(rotateOrder)
+    before = dict((joint, numpy.stack([curves[channel].values for channel in resampleCurves.ROTATE_CHANNELS], -1))
+                  for joint, curves in take.getCurvesByJoint().items()
+                  if all(channel in curves for channel in resampleCurves.ROTATE_CHANNELS))
+    resampleCurves.resampleTakeCurves(take, 24)
+    assert take.fps == 24.0
+
+    # every 24fps frame falls on a 120fps key, so the rotations come back
+    # unchanged (up to the Euler solution the filter picked)
+    for joint, curves in take.getCurvesByJoint().items():
+        if joint not in before:
+            continue
+        after = numpy.stack([curves[channel].values for channel in resampleCurves.ROTATE_CHANNELS], -1)
+        assertSameRotations(resampleCurves.eulerToQuaternions(after, rotateOrder),
+                            resampleCurves.eulerToQuaternions(before[joint][::5], rotateOrder))
+
+@pytest.mark.parametrize("rotateOrder", resampleCurves.ROTATE_ORDERS)
+def test_inBetweenFramesAreSlerpedInTheRotateOrder(rotateOrder):
+    # a quarter turn about a tilted axis, keyed at both ends
+    axis = numpy.array([1.0, 2.0, 3.0]) / numpy.sqrt(14.0)
+    angles = numpy.radians([0.0, 90.0, 45.0])
+    quaternions = numpy.column_stack((numpy.cos(angles / 2.0), numpy.outer(numpy.sin(angles / 2.0), axis)))
+    keys = resampleCurves.quaternionsToEuler(quaternions[:2], rotateOrder)
+    channels = dict((channel, (numpy.array([0.0, 10.0]), keys[:, index]))
+                    for index, channel in enumerate(resampleCurves.ROTATE_CHANNELS))
+
+    resampled = resampleCurves.resampleJointChannels(channels, 120, 24, rotateOrder=rotateOrder)
+    times, values = resampled["rotateX"]
+    assert times.tolist() == [0.0, 1.0, 2.0]
+    rotations = numpy.column_stack([resampled[channel][1] for channel in resampleCurves.ROTATE_CHANNELS])
+    assertSameRotations(resampleCurves.eulerToQuaternions(rotations, rotateOrder),
+                        quaternions[[0, 2, 1]])
+
+def test_rotateOrderNames():
+    assert resampleCurves.getRotateOrder(0) == "xyz"
+    assert resampleCurves.getRotateOrder(numpy.int64(5)) == "zyx"
+    assert resampleCurves.getRotateOrder("ZXY") == "zxy"
+    with pytest.raises(ValueError):
+        resampleCurves.getRotateOrder(6)
@@ -0,0 +1,110 @@
+import json
+import os
+import shutil
+import threading
+
+import sourceCache
+
+def makeSources(folder, count, contents=b"rig"):
+    os.makedirs(folder)
+    sourcePaths = []
+    for index in range(count):
+        sourcePath = os.path.join(folder, "rig{0}.ma".format(index))
+        with open(sourcePath, "wb") as output:
+            output.write(contents)
+        sourcePaths.append(sourcePath)
+    return sourcePaths
+
+def test_missThenHit(tmp_path):
+    cache = sourceCache.SourceCache(os.path.join(str(tmp_path), "cache"))
+    sourcePath = makeSources(os.path.join(str(tmp_path), "share"), 1)[0]
+    localPath = cache.getLocalPath(sourcePath)
+    assert cache.isInCache(localPath)
+    assert cache.getLocalPath(sourcePath) == localPath
+    assert (cache.stats["misses"], cache.stats["hits"]) == (1, 1)
+
+    # a changed source is copied again
+    with open(sourcePath, "wb") as output:
+        output.write(b"rig, version 2")
+    os.utime(sourcePath, (0, 0))
+    newLocalPath = cache.getLocalPath(sourcePath)
+    assert newLocalPath != localPath
+    with open(newLocalPath, "rb") as input:
+        assert input.read() == b"rig, version 2"
+    assert cache.stats["misses"] == 2
+
+def test_sameContentsAreStoredOnce(tmp_path):
+    cache = sourceCache.SourceCache(os.path.join(str(tmp_path), "cache"))
+    sourcePaths = makeSources(os.path.join(str(tmp_path), "share"), 3)
+    assert len(set(cache.getLocalPath(sourcePath) for sourcePath in sourcePaths)) == 1
+    assert len(cache.getObjects()) == 1
+
+def test_concurrentCopiesOfTheSameContents(tmp_path):
+    cacheFolder = os.path.join(str(tmp_path), "cache")
+    sourcePaths = makeSources(os.path.join(str(tmp_path), "share"), 8, b"x" * (3 * 1024 * 1024))
+    localPaths = []
+    errors = []
+
+    def copy(sourcePath):
+        try:
+            localPaths.append(sourceCache.SourceCache(cacheFolder).getLocalPath(sourcePath))
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=copy, args=(sourcePath,)) for sourcePath in sourcePaths * 2]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(set(localPaths)) == 1
+    assert os.listdir(os.path.join(cacheFolder, "tmp")) == []
+    assert os.listdir(os.path.join(cacheFolder, "locks")) == []
+
+def test_leastRecentlyUsedIsEvicted(tmp_path):
+    cache = sourceCache.SourceCache(os.path.join(str(tmp_path), "cache"), maxBytes=25)
+    shareFolder = os.path.join(str(tmp_path), "share")
+    os.makedirs(shareFolder)
+    localPaths = []
+    for index in range(3):
+        sourcePath = os.path.join(shareFolder, "take{0}.ma".format(index))
+        with open(sourcePath, "wb") as output:
+            output.write(str(index).encode("utf-8") * 10)
+        localPaths.append(cache.getLocalPath(sourcePath))
+        # last use times far enough apart to sort reliably
+        os.utime(localPaths[-1], (1000 + index, 1000 + index))
+    assert [os.path.exists(localPath) for localPath in localPaths] == [False, True, True]
+    assert cache.evict(maxBytes=0) == 20
+
+def test_statsAreWrittenInBatches(tmp_path, monkeypatch):
+    monkeypatch.setattr(sourceCache, "STATS_FLUSH_LOOKUPS", 3)
+    cache = sourceCache.SourceCache(os.path.join(str(tmp_path), "cache"))
+    statsPath = os.path.join(cache.cacheFolder, "stats.json")
+    sourcePath = makeSources(os.path.join(str(tmp_path), "share"), 1)[0]
+    cache.getLocalPath(sourcePath)
+    cache.getLocalPath(sourcePath)
+    assert not os.path.exists(statsPath)
+    cache.getLocalPath(sourcePath)
+    with open(statsPath, "r") as input:
+        assert json.load(input)["hits"] == 2
+    cache.getLocalPath(sourcePath)
+    # getTotalStats adds this process's unwritten counts first
+    assert cache.getTotalStats()["hits"] == 3
+
+def test_restoreSourcePaths(tmp_path, finishedFolder):
+    cache = sourceCache.SourceCache(os.path.join(str(tmp_path), "cache"))
+    rigPath = makeSources(os.path.join(str(tmp_path), "share"), 1)[0]
+    localPath = cache.getLocalPath(rigPath).replace("\\", "/")
+    scenePath = os.path.join(str(tmp_path), "rig_with_AAA_0010_tk01.ma")
+    shutil.copyfile(os.path.join(finishedFolder, "rig_with_AAA_0010_tk01.ma"), scenePath)
+    with open(scenePath, "r") as input:
+        text = input.read()
+    sourceLine = '"C:/Users/GoodbyeWorld Dev/Documents/Lucille/Tech for Anim/tech-art-exercises/week3/character.mb"'
+    with open(scenePath, "w") as output:
+        output.write(text.replace(sourceLine, '"{0}"'.format(localPath)))
+
+    assert cache.restoreSourcePaths(scenePath) == 2
+    with open(scenePath, "r") as input:
+        restored = input.read()
+    assert localPath not in restored
+    assert restored == text.replace(sourceLine, '"{0}"'.format(rigPath.replace("\\", "/")))
@@ -0,0 +1,97 @@
+import json
+import os
+import shutil
+
+import pytest
+
+import validateTakes
+
+# small takes written next to the bundled ones, each broken in its own way
+BROKEN_TAKES = {
+    "AAA_0110_tk01.ma": (
+        'currentUnit -l centimeter -a degree -t 120fps;\n'
+        'createNode joint -n "Hips";\n'
+        'createNode animCurveTA -n "Hips_rotateX";\n'
+        '\tsetAttr -s 3 ".ktv[0:2]" 0 0 2 1 1 2;\n'
+        'createNode animCurveTA -n "Hips_rotateY";\n'
+        '\tsetAttr -s 3 ".ktv[0:2]" 0 0 1 nan 2 2;\n'),
+    "AAA_0120_tk01.ma": (
+        'currentUnit -l centimeter -a degree -t film;\n'
+        'createNode joint -n "Hips";\n'
+        'createNode animCurveTL -n "Hips_translateX";\n'
+        '\tsetAttr -s 4 ".ktv[0:3]" 0 0 1 1 2 500 3 501;\n'),
+    "AAA_0130_tk01.ma": (
+        'currentUnit -l centimeter -a degree -t 120fps;\n'
+        'createNode joint -n "Tail";\n'
+        'createNode animCurveTA -n "Tail_rotateX";\n'
+        '\tsetAttr -s 2 ".ktv[0:1]" 0 0 1 1;\n'),
+    "AAA_0140_tk01.ma": "//Maya ASCII 2020 scene\n",
+    "notes.txt": "retakes on Monday\n",
+}
+
+@pytest.fixture
+def takeFolder(animFolder, tmp_path):
+    takeFolder = os.path.join(str(tmp_path), "animations")
+    shutil.copytree(animFolder, takeFolder)
+    for fileName, text in BROKEN_TAKES.items():
+        with open(os.path.join(takeFolder, fileName), "w") as output:
+            output.write(text)
+    # the pipeline's own files are never validated
+    for fileName in ("animLibrary.sqlite", "AAA_0010_tk01.maindex", validateTakes.REPORT_FILE_NAME):
+        open(os.path.join(takeFolder, fileName), "w").close()
+    return takeFolder
+
+@pytest.fixture
+def rigPath(animFolder):
+    # a take has the same skeleton as the rig it is baked onto; from
+    # AAA_0020 on the takes also carry the Prop1 joint
+    return os.path.join(animFolder, "AAA_0020_tk01.ma")
+
+def test_bundledTakesAreValid(animFolder, rigPath):
+    report = validateTakes.validateTakes(validateTakes.getValidationFiles(animFolder), rigPath, processes=2)
+    assert (report["jointsChecked"], report["rigJointSource"]) == (True, rigPath)
+    assert report["expectedFps"] == 120
+    assert report["errors"] == 0
+    assert [result["name"] for result in report["takes"]] == sorted(os.listdir(animFolder))
+    for result in report["takes"]:
+        assert result["errors"] == []
+        assert result["unmatchedAnim"] == []
+
+def test_brokenTakesAreReported(takeFolder, rigPath):
+    report = validateTakes.validateFolder(takeFolder, rigPath, processes=1)
+    results = dict((result["name"], result) for result in report["takes"])
+    assert sorted(results) == sorted(os.listdir(os.path.dirname(rigPath)) + list(BROKEN_TAKES))
+    assert (report["ok"], report["warnings"], report["errors"]) == (9, 1, 4)
+
+    assert results["AAA_0110_tk01.ma"]["errors"] == ["Hips_rotateX has keys out of order at frame 1",
+                                                     "Hips_rotateY has NaN or infinite keys"]
+    assert results["AAA_0120_tk01.ma"]["status"] == "warning"
+    assert results["AAA_0120_tk01.ma"]["warnings"] == [
+        "Hips_translateX jumps 499 per frame at frame 2 (1 jumps over 50)", "24 fps, expected 120"]
+    assert results["AAA_0130_tk01.ma"]["errors"] == ["none of the take's joints are on the rig"]
+    assert results["AAA_0140_tk01.ma"]["errors"] == ["no joints", "no keys"]
+    assert results["notes.txt"]["errors"][0].startswith("not an animation file")
+
+    # the report is written next to the takes and lists the takes a batch should leave out
+    with open(os.path.join(takeFolder, validateTakes.REPORT_FILE_NAME), "r") as input:
+        assert json.load(input)["errors"] == 4
+    assert sorted(os.path.basename(path) for path in validateTakes.getInvalidTakes(report)) == \
+        ["AAA_0110_tk01.ma", "AAA_0130_tk01.ma", "AAA_0140_tk01.ma", "notes.txt"]
+
+def test_missingJointsAndRigJointSources(animFolder, tmp_path, monkeypatch):
+    animPath = os.path.join(animFolder, "AAA_0010_tk01.ma")
+    rigJoints, _ = validateTakes.getRigJoints(animPath)
+    rigJointsPath = os.path.join(str(tmp_path), "rigJoints.json")
+    with open(rigJointsPath, "w") as output:
+        json.dump([jointPath for jointPath in rigJoints if not jointPath.endswith("Head")], output)
+    report = validateTakes.validateTakes([animPath], rigJointsPath=rigJointsPath)
+    assert report["takes"][0]["warnings"] == ["joints missing from the rig: Head"]
+
+    # a binary rig needs a joint map cached by an earlier bake
+    monkeypatch.setattr(validateTakes.jointMapping, "DEFAULT_CACHE_FOLDER", str(tmp_path))
+    rigPath = os.path.join(str(tmp_path), "hero.mb")
+    open(rigPath, "wb").close()
+    report = validateTakes.validateTakes([animPath], rigPath)
+    assert report["jointsChecked"] is False
+    assert report["rigJointSource"] == "hero.mb is binary and no joint map was cached for it yet"
+    assert report["takes"][0]["status"] == "ok"
@@ -0,0 +1,125 @@
+import copy
+import os
+import re
+
+import numpy
+import pytest
+
+import readAnimCurves
+import reduceKeys
+import resampleCurves
+import writeFbxAscii
+
+OBJECT_PATTERN = re.compile(r'^\t(\w+): (\d+), "\w+::([^"]*)", "[^"]*" \{\n(.*?)^\t\}\n', re.M | re.S)
+ARRAY_PATTERN = re.compile(r"(\w+): \*\d+ \{\s*a: ([^}]*)\}")
+PROPERTY_PATTERN = re.compile(r'P: "([^"]+)", "[^"]*", "[^"]*", "[^"]*",(.*)')
+CONNECTION_PATTERN = re.compile(r'C: "O[OP]",(\d+),(\d+)(?:, "([^"]+)")?')
+
+@pytest.fixture
+def take(animFolder):
+    return readAnimCurves.readAnimTake(os.path.join(animFolder, "AAA_0010_tk01.ma"))
+
+def readFbx(filePath):
+    """
+    Reads back what writeTakeFbx writes: returns (global settings, models,
+    curves) where models is a dict of name -> properties and curves is a
+    dict of (model name, curve node name, axis) -> (frames, values).
+    """
+    with open(filePath, "r") as input:
+        text = input.read()
+    settings = dict(PROPERTY_PATTERN.findall(text.split("Definitions:")[0]))
+    objects = {}
+    for objectType, objectId, name, body in OBJECT_PATTERN.findall(text):
+        arrays = dict((arrayName, numpy.array(values.replace("\n", "").split(","), dtype=numpy.float64))
+                      for arrayName, values in ARRAY_PATTERN.findall(body))
+        objects[objectId] = (objectType, name, dict(PROPERTY_PATTERN.findall(body)), arrays)
+    parents = dict((child, (parent, propertyName)) for child, parent, propertyName
+                   in CONNECTION_PATTERN.findall(text.split("Connections:")[1]))
+
+    fps = float(settings["CustomFrameRate"])
+    models = dict((name, properties) for objectType, name, properties, _ in objects.values()
+                  if objectType == "Model")
+    curves = {}
+    for curveId, (objectType, _, _, arrays) in objects.items():
+        if objectType != "AnimationCurve":
+            continue
+        curveNodeId, axisProperty = parents[curveId]
+        modelId, _ = parents[curveNodeId]
+        key = (objects[modelId][1], objects[curveNodeId][1], axisProperty[len("d|"):])
+        frames = arrays["KeyTime"] / writeFbxAscii.FBX_TICKS_PER_SECOND * fps
+        curves[key] = (frames, arrays["KeyValueFloat"])
+    return settings, models, curves
+
+def getCurveKey(curve):
+    nodeName = dict((restName, nodeName) for restName, _, nodeName in writeFbxAscii.CHANNEL_GROUPS)
+    return curve.joint, nodeName[curve.channel[:-1]], curve.channel[-1]
+
+def parseVector(text):
+    return tuple(float(value) for value in text.split(","))
+
+def test_roundTrip(take, tmp_path):
+    outputPath = os.path.join(str(tmp_path), "AAA_0010_tk01.fbx")
+    assert writeFbxAscii.writeTakeFbx(outputPath, take, upAxis="y") == 72
+    settings, models, curves = readFbx(outputPath)
+    assert settings["TimeMode"] == "1"
+    assert (settings["UpAxis"], settings["FrontAxis"]) == ("1", "2")
+
+    # every joint plus the Reference group, and every curve read back as written
+    assert sorted(models) == sorted(list(take.joints) + ["Reference"])
+    assert len(curves) == len(take.curves)
+    for curve in take.curves:
+        frames, values = curves[getCurveKey(curve)]
+        assert numpy.allclose(frames, curve.times, rtol=0, atol=1e-6)
+        assert numpy.allclose(values, curve.values, rtol=1e-8, atol=1e-9)
+    for joint in take.joints.values():
+        assert numpy.allclose(parseVector(models[joint.name]["Lcl Translation"]), joint.translate, rtol=1e-8)
+        assert numpy.allclose(parseVector(models[joint.name]["PreRotation"]), joint.jointOrient, atol=1e-7)
+
+def test_zUpRotatesTheTopNode(take, tmp_path):
+    outputPath = os.path.join(str(tmp_path), "AAA_0010_tk01.fbx")
+    writeFbxAscii.writeTakeFbx(outputPath, take, upAxis="z")
+    settings, models, curves = readFbx(outputPath)
+    assert (settings["UpAxis"], settings["FrontAxis"], settings["FrontAxisSign"]) == ("2", "1", "-1")
+    assert numpy.allclose(parseVector(models["Reference"]["PreRotation"]), (90, 0, 0))
+    # joints below the top node keep their local animation
+    assert numpy.allclose(parseVector(models["Hips"]["PreRotation"]), take.joints["Hips"].jointOrient, atol=1e-7)
+    frames, values = curves[("Hips", "T", "Y")]
+    assert numpy.allclose(values, take.getCurve("Hips", "translateY").values, rtol=1e-8, atol=1e-9)
+
+def test_convertTranslationToZUp():
+    channels = {
+        "X": (numpy.array([0.0, 1.0]), numpy.array([1.0, 2.0])),
+        "Y": (numpy.array([0.0, 2.0]), numpy.array([10.0, 30.0])),
+        "Z": (numpy.array([0.0, 1.0, 2.0]), numpy.array([5.0, 6.0, 7.0])),
+    }
+    newChannels, newRest = writeFbxAscii.convertTranslationToZUp(channels, (1.0, 2.0, 3.0))
+    assert newRest == (1.0, -3.0, 2.0)
+    assert newChannels["X"] is channels["X"]
+    # Y and Z are keyed at different times, so both are put on frames 0, 1 and 2
+    assert list(newChannels["Y"][1]) == [-5.0, -6.0, -7.0]
+    assert list(newChannels["Z"][1]) == [10.0, 20.0, 30.0]
+
+def test_eulerMatrixRoundTrip():
+    for rotation in ((10.0, 20.0, 30.0), (-45.0, 60.0, 170.0), (0.0, -89.0, 0.0)):
+        matrix = writeFbxAscii.getEulerMatrix(rotation)
+        assert numpy.allclose(writeFbxAscii.getMatrixEuler(matrix), rotation)
+
+def test_resampledAndReducedTake(take, tmp_path):
+    # what --fps 30 --reduce-keys does before writing
+    resampleCurves.resampleTakeCurves(take, 30)
+    resampled = copy.deepcopy(take)
+    reduceKeys.reduceTakeCurves(take)
+    assert take.getKeyCount() < resampled.getKeyCount()
+
+    outputPath = os.path.join(str(tmp_path), "AAA_0010_tk01.fbx")
+    writeFbxAscii.writeTakeFbx(outputPath, take, upAxis="y")
+    settings, models, curves = readFbx(outputPath)
+    assert settings["TimeMode"] == "6"
+    for curve in resampled.curves:
+        frames, values = curves[getCurveKey(curve)]
+        # whole 30fps frames, up to the take's last key at 535 / 4
+        assert numpy.allclose(frames[:-1], numpy.round(frames[:-1]), rtol=0, atol=1e-6)
+        assert frames[-1] == pytest.approx(133.75)
+        # the linear FBX curve stays within the reduction tolerance of every resampled key
+        tolerance = reduceKeys.getTolerance(curve.curveType)
+        assert numpy.abs(numpy.interp(curve.times, frames, values) - curve.values).max() <= tolerance + 1e-6
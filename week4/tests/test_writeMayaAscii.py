@@ -0,0 +1,87 @@
+import os
+
+import numpy
+import pytest
+
+import curveSidecar
+import jointMapping
+import readAnimCurves
+import writeMayaAscii
+
+@pytest.fixture
+def take(animFolder):
+    return readAnimCurves.readAnimTake(os.path.join(animFolder, "AAA_0010_tk01.ma"))
+
+def readLines(filePath):
+    with open(filePath, "r") as input:
+        return input.read().splitlines()
+
+def assertSameCurves(written, take):
+    assert len(written.curves) == len(take.curves)
+    for writtenCurve, curve in zip(written.curves, take.curves):
+        assert (writtenCurve.name, writtenCurve.curveType, writtenCurve.joint, writtenCurve.channel) == \
+            (curve.name, curve.curveType, curve.joint, curve.channel)
+        assert numpy.array_equal(writtenCurve.times, curve.times)
+        assert numpy.array_equal(writtenCurve.values, curve.values)
+
+def test_writeRigWithTake(take, tmp_path):
+    outputPath = os.path.join(str(tmp_path), "rig_with_AAA_0010_tk01.ma")
+    assert writeMayaAscii.writeRigWithTake(outputPath, take, "C:\\rigs\\hero.ma") == 72
+
+    written = readAnimCurves.readAnimTake(outputPath)
+    assert written.timeUnit == "120fps"
+    assertSameCurves(written, take)
+    lines = readLines(outputPath)
+    assert lines[4] == 'file -rdi 1 -ns "character" -rfn "characterRN" -typ "mayaAscii" "C:/rigs/hero.ma";'
+    assert '\t\t5 4 "characterRN" "|character:Reference|character:Hips.rotateX" ' in lines
+    assert 'connectAttr "Hips_rotateX.o" "characterRN.phl[4]";' in lines
+    assert '\tsetAttr ".b" -type "string" "playbackOptions -min 0 -max 535 -ast 0 -aet 535 ";' in lines
+    assert lines[-1] == "// End of rig_with_AAA_0010_tk01.ma"
+
+def test_writeFromSidecar(take, tmp_path):
+    sidecarPath = curveSidecar.writeTakeSidecar(take, os.path.join(str(tmp_path), "AAA_0010_tk01.animcurves"))
+    outputPath = os.path.join(str(tmp_path), "rig_with_AAA_0010_tk01.ma")
+    # a sidecar has no joints, so the hierarchy comes from the take
+    writeMayaAscii.writeRigWithTake(outputPath, curveSidecar.readCurveSidecar(sidecarPath), "/rigs/hero.mb",
+                                    writeMayaAscii.getJointPaths(take))
+    assertSameCurves(readAnimCurves.readAnimTake(outputPath), take)
+    assert readLines(outputPath)[4].endswith('-typ "mayaBinary" "/rigs/hero.mb";')
+
+def test_jointsMissingFromTheRigAreSkipped(take, tmp_path):
+    jointPaths = writeMayaAscii.getJointPaths(take)
+    assert jointPaths["Spine"] == "|Reference|Hips|Spine"
+    del jointPaths["Head"]
+    outputPath = os.path.join(str(tmp_path), "rig_with_AAA_0010_tk01.ma")
+    curveCount = writeMayaAscii.writeRigWithTake(outputPath, take, "/rigs/hero.ma", jointPaths)
+    written = readAnimCurves.readAnimTake(outputPath)
+    assert curveCount == len(written.curves) == 72 - len(take.getCurvesByJoint()["Head"])
+    assert "Head" not in [curve.joint for curve in written.curves]
+
+def test_writeTakeToRigs(take, tmp_path, monkeypatch):
+    monkeypatch.setattr(jointMapping, "DEFAULT_CACHE_FOLDER", os.path.join(str(tmp_path), "jointMaps"))
+    rigFolder = os.path.join(str(tmp_path), "rigs")
+    destFolder = os.path.join(str(tmp_path), "dest")
+    os.makedirs(rigFolder)
+    os.makedirs(destFolder)
+    # an ASCII rig whose joints are named differently, and a binary rig with
+    # no cached joints, which is assumed to share the take's skeleton
+    heroPath = os.path.join(rigFolder, "hero.ma")
+    with open(heroPath, "w") as output:
+        for joint in take.joints.values():
+            parentFlag = ' -p "hero_{0}"'.format(joint.parent) if joint.parent else ""
+            output.write('createNode joint -n "hero_{0}"{1};\n'.format(joint.name, parentFlag))
+    villainPath = os.path.join(rigFolder, "villain.mb")
+    open(villainPath, "wb").close()
+
+    results = writeMayaAscii.writeTakeToRigs(take, take.filePath, [heroPath, villainPath], destFolder,
+                                             rules={"stripPrefixes": ["hero_"]})
+    heroOutput = os.path.join(destFolder, "rig_hero_with_AAA_0010_tk01.ma").replace("\\", "/")
+    villainOutput = os.path.join(destFolder, "rig_villain_with_AAA_0010_tk01.ma").replace("\\", "/")
+    assert list(results.values()) == [(heroOutput, 72), (villainOutput, 72)]
+    assert '\t\t5 4 "heroRN" "|hero:hero_Reference|hero:hero_Hips.rotateX" ' in readLines(heroOutput)
+    assert '\t\t5 4 "villainRN" "|villain:Reference|villain:Hips.rotateX" ' in readLines(villainOutput)
+    assertSameCurves(readAnimCurves.readAnimTake(heroOutput), take)
+
+    with pytest.raises(ValueError):
+        writeMayaAscii.writeTakeToRigs(take, take.filePath, [heroPath, os.path.join(str(tmp_path), "hero.ma")],
+                                       destFolder)
@@ -0,0 +1,315 @@
+'''
+Usage - checks a folder of takes against a rig before baking, without Maya
+
+python validateTakes.py ../week3/animations/ character.mb --processes 8
+python validateTakes.py ../week3/animations/ character.mb --fps 120 --report preflight.json
+
+Every file in the folder is read with the Maya-free reader in a process pool
+and checked for the things that otherwise only show up minutes into a bake:
+files that aren't takes, takes that can't be parsed or have no joints or no
+keys, frame rates that differ from the rest of the folder (or from --fps),
+anim joints the rig doesn't have, and curves with NaNs, keys out of order or
+jumps too big to be real motion. Problems that would break the bake are
+errors; the rest are warnings. The report is written as JSON (by default
+validationReport.json in the folder) and the exit code is 1 if any take has
+errors.
+
+The rig's joints come from the rig itself if it is a .ma, from a JSON list
+given with --rig-joints, or from the joint maps jointMapping cached the last
+time this rig was baked. Without any of those the joint check is skipped.
+'''
+
+import argparse
+import collections
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy
+
+import jointMapping
+
+#############
+# CONSTANTS #
+#############
+
+REPORT_FILE_NAME = "validationReport.json"
+
+# files the pipeline itself keeps next to the takes
+IGNORED_FILE_NAMES = ("animLibrary.sqlite", REPORT_FILE_NAME)
+IGNORED_EXTENSIONS = (".maindex", ".animcurves", ".sqlite-journal")
+
+# largest change per frame that still counts as motion, by channel kind
+# (centimeters, degrees and scale factor)
+JUMP_LIMITS = {
+    "translate": 50.0,
+    "rotate": 120.0,
+    "scale": 1.0,
+}
+
+# how many joint names to list in a single message
+MAX_LISTED_NAMES = 8
+
+# takes handed to each worker at a time
+CHUNK_SIZE = 8
+
+##################
+# HELPER METHODS #
+##################
+
+def getValidationFiles(animFolder):
+    """
+    Given an animation folder, returns every file in it (not only takes, so
+    stray files get reported), minus the pipeline's own index and caches.
+    """
+    filePaths = []
+    for fileName in sorted(os.listdir(animFolder)):
+        filePath = os.path.join(animFolder, fileName)
+        if fileName.startswith(".") or not os.path.isfile(filePath):
+            continue
+        if fileName in IGNORED_FILE_NAMES or fileName.endswith(IGNORED_EXTENSIONS):
+            continue
+        filePaths.append(filePath)
+    return filePaths
+
+def getJointPaths(take):
+    """
+    Given a readAnimCurves.AnimTake, returns the DAG path of every joint
+    (e.g. |Reference|Hips|Spine), including non-joint parents like Reference.
+    """
+    jointPaths = []
+    for joint in take.joints.values():
+        parts = [joint.name]
+        parent = joint.parent
+        while parent:
+            parts.append(parent)
+            parent = take.joints[parent].parent if parent in take.joints else None
+        jointPaths.append("|" + "|".join(reversed(parts)))
+    return jointPaths
+
+def getRigJoints(rigPath, rigJointsPath=None):
+    """
+    Given a rig file (and optionally a JSON file listing its joint paths),
+    returns (joint paths, where they came from), or (None, why not).
+    """
+    import readAnimCurves
+
+    if rigJointsPath:
+        with open(rigJointsPath, "r") as input:
+            return json.load(input), rigJointsPath
+    if rigPath is None:
+        return None, "no rig given"
+    if rigPath.lower().endswith(".ma"):
+        return getJointPaths(readAnimCurves.readAnimTake(rigPath)), rigPath
+    rigJoints = jointMapping.getCachedRigJoints(rigPath)
+    if rigJoints:
+        return rigJoints, "joint map cache"
+    return None, "{0} is binary and no joint map was cached for it yet".format(os.path.basename(rigPath))
+
+def formatNames(names):
+    listed = ", ".join(names[:MAX_LISTED_NAMES])
+    return listed + (" and {0} more".format(len(names) - MAX_LISTED_NAMES) if len(names) > MAX_LISTED_NAMES else "")
+
+def checkCurve(curve, jumpLimits):
+    """
+    Given an anim curve, returns (errors, warnings) about its keys: NaNs or
+    infinities, times that don't increase, and per-frame jumps above the
+    limit for its channel kind.
+    """
+    errors = []
+    warnings = []
+    if not len(curve):
+        return errors, warnings
+    if not numpy.all(numpy.isfinite(curve.times)) or not numpy.all(numpy.isfinite(curve.values)):
+        errors.append("{0} has NaN or infinite keys".format(curve.name))
+        return errors, warnings
+    frameSteps = numpy.diff(curve.times)
+    if numpy.any(frameSteps <= 0):
+        errors.append("{0} has keys out of order at frame {1:g}".format(
+            curve.name, curve.times[1:][frameSteps <= 0][0]))
+        return errors, warnings
+    if curve.joint is None:
+        warnings.append("{0} doesn't drive a joint".format(curve.name))
+    channelKind = next((kind for kind in jumpLimits if (curve.channel or "").startswith(kind)), None)
+    if channelKind is not None and len(curve) > 2:
+        # spread each jump over the frames between its keys; the jump off the
+        # first key is skipped, mocap takes start from the bind pose
+        perFrame = numpy.abs(numpy.diff(curve.values[1:])) / numpy.maximum(frameSteps[1:], 1.0)
+        jumps = numpy.flatnonzero(perFrame > jumpLimits[channelKind])
+        if len(jumps):
+            warnings.append("{0} jumps {1:g} per frame at frame {2:g} ({3} jumps over {4:g})".format(
+                curve.name, perFrame[jumps[0]], curve.times[jumps[0] + 2], len(jumps), jumpLimits[channelKind]))
+    return errors, warnings
+
+##########
+# WORKER #
+##########
+
+def validateTake(arguments):
+    """
+    Given (take path, rig joint paths or None, mapping rules, jump limits),
+    returns the take's result dict: status ("ok", "warning" or "error"),
+    errors, warnings and what was read (fps, frame range, counts). Never
+    raises; a take that can't be read is an error.
+    """
+    import batchApplyAnim
+    import readAnimCurves
+
+    animPath, rigJoints, rules, jumpLimits = arguments
+    result = {"path": animPath, "name": os.path.basename(animPath), "errors": [], "warnings": [],
+              "fps": None, "firstKey": None, "lastKey": None, "jointCount": 0, "curveCount": 0, "keyCount": 0}
+    errors = result["errors"]
+    warnings = result["warnings"]
+    extension = os.path.splitext(animPath)[1].lower()
+    try:
+        if extension not in batchApplyAnim.ANIMATION_EXTENSIONS:
+            errors.append("not an animation file (a plain folder listing would still try to reference it)")
+        elif extension != ".ma":
+            warnings.append("binary take, can't be checked without Maya")
+        else:
+            take = readAnimCurves.readAnimTake(animPath)
+            frameRange = take.getFrameRange()
+            result.update({"fps": take.fps, "jointCount": len(take.joints), "curveCount": len(take.curves),
+                           "keyCount": take.getKeyCount()})
+            if not take.joints:
+                errors.append("no joints")
+            if frameRange is None:
+                errors.append("no keys")
+            else:
+                result["firstKey"], result["lastKey"] = frameRange
+                if frameRange[0] == frameRange[1]:
+                    warnings.append("only keyed on frame {0:g}".format(frameRange[0]))
+            for curve in take.curves:
+                curveErrors, curveWarnings = checkCurve(curve, jumpLimits)
+                errors.extend(curveErrors)
+                warnings.extend(curveWarnings)
+            if take.joints and rigJoints is not None:
+                checkJoints(take, rigJoints, rules, result)
+    except Exception as error:
+        errors.append("can't be read: {0}: {1}".format(type(error).__name__, error))
+    result["status"] = "error" if errors else "warning" if warnings else "ok"
+    return result
+
+def checkJoints(take, rigJoints, rules, result):
+    """
+    Given a take, the rig's joint paths, mapping rules and the take's result
+    dict, adds errors for a take that can't drive the rig at all (no joint
+    or not its root matched) and warnings for anim joints the rig lacks.
+    """
+    animJoints = getJointPaths(take)
+    resolved = jointMapping.resolveJointMap(animJoints, rigJoints, rules)
+    result["unmatchedAnim"] = resolved["unmatchedAnim"]
+    result["unmatchedRig"] = resolved["unmatchedRig"]
+    if not resolved["map"]:
+        result["errors"].append("none of the take's joints are on the rig")
+        return
+    rootJoint = min(animJoints, key=lambda jointPath: jointPath.count("|"))
+    if rootJoint in resolved["unmatchedAnim"]:
+        result["errors"].append("root joint {0} isn't on the rig".format(rootJoint.split("|")[-1]))
+    elif resolved["unmatchedAnim"]:
+        result["warnings"].append("joints missing from the rig: {0}".format(
+            formatNames([jointPath.split("|")[-1] for jointPath in resolved["unmatchedAnim"]])))
+
+##############
+# VALIDATION #
+##############
+
+def validateTakes(animationFiles, rigPath=None, expectedFps=None, rigJointsPath=None, rules=None,
+                  jumpLimits=None, processes=None):
+    """
+    Given a list of files, a rig and optionally the frame rate every take
+    should have (by default the most common one), validates every file in a
+    pool of processes and returns the report dict: rig, where its joints
+    came from, expected fps, one result per take in file order, and counts.
+    """
+    startTime = time.time()
+    rigJoints, rigJointSource = getRigJoints(rigPath, rigJointsPath)
+    arguments = [(animPath, rigJoints, rules, jumpLimits or JUMP_LIMITS) for animPath in animationFiles]
+    if len(arguments) > 1 and processes != 1:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = list(pool.imap_unordered(validateTake, arguments, CHUNK_SIZE))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [validateTake(argument) for argument in arguments]
+    order = dict((animPath, index) for index, animPath in enumerate(animationFiles))
+    results.sort(key=lambda result: order[result["path"]])
+
+    # the frame rate check needs every take, so it runs here
+    fpsCounts = collections.Counter(result["fps"] for result in results if result["firstKey"] is not None)
+    if expectedFps is None and fpsCounts:
+        expectedFps = fpsCounts.most_common(1)[0][0]
+    for result in results:
+        if result["firstKey"] is not None and expectedFps and result["fps"] != expectedFps:
+            result["warnings"].append("{0:g} fps, expected {1:g}".format(result["fps"], expectedFps))
+            if result["status"] == "ok":
+                result["status"] = "warning"
+
+    statuses = [result["status"] for result in results]
+    return {
+        "rig": rigPath,
+        "rigJointSource": rigJointSource,
+        "jointsChecked": rigJoints is not None,
+        "expectedFps": expectedFps,
+        "takes": results,
+        "ok": statuses.count("ok"),
+        "warnings": statuses.count("warning"),
+        "errors": statuses.count("error"),
+        "seconds": time.time() - startTime,
+    }
+
+def validateFolder(animFolder, rigPath=None, reportPath=None, **validateOptions):
+    """
+    Given an animation folder and a rig, validates every file in the folder,
+    writes the report (by default to validationReport.json in the folder)
+    and returns it.
+    """
+    report = validateTakes(getValidationFiles(animFolder), rigPath, **validateOptions)
+    writeReport(reportPath or os.path.join(animFolder, REPORT_FILE_NAME), report)
+    return report
+
+def writeReport(reportPath, report):
+    with open(reportPath, "w") as output:
+        json.dump(report, output, indent=2, sort_keys=True)
+
+def getInvalidTakes(report):
+    """
+    Given a report, returns the set of paths of every take with errors.
+    """
+    return set(result["path"] for result in report["takes"] if result["status"] == "error")
+
+##########
+# SCRIPT #
+##########
+
+def main():
+    parser = argparse.ArgumentParser(description="Check a folder of takes against a rig without Maya.")
+    parser.add_argument("animFolder")
+    parser.add_argument("rigPath", nargs="?")
+    parser.add_argument("--rig-joints", help="JSON list of the rig's joint paths (for binary rigs)")
+    parser.add_argument("--fps", type=float, default=None, help="frame rate every take should have")
+    parser.add_argument("--report", help="report file (default: {0} in the folder)".format(REPORT_FILE_NAME))
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--quiet", action="store_true", help="only print takes with errors")
+    args = parser.parse_args()
+
+    report = validateFolder(args.animFolder, args.rigPath, args.report, expectedFps=args.fps,
+                            rigJointsPath=args.rig_joints, processes=args.processes)
+    if not report["jointsChecked"]:
+        print("Joint check skipped: {0}".format(report["rigJointSource"]))
+    for result in report["takes"]:
+        if result["status"] == "ok" or (args.quiet and result["status"] != "error"):
+            continue
+        print("{0:8} {1}".format(result["status"], result["name"]))
+        for message in result["errors"] + result["warnings"]:
+            print("         {0}".format(message))
+    print("{0} ok, {1} with warnings, {2} with errors ({3:g} fps expected) in {4:.2f}s".format(
+        report["ok"], report["warnings"], report["errors"], report["expectedFps"] or 0, report["seconds"]))
+    sys.exit(1 if report["errors"] else 0)
+
+if __name__ == "__main__":
+    main()
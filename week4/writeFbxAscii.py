@@ -0,0 +1,404 @@
+'''
+Usage - writes skeleton animation FBX files without Maya or the FBX plugin
+
+python writeFbxAscii.py <take .ma files...> <destination folder> [--up-axis z] [--fps 30] [--reduce-keys]
+
+Writes an ASCII FBX 7.4 file per take with the joint hierarchy (rest pose,
+joint orients as pre-rotations) and one linear animation curve per animated
+translate, rotate or scale channel, like exportAnimation.export_anim does
+through the plugin. Y up scenes are converted to Z up by rotating the top
+level nodes 90 degrees about X, and the frame rate comes from the take's
+currentUnit (or --fps, which resamples the take first, see resampleCurves).
+With --reduce-keys, keys that linear interpolation recreates within the
+default tolerances are left out (see reduceKeys).
+Curves are streamed out one at a time; only object ids and connections are
+kept in memory. Rotate orders other than xyz are not supported.
+'''
+
+import argparse
+import math
+import os
+import time
+
+import numpy
+
+import readAnimCurves
+import reduceKeys
+import resampleCurves
+
+#############
+# CONSTANTS #
+#############
+
+FBX_VERSION = 7400
+
+# FBX time is counted in ticks of 1/46186158000 of a second
+FBX_TICKS_PER_SECOND = 46186158000
+
+# GlobalSettings TimeMode for the frame rates FBX has a name for; anything
+# else is written as custom (14) with CustomFrameRate
+FBX_TIME_MODES = {
+    120.0: 1,
+    100.0: 2,
+    60.0: 3,
+    50.0: 4,
+    48.0: 5,
+    30.0: 6,
+    25.0: 10,
+    24.0: 11,
+    1000.0: 12,
+    96.0: 15,
+    72.0: 16,
+}
+FBX_CUSTOM_TIME_MODE = 14
+
+# linear interpolation, auto tangents (the flags Maya and Blender write for
+# linear keys), with the matching default attribute data
+KEY_ATTR_FLAGS = 24836
+KEY_ATTR_DATA = "0,0,218434821,0"
+
+# FBX property and curve node name for each kind of channel
+CHANNEL_GROUPS = (
+    ("translate", "Lcl Translation", "T"),
+    ("rotate", "Lcl Rotation", "R"),
+    ("scale", "Lcl Scaling", "S"),
+)
+
+# values written on each line of a key array
+VALUES_PER_LINE = 16
+
+##################
+# HELPER METHODS #
+##################
+
+def formatNumber(value):
+    """
+    Given a number, returns it as written in FBX arrays (no trailing .0).
+    """
+    # adding 0.0 turns -0.0 into 0.0
+    return "{0:.9g}".format(value + 0.0)
+
+def getFbxTime(frame, fps):
+    """
+    Given a frame and the frames per second, returns the time in FBX ticks.
+    """
+    return int(round(frame / fps * FBX_TICKS_PER_SECOND))
+
+def getEulerMatrix(rotation):
+    """
+    Given (x, y, z) rotation in degrees with xyz rotate order, returns the
+    3x3 rotation matrix (x applied first).
+    """
+    x, y, z = [math.radians(angle) for angle in rotation]
+    rotateX = numpy.array([[1, 0, 0], [0, math.cos(x), -math.sin(x)], [0, math.sin(x), math.cos(x)]])
+    rotateY = numpy.array([[math.cos(y), 0, math.sin(y)], [0, 1, 0], [-math.sin(y), 0, math.cos(y)]])
+    rotateZ = numpy.array([[math.cos(z), -math.sin(z), 0], [math.sin(z), math.cos(z), 0], [0, 0, 1]])
+    return rotateZ.dot(rotateY).dot(rotateX)
+
+def getMatrixEuler(matrix):
+    """
+    Given a 3x3 rotation matrix, returns its (x, y, z) rotation in degrees
+    for the xyz rotate order.
+    """
+    y = math.asin(max(-1.0, min(1.0, -matrix[2][0])))
+    if abs(matrix[2][0]) < 0.9999999:
+        x = math.atan2(matrix[2][1], matrix[2][2])
+        z = math.atan2(matrix[1][0], matrix[0][0])
+    else:
+        # gimbal lock: put all of the remaining rotation on x
+        x = math.atan2(-matrix[1][2], matrix[1][1])
+        z = 0.0
+    return tuple(math.degrees(angle) for angle in (x, y, z))
+
+def getNodes(take):
+    """
+    Given an AnimTake, returns an ordered list of (name, parent, joint) for
+    every node to write: each joint, plus any non-joint parent (e.g. the
+    Reference group) as a node with joint None, parents before children.
+    """
+    nodes = []
+    written = set()
+    for joint in take.joints.values():
+        if joint.parent is not None and joint.parent not in take.joints and joint.parent not in written:
+            nodes.append((joint.parent, None, None))
+            written.add(joint.parent)
+        nodes.append((joint.name, joint.parent, joint))
+        written.add(joint.name)
+    return nodes
+
+def getRestValues(joint):
+    """
+    Given a readAnimCurves Joint (or None for a plain group), returns a dict
+    of translate/rotate/scale/jointOrient -> (x, y, z).
+    """
+    if joint is None:
+        return {"translate": (0.0, 0.0, 0.0), "rotate": (0.0, 0.0, 0.0),
+                "scale": (1.0, 1.0, 1.0), "jointOrient": (0.0, 0.0, 0.0)}
+    return {"translate": joint.translate, "rotate": joint.rotate,
+            "scale": joint.scale, "jointOrient": joint.jointOrient}
+
+def convertTranslationToZUp(channels, rest):
+    """
+    Given a dict of axis -> (times, values) for a top level node's animated
+    translation and its rest translation, returns both rotated 90 degrees
+    about X ((x, y, z) -> (x, -z, y)). Y and Z are resampled onto the union
+    of their key times if they are keyed at different times.
+    """
+    newRest = (rest[0], -rest[2], rest[1])
+    newChannels = {}
+    if "X" in channels:
+        newChannels["X"] = channels["X"]
+    if "Y" in channels and "Z" in channels:
+        timesY, valuesY = channels["Y"]
+        timesZ, valuesZ = channels["Z"]
+        if len(timesY) != len(timesZ) or not numpy.array_equal(timesY, timesZ):
+            times = numpy.union1d(timesY, timesZ)
+            valuesY = numpy.interp(times, timesY, valuesY)
+            valuesZ = numpy.interp(times, timesZ, valuesZ)
+            timesY = timesZ = times
+        newChannels["Y"] = (timesZ, -valuesZ)
+        newChannels["Z"] = (timesY, valuesY)
+    elif "Z" in channels:
+        newChannels["Y"] = (channels["Z"][0], -channels["Z"][1])
+    elif "Y" in channels:
+        newChannels["Z"] = channels["Y"]
+    return newChannels, newRest
+
+###########
+# CLASSES #
+###########
+
+class FbxAsciiWriter(object):
+    """
+    Writes an ASCII FBX skeleton animation file section by section. Object
+    ids are handed out as objects are written and connections are collected
+    for the Connections section at the end.
+    """
+
+    def __init__(self, output, fps, takeName):
+        self.output = output
+        self.fps = fps
+        self.takeName = takeName
+        self.nextId = 1000000
+        self.connections = []
+
+    def write(self, text):
+        self.output.write(text)
+
+    def getId(self):
+        self.nextId += 1
+        return self.nextId
+
+    def connect(self, childId, parentId, propertyName=None):
+        self.connections.append((childId, parentId, propertyName))
+
+    def writeHeader(self, upAxis, timeSpan):
+        timeMode = FBX_TIME_MODES.get(self.fps, FBX_CUSTOM_TIME_MODE)
+        now = time.localtime()
+        self.write("; FBX 7.4.0 project file\n; Written by writeFbxAscii.py\n\n")
+        self.write("FBXHeaderExtension:  {{\n\tFBXHeaderVersion: 1003\n\tFBXVersion: {0}\n".format(FBX_VERSION))
+        self.write("\tCreationTimeStamp:  {{\n\t\tVersion: 1000\n\t\tYear: {0}\n\t\tMonth: {1}\n\t\tDay: {2}\n"
+                   "\t\tHour: {3}\n\t\tMinute: {4}\n\t\tSecond: {5}\n\t\tMillisecond: 0\n\t}}\n".format(*now[:6]))
+        self.write('\tCreator: "writeFbxAscii.py"\n}\n')
+        upAxisIndex, frontAxisIndex, frontAxisSign = (2, 1, -1) if upAxis == "z" else (1, 2, 1)
+        self.write("GlobalSettings:  {\n\tVersion: 1000\n\tProperties70:  {\n")
+        for name, value in (("UpAxis", upAxisIndex), ("UpAxisSign", 1), ("FrontAxis", frontAxisIndex),
+                            ("FrontAxisSign", frontAxisSign), ("CoordAxis", 0), ("CoordAxisSign", 1),
+                            ("OriginalUpAxis", 1), ("OriginalUpAxisSign", 1)):
+            self.write('\t\tP: "{0}", "int", "Integer", "",{1}\n'.format(name, value))
+        self.write('\t\tP: "UnitScaleFactor", "double", "Number", "",1\n')
+        self.write('\t\tP: "OriginalUnitScaleFactor", "double", "Number", "",1\n')
+        self.write('\t\tP: "TimeMode", "enum", "", "",{0}\n'.format(timeMode))
+        self.write('\t\tP: "TimeSpanStart", "KTime", "Time", "",{0}\n'.format(timeSpan[0]))
+        self.write('\t\tP: "TimeSpanStop", "KTime", "Time", "",{0}\n'.format(timeSpan[1]))
+        self.write('\t\tP: "CustomFrameRate", "double", "Number", "",{0}\n'.format(formatNumber(self.fps)))
+        self.write("\t}\n}\n")
+
+    def writeDefinitions(self, counts):
+        self.write("Definitions:  {{\n\tVersion: 100\n\tCount: {0}\n".format(sum(counts.values()) + 1))
+        self.write('\tObjectType: "GlobalSettings" {\n\t\tCount: 1\n\t}\n')
+        for objectType in ("Model", "NodeAttribute", "AnimationStack", "AnimationLayer",
+                           "AnimationCurveNode", "AnimationCurve"):
+            self.write('\tObjectType: "{0}" {{\n\t\tCount: {1}\n\t}}\n'.format(objectType, counts[objectType]))
+        self.write("}\nObjects:  {\n")
+
+    def writeNode(self, name, parentId, rest, preRotation, isJoint):
+        """
+        Writes a Model and its NodeAttribute and returns the model's id.
+        """
+        attributeId = self.getId()
+        modelId = self.getId()
+        modelType = "LimbNode" if isJoint else "Null"
+        self.write('\tNodeAttribute: {0}, "NodeAttribute::{1}", "{2}" {{\n'.format(attributeId, name, modelType))
+        self.write('\t\tTypeFlags: "{0}"\n\t}}\n'.format("Skeleton" if isJoint else "Null"))
+        self.write('\tModel: {0}, "Model::{1}", "{2}" {{\n\t\tVersion: 232\n\t\tProperties70:  {{\n'.format(
+            modelId, name, modelType))
+        self.write('\t\t\tP: "RotationActive", "bool", "", "",1\n')
+        self.write('\t\t\tP: "InheritType", "enum", "", "",1\n')
+        self.write('\t\t\tP: "PreRotation", "Vector3D", "Vector", "",{0}\n'.format(
+            ",".join(formatNumber(value) for value in preRotation)))
+        self.write('\t\t\tP: "DefaultAttributeIndex", "int", "Integer", "",0\n')
+        for restName, propertyName, _ in CHANNEL_GROUPS:
+            self.write('\t\t\tP: "{0}", "{0}", "", "A",{1}\n'.format(
+                propertyName, ",".join(formatNumber(value) for value in rest[restName])))
+        self.write('\t\t}\n\t\tShading: Y\n\t\tCulling: "CullingOff"\n\t}\n')
+        self.connect(attributeId, modelId)
+        self.connect(modelId, parentId)
+        return modelId
+
+    def writeAnimationStack(self, timeSpan):
+        """
+        Writes the take's animation stack and base layer and returns the
+        layer's id.
+        """
+        stackId = self.getId()
+        layerId = self.getId()
+        self.write('\tAnimationStack: {0}, "AnimStack::{1}", "" {{\n\t\tProperties70:  {{\n'.format(
+            stackId, self.takeName))
+        for name in ("LocalStart", "ReferenceStart"):
+            self.write('\t\t\tP: "{0}", "KTime", "Time", "",{1}\n'.format(name, timeSpan[0]))
+        for name in ("LocalStop", "ReferenceStop"):
+            self.write('\t\t\tP: "{0}", "KTime", "Time", "",{1}\n'.format(name, timeSpan[1]))
+        self.write("\t\t}\n\t}\n")
+        self.write('\tAnimationLayer: {0}, "AnimLayer::BaseLayer", "" {{\n\t}}\n'.format(layerId))
+        self.connect(layerId, stackId)
+        return layerId
+
+    def writeCurveNode(self, modelId, layerId, propertyName, nodeName, channels, rest):
+        """
+        Given a model, the layer, the property and curve node names, a dict
+        of axis -> (times, values) for the animated axes and the rest value,
+        writes the curve node and one curve per animated axis.
+        """
+        curveNodeId = self.getId()
+        self.write('\tAnimationCurveNode: {0}, "AnimCurveNode::{1}", "" {{\n\t\tProperties70:  {{\n'.format(
+            curveNodeId, nodeName))
+        for axisIndex, axis in enumerate("XYZ"):
+            self.write('\t\t\tP: "d|{0}", "Number", "", "A",{1}\n'.format(axis, formatNumber(rest[axisIndex])))
+        self.write("\t\t}\n\t}\n")
+        self.connect(curveNodeId, layerId)
+        self.connect(curveNodeId, modelId, propertyName)
+        for axisIndex, axis in enumerate("XYZ"):
+            if axis in channels:
+                times, values = channels[axis]
+                curveId = self.writeCurve(times, values, rest[axisIndex])
+                self.connect(curveId, curveNodeId, "d|{0}".format(axis))
+
+    def writeCurve(self, times, values, default):
+        curveId = self.getId()
+        keyCount = len(times)
+        self.write('\tAnimationCurve: {0}, "AnimCurve::", "" {{\n\t\tDefault: {1}\n\t\tKeyVer: 4009\n'.format(
+            curveId, formatNumber(default)))
+        self.writeArray("KeyTime", [getFbxTime(frame, self.fps) for frame in times], str)
+        self.writeArray("KeyValueFloat", values, formatNumber)
+        self.write("\t\tKeyAttrFlags: *1 {{\n\t\t\ta: {0}\n\t\t}}\n".format(KEY_ATTR_FLAGS))
+        self.write("\t\tKeyAttrDataFloat: *4 {{\n\t\t\ta: {0}\n\t\t}}\n".format(KEY_ATTR_DATA))
+        self.write("\t\tKeyAttrRefCount: *1 {{\n\t\t\ta: {0}\n\t\t}}\n\t}}\n".format(keyCount))
+        return curveId
+
+    def writeArray(self, name, values, formatValue):
+        self.write("\t\t{0}: *{1} {{\n\t\t\ta: ".format(name, len(values)))
+        for start in range(0, len(values), VALUES_PER_LINE):
+            if start:
+                self.write(",\n\t\t\t")
+            self.write(",".join(formatValue(value) for value in values[start:start + VALUES_PER_LINE]))
+        self.write("\n\t\t}\n")
+
+    def writeFooter(self, timeSpan):
+        self.write("}\nConnections:  {\n")
+        for childId, parentId, propertyName in self.connections:
+            if propertyName is None:
+                self.write('\tC: "OO",{0},{1}\n'.format(childId, parentId))
+            else:
+                self.write('\tC: "OP",{0},{1}, "{2}"\n'.format(childId, parentId, propertyName))
+        self.write("}}\nTakes:  {{\n\tCurrent: \"{0}\"\n\tTake: \"{0}\" {{\n".format(self.takeName))
+        self.write('\t\tFileName: "{0}.tak"\n'.format(self.takeName))
+        self.write("\t\tLocalTime: {0},{1}\n\t\tReferenceTime: {0},{1}\n\t}}\n}}\n".format(*timeSpan))
+
+#################
+# WRITING TAKES #
+#################
+
+def writeTakeFbx(outputPath, take, upAxis="z"):
+    """
+    Given an output path and an AnimTake (see readAnimCurves), writes the
+    take's skeleton and animation as an ASCII FBX. With upAxis "z" the Y up
+    scene is turned Z up. Returns the number of curves written.
+    """
+    curvesByJoint = take.getCurvesByJoint()
+    nodes = getNodes(take)
+    frameRange = take.getFrameRange() or (0.0, 0.0)
+    timeSpan = (getFbxTime(frameRange[0], take.fps), getFbxTime(frameRange[1], take.fps))
+    zUpRotation = getEulerMatrix((90.0, 0.0, 0.0)) if upAxis == "z" else numpy.identity(3)
+
+    # count everything up front for the Definitions section
+    counts = {"Model": len(nodes), "NodeAttribute": len(nodes), "AnimationStack": 1,
+              "AnimationLayer": 1, "AnimationCurveNode": 0, "AnimationCurve": 0}
+    for name, parent, joint in nodes:
+        channels = curvesByJoint.get(name, {})
+        for restName, _, _ in CHANNEL_GROUPS:
+            axes = [axis for axis in "XYZ" if restName + axis in channels]
+            if axes:
+                counts["AnimationCurveNode"] += 1
+                # the Z up swap keeps the number of curves the same
+                counts["AnimationCurve"] += len(axes)
+
+    takeName = os.path.splitext(os.path.basename(take.filePath))[0]
+    curveCount = 0
+    with open(outputPath, "w") as output:
+        writer = FbxAsciiWriter(output, take.fps, takeName)
+        writer.writeHeader(upAxis, timeSpan)
+        writer.writeDefinitions(counts)
+        modelIds = {}
+        for name, parent, joint in nodes:
+            rest = getRestValues(joint)
+            orient = getEulerMatrix(rest["jointOrient"])
+            if parent is None:
+                orient = zUpRotation.dot(orient)
+            modelIds[name] = writer.writeNode(name, modelIds.get(parent, 0), rest, getMatrixEuler(orient),
+                                              joint is not None)
+        layerId = writer.writeAnimationStack(timeSpan)
+        for name, parent, joint in nodes:
+            rest = getRestValues(joint)
+            jointCurves = curvesByJoint.get(name, {})
+            for restName, propertyName, nodeName in CHANNEL_GROUPS:
+                channels = dict((axis, (jointCurves[restName + axis].times, jointCurves[restName + axis].values))
+                                for axis in "XYZ" if restName + axis in jointCurves)
+                if not channels:
+                    continue
+                restValue = rest[restName]
+                if parent is None and restName == "translate" and upAxis == "z":
+                    channels, restValue = convertTranslationToZUp(channels, restValue)
+                writer.writeCurveNode(modelIds[name], layerId, propertyName, nodeName, channels, restValue)
+                curveCount += len(channels)
+        writer.writeFooter(timeSpan)
+    return curveCount
+
+##########
+# SCRIPT #
+##########
+
+def main():
+    parser = argparse.ArgumentParser(description="Write skeleton animation FBX files without Maya.")
+    parser.add_argument("takePaths", nargs="+")
+    parser.add_argument("destFolder")
+    parser.add_argument("--up-axis", choices=("y", "z"), default="z")
+    parser.add_argument("--fps", type=float, default=None, help="resample the take to this frame rate")
+    parser.add_argument("--reduce-keys", action="store_true", help="remove redundant keys before writing")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.destFolder):
+        os.makedirs(args.destFolder)
+    for takePath in args.takePaths:
+        take = readAnimCurves.readAnimTake(takePath)
+        if args.fps:
+            resampleCurves.resampleTakeCurves(take, args.fps)
+        if args.reduce_keys:
+            # the FBX curves are linear, so the reduction's error bound holds
+            print(reduceKeys.formatReport(reduceKeys.reduceTakeCurves(take)))
+        outputPath = os.path.join(args.destFolder, os.path.splitext(os.path.basename(takePath))[0] + ".fbx")
+        curveCount = writeTakeFbx(outputPath, take, args.up_axis)
+        print("{0}: {1} joints, {2} curves".format(outputPath, len(take.joints), curveCount))
+
+if __name__ == "__main__":
+    main()
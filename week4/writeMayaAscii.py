@@ -0,0 +1,279 @@
+'''
+Usage - writes rig_with_<take>.ma files without Maya
+
+python writeMayaAscii.py <take .ma or .animcurves> <destination folder> <rig file> [--skeleton <take .ma>]
+python writeMayaAscii.py <take .ma> <destination folder> hero.mb --rig villain.ma --rig sidekick.mb
+
+The output references the rig under the "character" namespace and drives its
+joints with the take's anim curves, the same way applyAnimWithBatching saves
+a bake. Keys are streamed to the file a chunk at a time, so reading the
+curves from a curve sidecar (see curveSidecar) keeps memory use flat no
+matter how long the take is. With extra rigs given by --rig, each take is read once and
+written for every rig as rig_<rig>_with_<take>.ma, referenced under the
+rig's file name the way applyAnimWithBatching's matrix mode saves them.
+'''
+
+import argparse
+from collections import OrderedDict
+import os
+import time
+
+import batchManifest
+import readAnimCurves
+
+#############
+# CONSTANTS #
+#############
+
+MAYA_VERSION = "2020"
+
+# file types Maya writes in file -typ for each rig extension
+REFERENCE_FILE_TYPES = {
+    ".ma": "mayaAscii",
+    ".mb": "mayaBinary",
+}
+
+# Maya's default tangent type for new keys, as saved by the bakes
+DEFAULT_TANGENT_TYPE = 18
+
+# key time/value pairs written on each line of a .ktv block
+KEYS_PER_LINE = 8
+
+##################
+# HELPER METHODS #
+##################
+
+def formatNumber(value):
+    """
+    Given a number, returns it the way Maya writes doubles in .ma files
+    (up to 17 significant digits, no trailing .0).
+    """
+    return "{0:.17g}".format(value)
+
+def quoteString(text):
+    """
+    Given a string, returns it as a quoted MEL string literal.
+    """
+    return '"{0}"'.format(text.replace("\\", "\\\\").replace('"', '\\"'))
+
+def getReferenceFileType(rigPath):
+    """
+    Given the path of a rig file, returns the file type Maya records for it.
+    """
+    extension = os.path.splitext(rigPath)[1].lower()
+    if extension not in REFERENCE_FILE_TYPES:
+        raise ValueError("Not a Maya file: {0}".format(rigPath))
+    return REFERENCE_FILE_TYPES[extension]
+
+def getJointPaths(take):
+    """
+    Given an AnimTake, returns a dict of joint name -> namespace-free DAG
+    path (e.g. Hips -> |Reference|Hips), following each joint's parents.
+    """
+    jointPaths = {}
+    for jointName in take.joints:
+        parts = [jointName]
+        parent = take.joints[jointName].parent
+        while parent is not None:
+            parts.append(parent)
+            parent = take.joints[parent].parent if parent in take.joints else None
+        jointPaths[jointName] = "|" + "|".join(reversed(parts))
+    return jointPaths
+
+def addNamespace(dagPath, ns):
+    """
+    Given a namespace-free DAG path and a namespace, returns the path with
+    the namespace added to every part.
+    """
+    return "|".join("{0}:{1}".format(ns, part) if part else part for part in dagPath.split("|"))
+
+def getPlaybackRangeScript(playbackRange):
+    """
+    Given a (start, end) frame range, returns the sceneConfigurationScriptNode
+    block Maya saves to restore the playback range when the file is opened.
+    """
+    start, end = playbackRange
+    return ('createNode script -n "sceneConfigurationScriptNode";\n'
+            '\tsetAttr ".b" -type "string" "playbackOptions -min {0} -max {1} -ast {0} -aet {1} ";\n'
+            '\tsetAttr ".st" 6;\n').format(formatNumber(start), formatNumber(end))
+
+###########
+# CLASSES #
+###########
+
+class MayaAsciiWriter(object):
+    """
+    Writes a Maya ASCII scene that references a rig and drives it with anim
+    curves, one statement at a time. Call writeHeader, then writeAnimCurve
+    for each curve, then writeFooter. Only the plug each curve drives is
+    remembered between calls; keys are never held by the writer.
+    """
+
+    def __init__(self, output, fileName, rigPath, timeUnit="film", rigNs="character"):
+        self.output = output
+        self.fileName = fileName
+        self.rigPath = rigPath.replace("\\", "/")
+        self.timeUnit = timeUnit
+        self.rigNs = rigNs
+        self.refNode = "{0}RN".format(rigNs)
+        self.curveNames = set()
+        self.connections = []
+
+    def write(self, text):
+        self.output.write(text)
+
+    def writeHeader(self):
+        """
+        Writes the file header, the rig reference, units and file info.
+        """
+        referenceFlags = "-ns {0} -rfn {1} -typ {2} {3}".format(
+            quoteString(self.rigNs), quoteString(self.refNode),
+            quoteString(getReferenceFileType(self.rigPath)), quoteString(self.rigPath))
+        self.write("//Maya ASCII {0} scene\n".format(MAYA_VERSION))
+        self.write("//Name: {0}\n".format(self.fileName))
+        self.write("//Last modified: {0}\n".format(time.strftime("%a, %b %d, %Y %I:%M:%S %p")))
+        self.write("//Codeset: UTF-8\n")
+        self.write("file -rdi 1 {0};\n".format(referenceFlags))
+        self.write("file -r -dr 1 {0};\n".format(referenceFlags))
+        self.write('requires maya "{0}";\n'.format(MAYA_VERSION))
+        self.write("currentUnit -l centimeter -a degree -t {0};\n".format(self.timeUnit))
+        self.write('fileInfo "application" "maya";\n')
+        self.write('fileInfo "product" "Maya {0}";\n'.format(MAYA_VERSION))
+        self.write('fileInfo "version" "{0}";\n'.format(MAYA_VERSION))
+
+    def writeAnimCurve(self, curve, dagPath):
+        """
+        Given an AnimCurve and the namespace-free DAG path of the rig joint
+        it drives, writes the curve node and its keys.
+        """
+        if curve.name in self.curveNames:
+            raise ValueError("Anim curve written twice: {0}".format(curve.name))
+        self.curveNames.add(curve.name)
+        keyCount = len(curve.times)
+        self.write("createNode {0} -n {1};\n".format(curve.curveType, quoteString(curve.name)))
+        self.write('\tsetAttr ".tan" {0};\n'.format(DEFAULT_TANGENT_TYPE))
+        self.write('\tsetAttr ".wgt" no;\n')
+        if keyCount:
+            self.write('\tsetAttr -s {0} ".ktv[0:{1}]" '.format(keyCount, keyCount - 1))
+            for start in range(0, keyCount, KEYS_PER_LINE):
+                pairs = zip(curve.times[start:start + KEYS_PER_LINE], curve.values[start:start + KEYS_PER_LINE])
+                self.write("\n\t\t" + " ".join("{0} {1}".format(formatNumber(keyTime), formatNumber(value))
+                                              for keyTime, value in pairs))
+            self.write(";\n")
+        self.connections.append((curve.name, "{0}.{1}".format(addNamespace(dagPath, self.rigNs), curve.channel)))
+
+    def writeFooter(self, playbackRange=None):
+        """
+        Writes the rig's reference node with one placeholder per driven
+        plug, the playback range (if given), every curve connection and the
+        end of file comment.
+        """
+        self.write("createNode reference -n {0};\n".format(quoteString(self.refNode)))
+        if self.connections:
+            self.write('\tsetAttr -s {0} ".phl";\n'.format(len(self.connections)))
+            for index in range(1, len(self.connections) + 1):
+                self.write('\tsetAttr ".phl[{0}]" 0;\n'.format(index))
+        refNode = quoteString(self.refNode)
+        self.write('\tsetAttr ".ed" -type "dataReferenceEdits" \n')
+        self.write("\t\t{0}\n\t\t{0} 0\n\t\t{0} {1}".format(refNode, len(self.connections)))
+        for index, (_, plug) in enumerate(self.connections, 1):
+            self.write('\n\t\t5 4 {0} {1} \n\t\t"{2}.placeHolderList[{3}]" ""'.format(
+                refNode, quoteString(plug), self.refNode, index))
+        self.write(";\n")
+        if playbackRange is not None:
+            self.write(getPlaybackRangeScript(playbackRange))
+        for index, (curveName, plug) in enumerate(self.connections, 1):
+            self.write('connectAttr "{0}.o" "{1}.phl[{2}]";\n'.format(curveName, self.refNode, index))
+        self.write("// End of {0}\n".format(self.fileName))
+
+##################
+# WRITING SCENES #
+##################
+
+def writeRigWithTake(outputPath, take, rigPath, jointPaths=None, rigNs="character"):
+    """
+    Given an output path, an AnimTake (read from a take or a curve sidecar),
+    the path of the rig and a dict of joint name -> namespace-free DAG path
+    (worked out from the take's own joints if not given), writes a scene
+    with the rig referenced and driven by the take's curves. Curves whose
+    joint isn't in jointPaths are skipped. Returns the number of curves
+    written.
+    """
+    jointPaths = jointPaths or getJointPaths(take)
+    with open(outputPath, "w") as output:
+        writer = MayaAsciiWriter(output, os.path.basename(outputPath), rigPath, take.timeUnit, rigNs)
+        writer.writeHeader()
+        for curve in take.curves:
+            if curve.joint in jointPaths and curve.channel:
+                writer.writeAnimCurve(curve, jointPaths[curve.joint])
+        writer.writeFooter(take.getFrameRange())
+    return len(writer.connections)
+
+def writeTakeToRigs(take, takePath, rigPaths, destFolder, jointPaths=None, rules=None):
+    """
+    Given an AnimTake, the path it was read from, a list of rigs and a
+    destination folder, writes the take applied to every rig (see
+    batchManifest.getMatrixOutputPath) from the one copy in memory. Each rig's joints come
+    from validateTakes.getRigJoints and are matched to the take's with
+    jointMapping.resolveJointMap; a binary rig with no cached joint map is
+    assumed to share the take's skeleton. Returns a dict of rig path ->
+    (output path, number of curves written).
+    """
+    import jointMapping
+    import validateTakes
+
+    duplicateRigNames = batchManifest.getDuplicateRigNames(rigPaths)
+    if duplicateRigNames:
+        raise ValueError("Rigs applied together need different file names: {0}".format(", ".join(duplicateRigNames)))
+    jointPaths = jointPaths or getJointPaths(take)
+    results = OrderedDict()
+    for rigPath in rigPaths:
+        rigJoints, source = validateTakes.getRigJoints(rigPath)
+        rigJointPaths = jointPaths
+        if rigJoints:
+            jointMap = jointMapping.resolveJointMap(list(jointPaths.values()), rigJoints, rules)["map"]
+            rigJointPaths = dict((jointName, jointMap[jointPath]) for jointName, jointPath in jointPaths.items()
+                                 if jointPath in jointMap)
+        outputPath = batchManifest.getMatrixOutputPath(takePath, rigPath, destFolder)
+        curveCount = writeRigWithTake(outputPath, take, rigPath, rigJointPaths, batchManifest.getBaseName(rigPath))
+        results[rigPath] = (outputPath, curveCount)
+    return results
+
+##########
+# SCRIPT #
+##########
+
+def main():
+    parser = argparse.ArgumentParser(description="Write rig_with_<take>.ma files without Maya.")
+    parser.add_argument("takePaths", nargs="+", help="anim takes (.ma) or curve sidecars (.animcurves)")
+    parser.add_argument("destFolder")
+    parser.add_argument("rigPath")
+    parser.add_argument("--skeleton", help="take to read the joint hierarchy from (needed for sidecars)")
+    parser.add_argument("--rig", dest="rigPaths", action="append", default=[],
+                        help="write every take for this rig too (repeatable)")
+    args = parser.parse_args()
+
+    jointPaths = None
+    if args.skeleton:
+        jointPaths = getJointPaths(readAnimCurves.readAnimTake(args.skeleton))
+    if not os.path.exists(args.destFolder):
+        os.makedirs(args.destFolder)
+    for takePath in args.takePaths:
+        if takePath.lower().endswith(".ma"):
+            take = readAnimCurves.readAnimTake(takePath)
+        else:
+            import curveSidecar
+            take = curveSidecar.readCurveSidecar(takePath)
+            if jointPaths is None:
+                parser.error("--skeleton is needed to write {0}".format(takePath))
+        if args.rigPaths:
+            results = writeTakeToRigs(take, takePath, [args.rigPath] + args.rigPaths, args.destFolder, jointPaths)
+            for outputPath, curveCount in results.values():
+                print("{0}: {1} curves".format(outputPath, curveCount))
+            continue
+        outputPath = batchManifest.getOutputPath(takePath, args.destFolder)
+        curveCount = writeRigWithTake(outputPath, take, args.rigPath, jointPaths)
+        print("{0}: {1} curves".format(outputPath, curveCount))
+
+if __name__ == "__main__":
+    main()